@@ -1,89 +1,229 @@
 import os
 import sys
+import stat
 import shutil
 import time
-import psutil
+from functools import partial
 from disk_analyzer_utils.plotting import plot
-from disk_analyzer_utils.benchmark import log_benchmark
 from disk_analyzer_utils.utils import show_analysis
+from disk_analyzer_utils.ages import AgeHistogram
+from disk_analyzer_utils.owners import OwnerUsage
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.engines import ScanResult, register_engine, report_scan
+from disk_analyzer_utils.symlinks import VisitedDirs, follow_walk
+from disk_analyzer_utils.browser import browse
+from disk_analyzer_utils.memprofile import MemoryProfiler
+from disk_analyzer_utils.priority import largest_first
 
 #======================================================
 # Get total size of all files in a folder (and subfolders)
-def get_size(start_path):
+# If an AgeHistogram is given, each file's stat is also recorded for the cold-data report
+# If an OwnerUsage is given, bytes and files are also summed per uid/gid
+# If a Throttle is given, directory reads and file stats are rate limited
+# If a ScanTree (rooted at start_path) is given, per-directory totals are recorded in it
+# `walk` is os.walk, or follow_walk to follow directory symlinks
+def get_size(start_path, ages=None, tree=None, walk=os.walk, owners=None, throttle=None):
     total_size = 0
-    for dirpath, _, filenames in os.walk(start_path, onerror=lambda e: None):  # Go through folders
+    nodes = {start_path: 0}  # Tree node of each directory os.walk has yet to visit
+    for dirpath, dirnames, filenames in walk(start_path, onerror=lambda e: None):  # Go through folders
+        if throttle is not None:
+            throttle.read_dir()
+            throttle.stats(len(filenames))
+        dir_size = 0
+        dir_count = 0
         for f in filenames:
             try:
                 fp = os.path.join(dirpath, f)
-                if not os.path.islink(fp):  # Skip shortcut files
-                    total_size += os.path.getsize(fp)  # Add file size
+                st = os.lstat(fp)  # One stat gives link check, size and times
+                if not stat.S_ISLNK(st.st_mode):  # Skip shortcut files
+                    dir_size += st.st_size  # Add file size
+                    dir_count += 1
+                    if ages is not None:
+                        ages.add(st)
+                    if owners is not None:
+                        owners.add(st)
+                    if tree is not None and st.st_size > tree.largest_floor:
+                        tree.add_largest(st.st_size, fp)
             except Exception:
                 pass  # Ignore errors like no permission
+        total_size += dir_size
+
+        if tree is not None:
+            node = nodes.pop(dirpath)
+            tree.add_files(node, dir_size, dir_count)
+            for d in dirnames:
+                nodes[os.path.join(dirpath, d)] = tree.add(node, d)
     return total_size
 
 #======================================================
-# Analyze size of items in a given folder
-def analyze(base_path="/"):
-    print(f"Analyzing: {base_path}")
+# os.walk that stays on one filesystem (like du -x): subdirectories on
+# another device (mount points such as /proc, /sys or other partitions) are
+# not entered. `device` defaults to the st_dev of `top`. One lstat per subdirectory.
+def device_walk(top, onerror=None, device=None):
+    device = os.stat(top).st_dev if device is None else device
+    for dirpath, dirnames, filenames in os.walk(top, onerror=onerror):
+        keep = []
+        for d in dirnames:
+            try:
+                if os.lstat(os.path.join(dirpath, d)).st_dev == device:
+                    keep.append(d)
+            except OSError:
+                continue  # Vanished
+        dirnames[:] = keep  # os.walk only descends into what is left
+        yield dirpath, dirnames, filenames
+
+#======================================================
+# List the items of a folder as (name, path, stat), deduplicated by (st_dev, st_ino).
+# Every top-level item is claimed first, so a link deeper down cannot take it over.
+def list_items(base_path, scanned):
+    items = []
+    for item in os.listdir(base_path):
+        item_path = os.path.join(base_path, item)
+        try:
+            st = os.stat(item_path)
+        except OSError:
+            continue  # Broken link
+        if scanned.first_visit(st):
+            items.append((item, item_path, st))
+        # else: already checked (same file or folder through a link)
+    return items
+
+#======================================================
+# Get the size of one listed item (folder or file)
+# Returns (result row, ScanTree of a folder or None for a file), or None if skipped
+def scan_item(item, item_path, st, walk=os.walk):
+    try:
+        #======================================================
+        # Skip temp files
+        SKIP_EXTENSIONS = [".tmp"]
+        _, ext = os.path.splitext(item)
+        if ext.lower() in SKIP_EXTENSIONS:
+            return None
+
+        #======================================================
+        # Get size of folder or file
+        ages = AgeHistogram()
+        owners = OwnerUsage()
+        subtree = None
+        if stat.S_ISDIR(st.st_mode):
+            subtree = ScanTree(item_path)
+            size = get_size(item_path, ages, subtree, walk, owners)
+        elif stat.S_ISREG(st.st_mode):
+            size = st.st_size
+            ages.add(st)
+            owners.add(st)
+        else:
+            return None  # Not file or folder
+        return {"path": item, "size": size, "cold": ages.cold_bytes(), "owners": owners.totals(),
+                "sizes": ages.size_counts()}, subtree
+
+    except Exception as e:
+        print(f"{item_path:<30} ERROR: {e}")
+        return None
+
+#======================================================
+# Add a scanned item to the results and under the root of `tree`
+def add_item(tree, disk_data, scanned_item):
+    row, subtree = scanned_item
+    disk_data.append(row)
+    if subtree is not None:
+        tree.graft(0, row["path"], subtree)
+    else:
+        tree.add_files(0, row["size"], 1)
+
+#======================================================
+# Base engine: scan the items of a folder one after another
+# With follow_symlinks=True directory symlinks are followed at every level
+# `profiler` (a MemoryProfiler) gets the "list" and "scan" phases
+# With prioritize=True the largest folders (from the last scan) are scanned first
+# and the top items are shown as they finish, see priority.py
+@register_engine("base", "Single-threaded os.walk")
+def scan(base_path="/", follow_symlinks=False, profiler=None, prioritize=False):
+    profiler = profiler or MemoryProfiler(False)
     start_time = time.time()
 
     total, used, free = shutil.disk_usage(base_path)  # Get disk space info
-    scanned = set()  # Remember scanned paths
+    scanned = VisitedDirs()  # Remember scanned (st_dev, st_ino), catches links and bind mounts
+    scanned.first_visit(os.stat(base_path))  # Claim the root too, so a link back to it is not walked again
+    walk = partial(follow_walk, visited=scanned) if follow_symlinks else os.walk
     disk_data = []  # Store results here
-    item_count = 0
-    total_size_collected = 0
+    tree = ScanTree(base_path)  # Per-directory sizes for snapshots
+    tree.disk_usage = (total, used, free)
+
+    items = list_items(base_path, scanned)
+    progress = None
+    if prioritize:
+        items, progress = largest_first(base_path, items)
+    profiler.phase("list")
 
     #======================================================
     # Check each item in the folder
-    for item in os.listdir(base_path):
-        item_path = os.path.join(base_path, item)
-        try:
-            real_path = os.path.realpath(item_path)
-            if real_path in scanned:
-                continue  # Already checked
-            scanned.add(real_path)
-
-            #======================================================
-            # Get size of folder or file
-            if os.path.isdir(item_path):
-                size = get_size(item_path)
-            elif os.path.isfile(item_path):
-                size = os.path.getsize(item_path)
-            else:
-                continue  # Not file or folder
+    for item, item_path, st in items:
+        scanned_item = scan_item(item, item_path, st, walk)
+        if scanned_item is not None:
+            add_item(tree, disk_data, scanned_item)
+        if progress is not None:
+            progress.add(item, scanned_item and scanned_item[0])
+    if progress is not None:
+        progress.summary()
+    profiler.phase("scan")
 
-            #======================================================
-            # Skip temp files
-            SKIP_EXTENSIONS = [".tmp"]
-            _, ext = os.path.splitext(item)
-            if ext.lower() in SKIP_EXTENSIONS:
-                continue
-
-            disk_data.append({"path": item, "size": size})
-            item_count += 1
-            total_size_collected += size
+    return ScanResult("base", base_path, tree, disk_data, time.time() - start_time)
 
-        except Exception as e:
-            print(f"{item_path:<30} ERROR: {e}")
-
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-    print(f"Analyze time: {elapsed_time} s.")
-    process = psutil.Process(os.getpid())
-    print(f"Memory used: {process.memory_info().rss / 1024 ** 2:.2f} MB")
+#======================================================
+# Analyze size of items in a given folder
+# With snapshot=True the per-directory results are also saved for later diffing
+# With follow_symlinks=True directory symlinks are followed at every level
+# With profile_memory=True traced memory is reported per scan phase (slower)
+# With owner_split=True usage per user is also shown for every item
+# With prioritize=True the largest folders are scanned first (see scan())
+# Returns the scanned ScanTree
+def analyze(base_path="/", snapshot=False, follow_symlinks=False, profile_memory=False, owner_split=False,
+            prioritize=False):
+    print(f"Analyzing: {base_path}")
+    profiler = MemoryProfiler(profile_memory)
+    result = scan(base_path, follow_symlinks, profiler, prioritize)
 
     #======================================================
     # Show result in chart and text
-    show_analysis(disk_data, total, used, free)
+    report_scan(result, snapshot, profiler, owner_split=owner_split)
+    return result.tree
+
+
+#======================================================
+# Show sizes inside one directory of a saved tree file (no disk access)
+def analyze_tree(tree, node=0):
+    base_path = tree.path(node)
+    print(f"Browsing: {base_path} (from {tree.filename})")
+    disk_data = [{"path": tree.name(child), "size": int(tree.sizes[child])} for child in tree.children(node)]
+    direct_files = int(tree.sizes[node]) - sum(item["size"] for item in disk_data)
+    if direct_files > 0:
+        disk_data.append({"path": "<files>", "size": direct_files})  # Files directly in this folder
+
+    show_analysis(disk_data, *tree.disk_usage)
     plot(disk_data, base_path)
-    log_benchmark(base_path, item_count, total_size_collected, elapsed_time, version="base")
 
 
 #======================================================
 # Main loop for choosing folders and analyzing them
-def analyzer(start_drive):
+# If a MappedTree is given, browse it offline instead of scanning start_drive
+# With browser=True the scanned tree is opened in the full-screen browser instead
+# With profile_memory=True the first scan is profiled with tracemalloc
+# With owner_split=True every scan also shows usage per user of each item
+# With prioritize=True every scan does the largest folders first
+def analyzer(start_drive, snapshot=False, tree=None, follow_symlinks=False, browser=False, profile_memory=False,
+             owner_split=False, prioritize=False):
+    if browser:
+        if tree is None:
+            tree = analyze(start_drive, snapshot, follow_symlinks, profile_memory, owner_split, prioritize)
+        return browse(tree)  # Navigates the tree in memory, no rescans
+
     nested_directory = 0
-    analyze(start_drive)  # Start with given folder
+    if tree is not None:
+        start_drive = 0  # Locations are tree node numbers when browsing a tree file
+        analyze_tree(tree, start_drive)
+    else:
+        analyze(start_drive, snapshot, follow_symlinks, profile_memory, owner_split, prioritize)  # Start with given folder
     nested_directory += 1
 
     old_path = [start_drive]
@@ -92,8 +232,11 @@ def analyzer(start_drive):
     while True:
         print("-" * 55)
         try:
-            entries = os.listdir(path)
-            dirs = [d for d in entries if os.path.isdir(os.path.join(path, d))]  # Only show folders
+            if tree is not None:
+                dirs = [tree.name(child) for child in tree.children(path)]
+            else:
+                entries = os.listdir(path)
+                dirs = [d for d in entries if os.path.isdir(os.path.join(path, d))]  # Only show folders
         except Exception as e:
             print(f"Error accessing directory: {e}")
             if len(old_path) > 1:
@@ -139,6 +282,10 @@ def analyzer(start_drive):
         #======================================================
         # Go into selected folder
         old_path.append(path)
-        path = os.path.join(path, dirs[num - 1])
-        analyze(path)
+        if tree is not None:
+            path = tree.children(path)[num - 1]
+            analyze_tree(tree, path)
+        else:
+            path = os.path.join(path, dirs[num - 1])
+            analyze(path, follow_symlinks=follow_symlinks, owner_split=owner_split, prioritize=prioritize)
         nested_directory += 1
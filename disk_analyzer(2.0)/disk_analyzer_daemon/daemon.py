@@ -0,0 +1,243 @@
+#======================================================
+# Imports for the scan daemon
+# Standard libraries for sockets, threads and JSON messages
+import os
+import json
+import stat
+import time
+import shutil
+import socket
+import getpass
+import tempfile
+import threading
+import socketserver
+import psutil
+
+# The base engine's walker builds the tree; the daemon only keeps and queries it
+from disk_analyzer.analyzer import get_size, device_walk
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.throttle import Throttle, lower_priority
+from disk_analyzer_utils.history import record_usage
+
+#======================================================
+# Defaults
+SOCKET_NAME = "disk_analyzer.sock"
+DEFAULT_REFRESH_SEC = 3600
+LARGEST_FILES_KEPT = 1000  # Per filesystem; "largest" queries are answered from this list
+
+#======================================================
+# Default socket path, in a directory only this user can enter: the tree
+# answers size and largest-file queries about folders other users may not be
+# allowed to read. $XDG_RUNTIME_DIR is such a directory; otherwise a 0700
+# folder per user is created in the temp directory (and refused if another
+# user owns it or can enter it).
+def default_socket_path():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, SOCKET_NAME)
+    folder = os.path.join(tempfile.gettempdir(), f"disk_analyzer-{getpass.getuser()}")
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    st = os.lstat(folder)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{folder} must be a directory of this user that others cannot enter")
+    return os.path.join(folder, SOCKET_NAME)
+
+#--------------------------------------------------
+# Remove a socket left by a daemon that is no longer running. Refuses a path
+# that is not a socket, or the socket of a daemon that still answers.
+def remove_stale_socket(socket_path):
+    try:
+        st = os.lstat(socket_path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise FileExistsError(f"{socket_path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass  # Nobody listening: stale
+        else:
+            raise FileExistsError(f"A daemon is already serving on {socket_path}")
+    os.unlink(socket_path)
+
+#======================================================
+# Scan one filesystem into a rolled-up tree plus a (parent, name) -> node index
+# The walk does not cross into other mounted filesystems, they have their own tree
+# With a Throttle the walk is rate limited (polite mode)
+def scan_filesystem(root, throttle=None):
+    start_time = time.time()
+    tree = ScanTree(root, largest_limit=LARGEST_FILES_KEPT)
+    tree.disk_usage = tuple(shutil.disk_usage(root))
+    get_size(root, tree=tree, walk=device_walk, throttle=throttle)
+    tree.rollup()
+
+    index = {}
+    children = [[] for _ in range(len(tree))]
+    for node in range(1, len(tree)):
+        index[(tree.parents[node], tree.names[node])] = node
+        children[tree.parents[node]].append(node)
+    for kids in children:
+        kids.sort(key=tree.sizes.__getitem__, reverse=True)
+
+    return {
+        "tree": tree,
+        "index": index,
+        "children": children,
+        "scanned_at": time.time(),
+        "scan_time": time.time() - start_time,
+    }
+
+#======================================================
+# Keeps one scanned tree per filesystem and refreshes them on a schedule
+# With polite=True it runs at idle I/O priority and every rescan is rate
+# limited, backing off while the disk is busy, so it can run all day
+class ScanDaemon:
+    def __init__(self, roots=None, refresh_sec=DEFAULT_REFRESH_SEC, polite=False):
+        if roots is None:
+            roots = [p.mountpoint for p in psutil.disk_partitions(all=False)]
+
+        # One root per filesystem (st_dev), so the same device is never scanned twice
+        self.roots = []
+        seen_devices = set()
+        for root in roots:
+            try:
+                dev = os.stat(root).st_dev
+            except OSError as e:
+                print(f"Skipping {root}: {e}")
+                continue
+            if dev not in seen_devices:
+                seen_devices.add(dev)
+                self.roots.append(os.path.abspath(root))
+
+        self.refresh_sec = refresh_sec
+        self.polite = polite
+        self.scans = {}  # root -> result of scan_filesystem (replaced whole on refresh)
+        self._stop = threading.Event()
+        self._server = None
+
+    #--------------------------------------------------
+    # Rescan every filesystem; queries keep using the old tree until the new one is ready.
+    # Every rescan is also a sample of the usage history (for growth forecasts).
+    def refresh(self):
+        for root in self.roots:
+            try:
+                throttle = Throttle(root) if self.polite else None
+                scan = self.scans[root] = scan_filesystem(root, throttle)
+                print(f"Scanned {root} in {scan['scan_time']:.2f} s.")
+                tree = scan["tree"]
+                record_usage(root, tree.disk_usage, [{"path": tree.names[node], "size": tree.sizes[node]}
+                                                     for node in scan["children"][0]], scan["scanned_at"])
+                if throttle is not None:
+                    print(throttle.summary())
+            except Exception as e:
+                print(f"Error scanning {root}: {e}")
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_sec):
+            self.refresh()
+
+    #--------------------------------------------------
+    # Find the scan and tree node for an absolute path
+    def locate(self, path):
+        path = os.path.abspath(path)
+        roots = [r for r in self.scans if path == r or path.startswith(r.rstrip(os.sep) + os.sep)]
+        if not roots:
+            raise LookupError(f"{path} is not on a scanned filesystem")
+        root = max(roots, key=len)  # Deepest mount point wins
+        scan = self.scans[root]
+        node = 0
+        for name in os.path.relpath(path, root).split(os.sep):
+            if name == ".":
+                continue
+            node = scan["index"].get((node, name))
+            if node is None:
+                raise LookupError(f"{path} is not a scanned directory")
+        return scan, node
+
+    #--------------------------------------------------
+    # Answer one request dict; errors become {"ok": False, "error": ...}
+    def handle(self, request):
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "request must be a JSON object"}
+        op = request.get("op")
+        try:
+            if op == "status":
+                return {"ok": True, "filesystems": [
+                    {"root": root, "nodes": len(scan["tree"]), "scanned_at": scan["scanned_at"],
+                     "scan_time": scan["scan_time"]}
+                    for root, scan in self.scans.items()
+                ]}
+
+            scan, node = self.locate(request.get("path", "/"))
+            tree = scan["tree"]
+            n = int(request.get("n", 10))
+            if n < 0:
+                raise ValueError("n must not be negative")
+
+            if op == "size":
+                return {"ok": True, "path": tree.path(node), "size": tree.sizes[node],
+                        "count": tree.counts[node], "scanned_at": scan["scanned_at"]}
+            if op == "top":
+                return {"ok": True, "path": tree.path(node), "children": [
+                    {"path": tree.names[child], "size": tree.sizes[child], "count": tree.counts[child]}
+                    for child in scan["children"][node][:n]
+                ]}
+            if op == "largest":
+                prefix = tree.path(node).rstrip(os.sep) + os.sep
+                files = [(size, path) for size, path in tree.largest if path.startswith(prefix)]
+                files.sort(reverse=True)
+                return {"ok": True, "path": tree.path(node),
+                        "files": [{"path": path, "size": size} for size, path in files[:n]]}
+            return {"ok": False, "error": f"unknown op {op!r}"}
+        except (LookupError, ValueError, TypeError) as e:
+            return {"ok": False, "error": str(e)}
+
+    #--------------------------------------------------
+    # Scan once, then serve line-delimited JSON requests on a Unix socket
+    # (by default default_socket_path(); the socket is readable by this user only)
+    def serve(self, socket_path=None):
+        socket_path = socket_path or default_socket_path()
+        remove_stale_socket(socket_path)
+        if self.polite:
+            applied, _ = lower_priority()  # For the daemon's whole life, nothing to restore
+            print(f"Polite mode: {', '.join(applied) or 'priority could not be lowered'}, rate limited.")
+        self.refresh()
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = daemon.handle(json.loads(line))
+                    except json.JSONDecodeError as e:
+                        response = {"ok": False, "error": f"bad JSON: {e}"}
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+            try:
+                os.chmod(socket_path, 0o600)
+                self._server = server
+                print(f"Serving size queries on {socket_path} (refresh every {self.refresh_sec} s)")
+                server.serve_forever()
+            finally:
+                self._stop.set()
+                os.unlink(socket_path)
+
+    # End serve() from another thread
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+#======================================================
+# Client side: send one request and return the decoded response
+def query_daemon(request, socket_path=None, timeout=5):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
@@ -0,0 +1,160 @@
+#======================================================
+# Imports
+# Standard libraries for filesystem, timing and thread pools
+import os
+import stat
+import shutil
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Listing, result rows and tree grafting are shared with the base engine
+from disk_analyzer.analyzer import list_items, add_item, get_size as path_get_size
+from disk_analyzer_threaded.analyzer import MAX_WORKERS
+from disk_analyzer_utils.ages import AgeHistogram
+from disk_analyzer_utils.owners import OwnerUsage
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.engines import ScanResult, register_engine
+from disk_analyzer_utils.symlinks import VisitedDirs, follow_walk
+from disk_analyzer_utils.memprofile import MemoryProfiler
+from disk_analyzer_utils.priority import largest_first
+from disk_analyzer_utils.fdwalk import FD_LIMIT, fd_walk, fd_walk_supported, fds_per_walk, scandir_list
+from disk_analyzer_utils import native
+
+#======================================================
+# Get total size of all files in a folder with an fd-relative walk.
+# Files are stat'ed relative to their directory's fd, and a file's full path
+# is only built if it makes the largest-files list of `tree`.
+# Directory totals are recorded in `tree` (rooted at start_path) like get_size() of the base engine.
+# With a `native_buffer` size, directories are read with getdents64 into a buffer
+# of that size and files are stat'ed with statx (see native.py); names are bytes then.
+def get_size(start_path, ages, owners, tree, fd_limit=FD_LIMIT, native_buffer=None):
+    total_size = 0
+    if native_buffer:
+        calls = native.NativeCalls(native_buffer)  # This walk's own buffers
+        list_dir, lstat = calls.list_dir, calls.lstat
+    else:
+        list_dir = scandir_list
+        lstat = partial(os.stat, follow_symlinks=False)
+    for folder, dirnames, filenames, dir_fd in fd_walk(start_path, fd_limit, lambda e: None, list_dir):
+        folder.node = 0 if folder.parent is None else tree.add(folder.parent.node, folder.name)
+        dir_size = 0
+        dir_count = 0
+        for f in filenames:
+            try:
+                st = lstat(f, dir_fd=dir_fd)  # fstatat/statx: only this name is resolved
+                if not stat.S_ISLNK(st.st_mode):  # Skip symbolic links
+                    dir_size += st.st_size
+                    dir_count += 1
+                    ages.add(st)
+                    owners.add(st)
+                    if st.st_size > tree.largest_floor:
+                        tree.add_largest(st.st_size, os.path.join(folder.path(), os.fsdecode(f)))
+            except Exception:
+                pass  # Ignore unreadable files
+        total_size += dir_size
+        tree.add_files(folder.node, dir_size, dir_count)
+    ages.flush()
+    owners.flush()
+    return total_size
+
+#======================================================
+# Get the size of one listed item (folder or file), like scan_item() of the base engine
+# Returns (result row, ScanTree of a folder or None for a file), or None if skipped
+# `walk` is None for the fd walk, or follow_walk when following symlinks (path based)
+def scan_item(item, item_path, st, fd_limit, walk=None, native_buffer=None):
+    try:
+        _, ext = os.path.splitext(item)
+        if ext.lower() in [".tmp"]:
+            return None  # Skip temp files
+
+        ages = AgeHistogram()
+        owners = OwnerUsage()
+        subtree = None
+        if stat.S_ISDIR(st.st_mode):
+            subtree = ScanTree(item_path)
+            if walk is None:
+                size = get_size(item_path, ages, owners, subtree, fd_limit, native_buffer)
+            else:
+                size = path_get_size(item_path, ages, subtree, walk, owners)
+        elif stat.S_ISREG(st.st_mode):
+            size = st.st_size
+            ages.add(st)
+            owners.add(st)
+        else:
+            return None  # Not file or folder
+        return {"path": item, "size": size, "cold": ages.cold_bytes(), "owners": owners.totals(),
+                "sizes": ages.size_counts()}, subtree
+
+    except Exception as e:
+        print(f"{item_path:<30} ERROR: {e}")
+        return None
+
+#======================================================
+# fd-relative engine: the thread-pool engine's structure (one task per
+# top-level item), with every walk holding directory fds and using
+# openat/fstatat instead of full paths. All walks together hold at most
+# `fd_limit` directory fds (and at most half of the open-file limit).
+# With follow_symlinks=True, or where dir_fd is not supported (Windows),
+# the base engine's path-based walk is used.
+# `profiler` (a MemoryProfiler) gets the "list" and "scan" phases
+# With prioritize=True the largest folders are submitted first (as the thread-pool engine does)
+@register_engine("fdwalk", "Thread pool with fd-relative walks (openat/fstatat, bounded fds)")
+def scan(base_path="/", follow_symlinks=False, profiler=None, max_workers=MAX_WORKERS, fd_limit=FD_LIMIT,
+         prioritize=False):
+    return scan_folder("fdwalk", base_path, follow_symlinks, profiler, max_workers, fd_limit, prioritize=prioritize)
+
+#--------------------------------------------------
+# Native engine: the fdwalk engine reading directories with large-buffer
+# getdents64 and stat'ing with statx (AT_STATX_DONT_SYNC, only the fields
+# used), through ctypes. Where that is not available (not Linux, no statx,
+# blocked by seccomp) it falls back to the fdwalk engine and says so.
+@register_engine("native", "fdwalk with ctypes getdents64/statx (Linux, falls back to fdwalk)")
+def scan_native(base_path="/", follow_symlinks=False, profiler=None, max_workers=MAX_WORKERS, fd_limit=FD_LIMIT,
+                buffer_size=native.GETDENTS_BUFFER, prioritize=False):
+    reason = native.native_unavailable()
+    if reason is not None:
+        print(f"Native backend not available ({reason}), using the fdwalk engine.")
+        return scan(base_path, follow_symlinks, profiler, max_workers, fd_limit, prioritize)
+    return scan_folder("native", base_path, follow_symlinks, profiler, max_workers, fd_limit, buffer_size, prioritize)
+
+#--------------------------------------------------
+# Shared body of both engines; `native_buffer` selects the native backend
+def scan_folder(engine, base_path, follow_symlinks, profiler, max_workers, fd_limit, native_buffer=None,
+                prioritize=False):
+    profiler = profiler or MemoryProfiler(False)
+    start_time = time.time()
+
+    total, used, free = shutil.disk_usage(base_path)
+    scanned = VisitedDirs()
+    scanned.first_visit(os.stat(base_path))  # Claim the root too, so a link back to it is not walked again
+    walk = None
+    if follow_symlinks:
+        walk = partial(follow_walk, visited=scanned)
+    elif not fd_walk_supported():
+        walk = os.walk
+    walk_fds = fds_per_walk(fd_limit, max_workers)
+    disk_data = []
+    tree = ScanTree(base_path)
+    tree.disk_usage = (total, used, free)
+
+    items = list_items(base_path, scanned)
+    progress = None
+    if prioritize:
+        items, progress = largest_first(base_path, items)
+    profiler.phase("list")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(scan_item, item, item_path, st, walk_fds, walk, native_buffer): item
+                   for item, item_path, st in items}
+        for future in as_completed(futures):
+            scanned_item = future.result()
+            if scanned_item is not None:
+                add_item(tree, disk_data, scanned_item)
+            if progress is not None:
+                progress.add(futures[future], scanned_item and scanned_item[0])
+    if progress is not None:
+        progress.summary()
+    profiler.phase("scan")
+
+    return ScanResult(engine, base_path, tree, disk_data, time.time() - start_time)
@@ -3,110 +3,443 @@
 # Standard libraries for filesystem, system info, time tracking, and async
 import os
 import sys
+import stat
 import shutil
 import time
+import heapq
 import asyncio
-import psutil
+from functools import partial
+from itertools import islice
 
-# Custom utilities for plotting, logging, and displaying results
-from disk_analyzer_utils.plotting import plot
-from disk_analyzer_utils.benchmark import log_benchmark
-from disk_analyzer_utils.utils import show_analysis
+# Custom utilities for the tree, the shared result type and reporting
+from disk_analyzer_utils.ages import AgeHistogram
+from disk_analyzer_utils.owners import OwnerUsage
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.engines import ScanResult, register_engine, report_scan
+from disk_analyzer_utils.rotational import is_rotational, inode_walk
+from disk_analyzer_utils.spill import MemoryBudget
+from disk_analyzer_utils.symlinks import VisitedDirs, follow_walk
+from disk_analyzer_utils.browser import browse
+from disk_analyzer_utils.memprofile import MemoryProfiler
+from disk_analyzer_utils.throttle import Throttle, lower_priority, restore_priority
+from disk_analyzer_utils.checkpoint import Checkpoint, ScanStopped, CHECK_EVERY_DIRS, checkpoint_path, remove_checkpoint
+from disk_analyzer_utils.priority import largest_first
+
+#======================================================
+# Limits for listing the scanned folder, so a folder with millions of
+# entries never turns into millions of pending tasks
+SCAN_CHUNK = 4096      # Entries read from os.scandir per worker call
+FILE_BATCH = 4096      # Regular files stat'ed by one worker task
+MAX_IN_FLIGHT = 16     # File batches running at the same time
+MAX_FILE_ROWS = 1000   # Files listed one by one in the results (largest first), the rest are summed
+SKIP_EXTENSIONS = [".tmp"]
 
 #======================================================
 # Asynchronously calculate the total size of a folder
-async def get_size(path):
+# File stats are also recorded into the given AgeHistogram and OwnerUsage and
+# per-directory totals into the given ScanTree (all owned by this task only)
+# `walk` is os.walk, inode_walk on spinning disks, or follow_walk to follow directory symlinks
+# (then follow_symlinks=True; otherwise directory symlinks get no tree node, as
+# the walk never enters them and they would stay in the frontier forever)
+# With a MemoryBudget, finished parts of the tree are spilled to disk when the tracked trees get large
+# With a Throttle, directory reads and file stats are rate limited (polite mode)
+# With a Checkpoint, the walk's state is saved every few seconds; a resumed walk
+# starts from the saved `frontier` ({path: node} not walked yet) and `total`
+async def get_size(path, ages, owners, tree, walk=os.walk, budget=None, throttle=None,
+                   checkpoint=None, frontier=None, total=0, follow_symlinks=False):
+    name = os.path.basename(path)
+
     # Move heavy computation to a thread so it doesn't block the event loop
     def compute_size():
-        total = 0
-        for dirpath, _, filenames in os.walk(path, onerror=lambda e: None):
-            for f in filenames:
-                try:
-                    fp = os.path.join(dirpath, f)
-                    if not os.path.islink(fp):  # Skip symbolic links
-                        total += os.path.getsize(fp)
-                except Exception:
-                    pass  # Ignore unreadable files
-        return total
+        if budget is not None:
+            budget.track(tree)
+        size = total
+        nodes = dict(frontier) if frontier is not None else {path: 0}  # Tree node of each directory not visited yet
+        dir_number = 0
+        for top in list(nodes):
+            for dirpath, dirnames, filenames in walk(top, onerror=lambda e: None):
+                size += walk_dir(nodes, dirpath, dirnames, filenames)
+                dir_number += 1
+                if budget is not None and dir_number % budget.check_every == 0 and budget.over():
+                    remap = tree.spill(budget.store, nodes.values())
+                    nodes = {p: remap[i] for p, i in nodes.items()}
+                if checkpoint is not None and dir_number % CHECK_EVERY_DIRS == 0:
+                    if checkpoint.stopping:
+                        checkpoint.save_item(name, tree, nodes, size, ages, owners)
+                        raise ScanStopped(path)
+                    if checkpoint.due(name):
+                        checkpoint.save_item(name, tree, nodes, size, ages, owners)
+        ages.flush()
+        owners.flush()
+        if checkpoint is not None:
+            checkpoint.save_item(name, tree, nodes, size, ages, owners, done=True)
+        return size
+
+    # One directory: stat its files, account them and add its subdirectories
+    def walk_dir(nodes, dirpath, dirnames, filenames):
+        if throttle is not None:
+            throttle.read_dir()
+            throttle.stats(len(filenames))
+        dir_size = 0
+        dir_count = 0
+        for f in filenames:
+            try:
+                fp = os.path.join(dirpath, f)
+                st = os.lstat(fp)  # Single syscall for link check, size and times
+                if not stat.S_ISLNK(st.st_mode):  # Skip symbolic links
+                    dir_size += st.st_size
+                    dir_count += 1
+                    ages.add(st)
+                    owners.add(st)
+                    if st.st_size > tree.largest_floor:
+                        tree.add_largest(st.st_size, fp)
+            except Exception:
+                pass  # Ignore unreadable files
+
+        node = nodes.pop(dirpath)
+        tree.add_files(node, dir_size, dir_count)
+        for d in dirnames:
+            dp = os.path.join(dirpath, d)
+            if follow_symlinks or not os.path.islink(dp):  # os.walk lists links it does not enter
+                nodes[dp] = tree.add(node, d)
+        return dir_size
 
     return await asyncio.to_thread(compute_size)
 
 #======================================================
-# Asynchronously analyze the size of a single file or folder
-async def scan_item(path):
+# Asynchronously analyze the size of a single folder
+# Its directory totals are attached under the root of `tree`
+# With a Checkpoint, a folder saved there is resumed (or taken as is, if it was finished)
+async def scan_item(path, tree, walk=os.walk, budget=None, throttle=None, checkpoint=None, follow_symlinks=False):
     try:
-        SKIP_EXTENSIONS = [".tmp"]
-        _, ext = os.path.splitext(path)
-        if ext.lower() in SKIP_EXTENSIONS:
-            return None  # Skip unwanted file types
-
-        # If it's a directory, calculate folder size
-        if os.path.isdir(path):
-            size = await get_size(path)
-        # If it's a file, get the size directly
-        elif os.path.isfile(path):
-            size = await asyncio.to_thread(os.path.getsize, path)
+        saved = checkpoint.load_item(os.path.basename(path), path) if checkpoint is not None else None
+        if saved is None:
+            ages = AgeHistogram()
+            owners = OwnerUsage()
+            subtree = ScanTree(path, prefix=os.path.basename(path))
+            size = await get_size(path, ages, owners, subtree, walk, budget, throttle, checkpoint,
+                                  follow_symlinks=follow_symlinks)
         else:
-            return None  # Skip non-file, non-folder items
-
-        return {"path": os.path.basename(path), "size": size}
+            ages, owners, subtree = saved["ages"], saved["owners"], saved["tree"]
+            size = saved["total"]
+            if not saved["done"]:
+                size = await get_size(path, ages, owners, subtree, walk, budget, throttle, checkpoint,
+                                      saved["frontier"], saved["total"], follow_symlinks)
+        tree.graft(0, os.path.basename(path), subtree)  # Runs on the event loop, no locking needed
+        if budget is not None and budget.over():
+            tree.spill(budget.store, [])  # Every grafted subtree is finished
+        return {"path": os.path.basename(path), "size": size, "cold": ages.cold_bytes(), "owners": owners.totals(),
+                "sizes": ages.size_counts()}
+    except ScanStopped:
+        raise  # State saved, the whole scan is stopping
     except Exception as e:
         print(f"{path:<30} ERROR: {e}")
         return None  # Return None for failed items
 
 #======================================================
-# Asynchronously analyze contents of a directory
-async def analyze(base_path="/"):
-    print(f"Analyzing: {base_path}")
+# Read the next chunk of a scandir iterator (runs in a worker thread).
+# Folders are claimed in `scanned` and returned as (path, stat);
+# files are only sorted out here, they are stat'ed later in batches; a link
+# to a file directly in the folder (real path `root`) is dropped, that file is counted itself.
+# The last value is False once the iterator is exhausted.
+def read_chunk(it, scanned, root, throttle=None):
+    if throttle is not None:
+        throttle.read_dir()  # One chunk is about one getdents batch
+    folders, files = [], []
+    read = 0
+    for entry in islice(it, SCAN_CHUNK):
+        read += 1
+        try:
+            if os.path.splitext(entry.name)[1].lower() in SKIP_EXTENSIONS:
+                continue  # Skip unwanted file types
+            if entry.is_dir():  # Follows links, like os.path.isdir
+                st = entry.stat()
+                if scanned.first_visit(st):
+                    folders.append((entry.path, st))
+            elif entry.is_file():
+                if entry.is_symlink() and os.path.dirname(os.path.realpath(entry.path)) == root:
+                    continue
+                files.append(entry)
+            # Anything else (sockets, devices, broken links) is skipped
+        except OSError:
+            continue  # Vanished or unreadable entry
+    return folders, files, read == SCAN_CHUNK
+
+#======================================================
+# Stat a batch of regular files (runs in a worker thread).
+# Only files that can be reached twice (hard links, links from outside the
+# folder) are claimed in `linked`, so the set stays small for folders of
+# millions of plain files.
+# Returns their total size and count, the MAX_FILE_ROWS largest as a
+# min-heap of (size, name, stat) and an AgeHistogram and OwnerUsage of all the others.
+def scan_files(entries, linked, now, throttle=None):
+    if throttle is not None:
+        throttle.stats(len(entries))
+    total = 0
+    count = 0
+    largest = []
+    others = AgeHistogram(now)
+    other_owners = OwnerUsage()
+    for entry in entries:
+        try:
+            st = entry.stat()
+        except OSError:
+            continue  # Vanished or broken link
+        if (st.st_nlink > 1 or entry.is_symlink()) and not linked.first_visit(st):
+            continue  # Same file through a link or hard link
+        total += st.st_size
+        count += 1
+        if len(largest) < MAX_FILE_ROWS:
+            heapq.heappush(largest, (st.st_size, entry.name, st))
+        else:
+            pushed_out = heapq.heappushpop(largest, (st.st_size, entry.name, st))[2]
+            others.add(pushed_out)
+            other_owners.add(pushed_out)
+    others.flush()
+    return total, count, largest, others, other_owners
+
+#======================================================
+# Stream the entries of `base_path`: regular files are stat'ed in batches
+# with at most MAX_IN_FLIGHT batches running, folders are returned for the
+# per-folder fan-out. Files only add their totals to the root of `tree`.
+async def list_items(base_path, tree, scanned, throttle=None):
+    now = time.time()
+    root = os.path.realpath(base_path)
+    linked = VisitedDirs()  # Multiply-linked files, kept apart from the folders in `scanned`
+    folders = []
+    files = {"size": 0, "count": 0, "largest": [], "others": AgeHistogram(now), "other_owners": OwnerUsage()}
+
+    def merge(result):
+        size, count, largest, others, other_owners = result
+        tree.add_files(0, size, count)
+        files["size"] += size
+        files["count"] += count
+        files["others"].merge(others)
+        files["other_owners"].merge(other_owners)
+        for item in largest:
+            if len(files["largest"]) < MAX_FILE_ROWS:
+                heapq.heappush(files["largest"], item)
+            else:
+                pushed_out = heapq.heappushpop(files["largest"], item)[2]
+                files["others"].add(pushed_out)
+                files["other_owners"].add(pushed_out)
+
+    it = await asyncio.to_thread(os.scandir, base_path)
+    pending = set()
+    batch = []
+    try:
+        more = True
+        while more:
+            chunk_folders, chunk_files, more = await asyncio.to_thread(read_chunk, it, scanned, root, throttle)
+            folders += chunk_folders
+            batch += chunk_files
+            while len(batch) >= FILE_BATCH or (batch and not more):
+                pending.add(asyncio.ensure_future(asyncio.to_thread(scan_files, batch[:FILE_BATCH], linked, now, throttle)))
+                batch = batch[FILE_BATCH:]
+                if len(pending) >= MAX_IN_FLIGHT:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        merge(task.result())
+        for task in asyncio.as_completed(pending):
+            merge(await task)
+    finally:
+        it.close()
+    return folders, files
+
+#======================================================
+# Result rows for the files of the scanned folder: the largest ones one by one,
+# everything else as a single "<N other files>" row
+def file_rows(files):
+    rows = []
+    for size, name, st in sorted(files["largest"], reverse=True):
+        ages = AgeHistogram(files["others"].now)
+        ages.add(st)
+        owners = OwnerUsage()
+        owners.add(st)
+        rows.append({"path": name, "size": size, "cold": ages.cold_bytes(), "owners": owners.totals(),
+                     "sizes": ages.size_counts()})
+    other_count = files["count"] - len(rows)
+    if other_count:
+        rows.append({"path": f"<{other_count} other files>", "size": files["size"] - sum(r["size"] for r in rows),
+                     "cold": files["others"].cold_bytes(), "owners": files["other_owners"].totals(),
+                     "sizes": files["others"].size_counts()})
+    return rows
+
+#======================================================
+# Optimized engine: stream the folder's entries, then walk its folders
+# concurrently in worker threads (sequentially in inode order on spinning disks)
+# With follow_symlinks=True directory symlinks are followed at every level
+# With a MemoryBudget, tree data beyond the budget is spilled to its store
+# With a Throttle, directory reads and file stats are rate limited
+# With a Checkpoint, every folder's progress is saved and saved folders are resumed
+# With prioritize=True the largest folders (from the last scan) are walked first
+# and the top items are shown as they finish, see priority.py
+# `profiler` (a MemoryProfiler, traces worker threads too) gets the "list" and "scan" phases
+# Returns a ScanResult, or None if the folder cannot be listed
+@register_engine("optimized", "Asyncio with worker threads, chunked listing and batched stats")
+async def scan(base_path="/", follow_symlinks=False, profiler=None, budget=None, throttle=None, checkpoint=None,
+               prioritize=False):
+    profiler = profiler or MemoryProfiler(False)
     start_time = time.time()
 
     # Get disk usage statistics for this drive
     total, used, free = shutil.disk_usage(base_path)
 
-    # Try to get the list of items in the folder
+    # Track already scanned items by (st_dev, st_ino), so links and bind mounts count once
+    scanned = VisitedDirs()
+    scanned.first_visit(os.stat(base_path))  # Claim the root too, so a link back to it is not walked again
+    tree = ScanTree(base_path)
+    tree.disk_usage = (total, used, free)
+    if budget is not None:
+        budget.track(tree)
+
+    # Stream the items in the folder: files are summed in batches, folders come back for the fan-out
     try:
-        items = await asyncio.to_thread(os.listdir, base_path)
+        folders, files = await list_items(base_path, tree, scanned, throttle)
     except Exception as e:
         print(f"Error listing {base_path}: {e}")
-        return
-
-    # Track already scanned items (real path avoids double counting symbolic links)
-    scanned = set()
-    full_paths = []
-    for item in items:
-        item_path = os.path.join(base_path, item)
-        real_path = os.path.realpath(item_path)
-        if real_path not in scanned:
-            scanned.add(real_path)
-            full_paths.append(item_path)
-
-    # Create tasks to scan all items concurrently
-    tasks = [scan_item(path) for path in full_paths]
-    results = await asyncio.gather(*tasks)
-
-    # Filter out failed or skipped items
-    disk_data = [r for r in results if r]
-    item_count = len(disk_data)
-    total_size = sum(d["size"] for d in disk_data)
-
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-
-    # Show analysis time and memory usage
-    print(f"Analyze time: {elapsed_time} s.")
-    process = psutil.Process(os.getpid())
-    print(f"Memory used: {process.memory_info().rss / 1024 ** 2:.2f} MB")
-
-    # Display the results
-    show_analysis(disk_data, total, used, free)
-    plot(disk_data, base_path)
-    log_benchmark(base_path, item_count, total_size, elapsed_time, version="optimized")
+        return None
+    full_paths = [path for path, _ in folders]
+    inodes = {path: st.st_ino for path, st in folders}
+    item = scan_item
+    progress = None
+    if prioritize:
+        # Worker threads take the walks in submission order, so the largest go first
+        ordered, progress = largest_first(base_path, [(os.path.basename(path), path, st) for path, st in folders])
+        full_paths = [path for _, path, _ in ordered]
+        for row in file_rows(files):
+            progress.add(row["path"], row)  # Files are complete once listed
+
+        async def item(path, *args, **options):
+            row = await scan_item(path, *args, **options)
+            progress.add(os.path.basename(path), row)
+            return row
+    profiler.phase("list")
+
+    if follow_symlinks:
+        # Workers share the visited set, so a directory reached twice is only walked once
+        walk = partial(follow_walk, visited=scanned)
+        tasks = [item(path, tree, walk, budget, throttle, follow_symlinks=True) for path in full_paths]  # Not checkpointed
+        results = await asyncio.gather(*tasks)
+    elif is_rotational(base_path):
+        # Spinning disk: parallel walks only make the head jump between them,
+        # so scan one item at a time, in inode order, with an inode-ordered walk
+        # (prioritized: items largest first, each still walked in inode order)
+        print("Rotational disk detected: scanning sequentially in inode order.")
+        if progress is None:
+            full_paths.sort(key=inodes.get)
+        results = [await item(path, tree, inode_walk, budget, throttle, checkpoint) for path in full_paths]
+    else:
+        # Create tasks to scan all items concurrently
+        tasks = [item(path, tree, budget=budget, throttle=throttle, checkpoint=checkpoint) for path in full_paths]
+        # When stopping, every walker saves its own folder first, then the scan stops
+        results = await asyncio.gather(*tasks, return_exceptions=checkpoint is not None)
+        stopped = [r for r in results if isinstance(r, ScanStopped)]
+        if stopped:
+            raise stopped[0]
+
+    # Filter out failed or skipped items, then add the files
+    disk_data = [r for r in results if r] + file_rows(files)
+    if progress is not None:
+        progress.summary()
+    profiler.phase("scan")
+
+    return ScanResult("optimized", base_path, tree, disk_data, time.time() - start_time)
+
+#======================================================
+# Asynchronously analyze contents of a directory
+# With snapshot=True the per-directory results are also saved for later diffing
+# With memory_limit_mb, tree data beyond the budget is spilled to a temporary store
+# With follow_symlinks=True directory symlinks are followed at every level
+# With profile_memory=True traced memory is reported per scan phase (slower)
+# With owner_split=True usage per user is also shown for every item
+# With polite=True the scan runs at idle I/O priority with rate limits that
+# back off when the disk gets slow (see throttle.py); the previous priority
+# is restored afterwards where the system allows it
+# With checkpoint=True progress is saved to checkpoints/ while scanning, and
+# resume=True continues from the checkpoint left by an interrupted scan
+# With prioritize=True the largest folders are walked first (see scan())
+# Returns the scanned ScanTree, or None if it failed, was stopped or parts of it were spilled
+async def analyze(base_path="/", snapshot=False, memory_limit_mb=None, follow_symlinks=False, profile_memory=False,
+                  owner_split=False, polite=False, checkpoint=False, resume=False, prioritize=False):
+    print(f"Analyzing: {base_path}")
+    profiler = MemoryProfiler(profile_memory)  # Traces worker threads too
+    if checkpoint and follow_symlinks:
+        print("Checkpoints are not supported when following symlinks, scanning without them.")
+        checkpoint = False
+    if checkpoint and memory_limit_mb:
+        print("The memory limit is not used while checkpointing (the checkpoint already holds the tree).")
+        memory_limit_mb = None
+    budget = MemoryBudget(memory_limit_mb) if memory_limit_mb else None
+    throttle = None
+    previous_priority = None
+    if polite:
+        applied, previous_priority = lower_priority()
+        print(f"Polite mode: {', '.join(applied) or 'priority could not be lowered'}, rate limited.")
+        throttle = Throttle(base_path)
+    saver = None
+    if checkpoint:
+        if not resume:
+            remove_checkpoint(checkpoint_path(base_path))  # Start over
+        saver = Checkpoint(base_path)
+        print(f"Resuming from {saver.filename}" if saver.resumed else f"Checkpointing to {saver.filename}")
+    try:
+        try:
+            result = await scan(base_path, follow_symlinks, profiler, budget, throttle, saver, prioritize)
+        except (asyncio.CancelledError, KeyboardInterrupt, ScanStopped):
+            if saver is not None:
+                # Walker threads save their state and stop at their next check
+                saver.request_stop()
+                print(f"\nScan stopped, progress is kept in {saver.filename}; choose resume to continue.")
+            raise
+        if result is None:
+            profiler.stop()
+            return None
+        tree = result.tree
+        if throttle is not None:
+            print(throttle.summary())
+        if saver is not None:
+            result.checkpoint_time = saver.seconds
+            if saver.resumed:
+                result.version = "optimized-resumed"  # Elapsed time covers only the last part
+            print(f"Checkpoints: {saver.saves} saves, {saver.seconds:.2f} s "
+                  f"({saver.seconds / max(result.elapsed, 1e-9) * 100:.1f}% of the scan time)")
+            saver.finish()  # Complete: the checkpoint is no longer needed
+
+        if budget is not None:
+            budget.over()  # Record the final RSS too
+            print(f"Memory limit: {memory_limit_mb} MB, peak RSS seen: {budget.peak_rss / 1024 ** 2:.2f} MB, "
+                  f"directories spilled to disk: {tree.spilled}")
+
+        # Display the results
+        store = budget.store if budget is not None and tree.spilled else None
+        report_scan(result, snapshot, profiler, store, owner_split)
+    finally:
+        if budget is not None:
+            budget.close()
+        if polite and not restore_priority(previous_priority):
+            print("The priority could not be raised again (needs root): it stays lowered for the rest of this session.")
+    return tree if not tree.spilled else None
 
 #======================================================
 # Asynchronous folder navigation loop with interactive selection
-async def analyzer(start_drive):
+# With browser=True the scanned tree is opened in the full-screen browser instead
+# With profile_memory=True the first scan is profiled with tracemalloc
+# With owner_split=True every scan also shows usage per user of each item
+# With polite=True every scan runs at low priority and rate limited
+# With checkpoint/resume the first scan is checkpointed / resumed
+# With prioritize=True every scan walks the largest folders first
+async def analyzer(start_drive, snapshot=False, memory_limit_mb=None, follow_symlinks=False, browser=False,
+                   profile_memory=False, owner_split=False, polite=False, checkpoint=False, resume=False,
+                   prioritize=False):
     nested_directory = 0
-    await analyze(start_drive)  # Analyze starting folder
+    tree = await analyze(start_drive, snapshot, memory_limit_mb, follow_symlinks,
+                         profile_memory, owner_split, polite, checkpoint, resume, prioritize)  # Analyze starting folder
+    if browser:
+        if tree is not None:
+            return browse(tree)  # Navigates the tree in memory, no rescans
+        # Spilled trees can still be browsed from their saved tree file (option 4)
+        print("The scan tree is not fully in memory (spilled under the memory limit), using the menu instead.")
     nested_directory += 1
 
     old_path = [start_drive]  # Stack to keep track of visited folders
@@ -168,5 +501,6 @@ async def analyzer(start_drive):
         old_path.append(path)
         path = os.path.join(path, dirs[num - 1])
 
-        await analyze(path)
+        await analyze(path, memory_limit_mb=memory_limit_mb, follow_symlinks=follow_symlinks, owner_split=owner_split,
+                      polite=polite, prioritize=prioritize)
         nested_directory += 1
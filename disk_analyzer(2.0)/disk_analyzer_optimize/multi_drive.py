@@ -0,0 +1,134 @@
+#======================================================
+# Imports
+# Standard libraries for filesystem, timing and thread pools
+import os
+import shutil
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import psutil
+
+# Custom utilities for plotting, logging, and displaying results
+from disk_analyzer_utils.plotting import plot
+from disk_analyzer_utils.benchmark import log_benchmark
+from disk_analyzer_utils.utils import bytes_to_readable
+from disk_analyzer_utils.history import record_usage
+from disk_analyzer_utils.ages import AgeHistogram
+from disk_analyzer.analyzer import get_size, device_walk
+
+#======================================================
+# Threads per physical device. Small on purpose: more threads on one
+# spindle only add seeks, parallelism comes from scanning disks side by side.
+WORKERS_PER_DEVICE = 4
+
+#======================================================
+# Find the physical disk behind a partition device (e.g. /dev/sda2 -> sda).
+# Falls back to the device name itself when /sys/class/block is not available.
+def physical_device(device):
+    name = os.path.basename(os.path.realpath(device))
+    sys_path = os.path.realpath(os.path.join("/sys/class/block", name))
+    if os.path.exists(os.path.join(sys_path, "partition")):
+        return os.path.basename(os.path.dirname(sys_path))  # Partition -> its parent disk
+    if os.path.isdir(sys_path):
+        return name
+    return device
+
+#======================================================
+# Size and file count of a directory tree on filesystem `device`, with the
+# base engine's walker. Other partitions are scanned by their own device's
+# pool, and pseudo or virtual filesystems mounted below (/proc, /sys, tmpfs) are skipped.
+# The file count comes from the AgeHistogram's size buckets.
+def scan_dir(path, device):
+    ages = AgeHistogram()
+    total = get_size(path, ages, walk=partial(device_walk, device=device))
+    return total, int(ages.size_counts().sum())
+
+#======================================================
+# Scan every mounted partition at the same time, one bounded pool per physical device
+def analyze_all_drives(workers_per_device=WORKERS_PER_DEVICE):
+    start_time = time.time()
+
+    #--------------------------------------------------
+    # 1) Collect partitions, skipping filesystems that are mounted twice
+    drives = []
+    seen_devices = set()
+    for p in psutil.disk_partitions(all=False):
+        try:
+            dev = os.stat(p.mountpoint).st_dev
+            total, used, free = shutil.disk_usage(p.mountpoint)
+        except OSError as e:
+            print(f"Skipping {p.mountpoint}: {e}")
+            continue
+        if dev in seen_devices:
+            continue
+        seen_devices.add(dev)
+        drives.append({
+            "device": p.device, "mountpoint": p.mountpoint, "disk": physical_device(p.device),
+            "total": total, "used": used, "free": free,
+            "dev": dev, "size": 0, "count": 0, "start": time.time(), "end": time.time(),
+        })
+    print(f"Analyzing {len(drives)} drives on {len({d['disk'] for d in drives})} devices...")
+
+    #--------------------------------------------------
+    # 2) One pool per physical device; each top-level folder is one task on its drive's pool
+    pools = {
+        disk: ThreadPoolExecutor(max_workers=workers_per_device, thread_name_prefix=f"scan-{disk}")
+        for disk in {d["disk"] for d in drives}
+    }
+    futures = {}
+    try:
+        for drive in drives:
+            try:
+                with os.scandir(drive["mountpoint"]) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.stat(follow_symlinks=False).st_dev == drive["dev"]:  # Not a mount point
+                                futures[pools[drive["disk"]].submit(scan_dir, entry.path, drive["dev"])] = drive
+                        elif entry.is_file(follow_symlinks=False):
+                            drive["size"] += entry.stat(follow_symlinks=False).st_size
+                            drive["count"] += 1
+            except OSError as e:
+                print(f"Error listing {drive['mountpoint']}: {e}")
+
+        #--------------------------------------------------
+        # 3) Collect results as they finish; a drive's time ends with its last task
+        for future in as_completed(futures):
+            drive = futures[future]
+            size, count = future.result()
+            drive["size"] += size
+            drive["count"] += count
+            drive["end"] = time.time()
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    elapsed_time = time.time() - start_time
+    print(f"Analyze time: {elapsed_time} s.")
+    process = psutil.Process(os.getpid())
+    print(f"Memory used: {process.memory_info().rss / 1024 ** 2:.2f} MB")
+
+    #--------------------------------------------------
+    # 4) Combined report
+    show_all_drives(drives)
+    plot([{"path": d["mountpoint"], "size": d["size"]} for d in drives], "all drives")
+    for drive in drives:
+        log_benchmark(drive["mountpoint"], drive["count"], drive["size"],
+                      drive["end"] - drive["start"], version="all-drives", files=drive["count"])
+        record_usage(drive["mountpoint"], (drive["total"], drive["used"], drive["free"]))
+    return drives
+
+#======================================================
+# Display per-drive totals and scan timings in a formatted table
+def show_all_drives(drives):
+    print(f"\n{'Mount point':<20} {'Device':<12} {'Total':>10} {'Used':>10} {'Free':>10} "
+          f"{'Scanned':>10} {'Files':>10} {'Time (s)':>9}")
+    print("-" * 97)
+    for d in drives:
+        print(f"{d['mountpoint']:<20} {d['disk']:<12} {bytes_to_readable(d['total']):>10} "
+              f"{bytes_to_readable(d['used']):>10} {bytes_to_readable(d['free']):>10} "
+              f"{bytes_to_readable(d['size']):>10} {d['count']:>10} {d['end'] - d['start']:>9.2f}")
+    print("-" * 97)
+    print(f"{'All drives':<20} {'':<12} {bytes_to_readable(sum(d['total'] for d in drives)):>10} "
+          f"{bytes_to_readable(sum(d['used'] for d in drives)):>10} "
+          f"{bytes_to_readable(sum(d['free'] for d in drives)):>10} "
+          f"{bytes_to_readable(sum(d['size'] for d in drives)):>10} {sum(d['count'] for d in drives):>10}")
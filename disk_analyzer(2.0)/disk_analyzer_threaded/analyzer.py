@@ -0,0 +1,62 @@
+#======================================================
+# Imports
+# Standard libraries for filesystem, timing and thread pools
+import os
+import shutil
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Same listing and walker as the base engine, results in the shared ScanResult
+from disk_analyzer.analyzer import list_items, scan_item, add_item
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.engines import ScanResult, register_engine
+from disk_analyzer_utils.symlinks import VisitedDirs, follow_walk
+from disk_analyzer_utils.memprofile import MemoryProfiler
+from disk_analyzer_utils.priority import largest_first
+
+#======================================================
+# Worker threads (ThreadPoolExecutor's own default). os.walk and stat
+# release the GIL while they wait on the disk, so threads overlap I/O.
+MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+#======================================================
+# Thread-pool engine: every top-level item is one task on a ThreadPoolExecutor.
+# Each task builds its own subtree; results are grafted on this thread as
+# they complete, so the shared ScanTree never needs a lock.
+# With follow_symlinks=True directory symlinks are followed at every level
+# `profiler` (a MemoryProfiler) gets the "list" and "scan" phases
+# With prioritize=True tasks are submitted largest folder first, so the pool
+# starts (and usually finishes) the big subtrees first, see priority.py
+@register_engine("threadpool", "ThreadPoolExecutor, one task per top-level item")
+def scan(base_path="/", follow_symlinks=False, profiler=None, max_workers=MAX_WORKERS, prioritize=False):
+    profiler = profiler or MemoryProfiler(False)
+    start_time = time.time()
+
+    total, used, free = shutil.disk_usage(base_path)
+    scanned = VisitedDirs()  # Thread-safe, shared by every walk when following links
+    scanned.first_visit(os.stat(base_path))  # Claim the root too, so a link back to it is not walked again
+    walk = partial(follow_walk, visited=scanned) if follow_symlinks else os.walk
+    disk_data = []
+    tree = ScanTree(base_path)
+    tree.disk_usage = (total, used, free)
+
+    items = list_items(base_path, scanned)
+    progress = None
+    if prioritize:
+        items, progress = largest_first(base_path, items)
+    profiler.phase("list")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(scan_item, item, item_path, st, walk): item for item, item_path, st in items}
+        for future in as_completed(futures):
+            scanned_item = future.result()
+            if scanned_item is not None:
+                add_item(tree, disk_data, scanned_item)
+            if progress is not None:
+                progress.add(futures[future], scanned_item and scanned_item[0])
+    if progress is not None:
+        progress.summary()
+    profiler.phase("scan")
+
+    return ScanResult("threadpool", base_path, tree, disk_data, time.time() - start_time)
@@ -0,0 +1,81 @@
+#======================================================
+# Imports for file-age aggregation
+import time
+from array import array
+import numpy as np
+from disk_analyzer_utils.sizes import SizeHistogram
+
+#======================================================
+# Age thresholds (in days) used for the cold-data report
+AGE_THRESHOLDS_DAYS = (30, 90, 365)
+SECONDS_PER_DAY = 86400
+
+#======================================================
+# Collects (size, mtime, atime) of files and buckets them by age.
+# Stat values are only appended per file; the bucketing is done in
+# batches with NumPy so there is no per-file Python branching.
+# The sizes of every batch also go into a SizeHistogram (`sizes`), so the
+# file-size distribution costs the scan loop no extra call per file.
+class AgeHistogram:
+    def __init__(self, now=None, batch_size=65536):
+        self.now = time.time() if now is None else now
+        self.batch_size = batch_size
+        self._edges = np.array(AGE_THRESHOLDS_DAYS, dtype=np.float64) * SECONDS_PER_DAY
+        self._reset_batch()
+
+        # Bucket 0 = younger than the first threshold, last bucket = older than the last one
+        self.mtime_bytes = np.zeros(len(AGE_THRESHOLDS_DAYS) + 1, dtype=np.float64)
+        self.atime_bytes = np.zeros(len(AGE_THRESHOLDS_DAYS) + 1, dtype=np.float64)
+        self.sizes = SizeHistogram()
+
+    def _reset_batch(self):
+        self._sizes = array("d")
+        self._mtimes = array("d")
+        self._atimes = array("d")
+
+    #--------------------------------------------------
+    # Record one file from the stat result the scan already has
+    def add(self, st):
+        self._sizes.append(st.st_size)
+        self._mtimes.append(st.st_mtime)
+        self._atimes.append(st.st_atime)
+        if len(self._sizes) >= self.batch_size:
+            self.flush()
+
+    #--------------------------------------------------
+    # Fold the pending batch into the age buckets
+    def flush(self):
+        if not self._sizes:
+            return
+        sizes = np.frombuffer(self._sizes, dtype=np.float64)
+        for times, buckets in ((self._mtimes, self.mtime_bytes), (self._atimes, self.atime_bytes)):
+            ages = self.now - np.frombuffer(times, dtype=np.float64)
+            idx = np.searchsorted(self._edges, ages, side="right")
+            buckets += np.bincount(idx, weights=sizes, minlength=len(buckets))
+        self.sizes.add_sizes(sizes)
+        self._reset_batch()
+
+    #--------------------------------------------------
+    # Combine another histogram (e.g. from a worker thread) into this one
+    def merge(self, other):
+        other.flush()
+        self.flush()
+        self.mtime_bytes += other.mtime_bytes
+        self.atime_bytes += other.atime_bytes
+        self.sizes.merge(other.sizes)
+
+    #--------------------------------------------------
+    # Bytes not modified / not accessed for at least N days
+    def cold_bytes(self):
+        self.flush()
+        result = {}
+        for key, buckets in (("mtime", self.mtime_bytes), ("atime", self.atime_bytes)):
+            older = np.cumsum(buckets[::-1])[::-1]  # older[i] = bytes in bucket i and above
+            result[key] = {days: int(older[i + 1]) for i, days in enumerate(AGE_THRESHOLDS_DAYS)}
+        return result
+
+    #--------------------------------------------------
+    # File counts per size bucket, for a result row's "sizes" (see sizes.py)
+    def size_counts(self):
+        self.flush()
+        return self.sizes.counts.copy()
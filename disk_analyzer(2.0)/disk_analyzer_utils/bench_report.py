@@ -0,0 +1,257 @@
+#======================================================
+# Imports for reading benchmark history back and finding regressions
+import os
+import math
+import sqlite3
+from datetime import datetime
+import numpy as np
+import matplotlib.pyplot as plt
+from disk_analyzer_utils.metrics import get_metrics_sink, NOT_FILE_COUNTS
+from disk_analyzer_utils.utils import bytes_to_readable
+
+#======================================================
+# Defaults for the regression checks
+LEGACY_CSV_LOG = "benchmark_log.csv"  # Imported into the metrics store once, if present
+REFERENCE_VERSION = "base"  # Other versions are compared against this one
+RECENT_RUNS = 5             # Newest runs of a group compared against its older runs
+MIN_RUNS = 3                # Fewer runs than this on either side are not tested
+ALPHA = 0.05                # Significance level of the one-sided test
+MIN_DROP = 0.10             # Slowdowns under 10% (median throughput) are not flagged
+
+#======================================================
+# Load benchmark runs from a metrics sink with their files/second throughput
+# and, for scans run with memory profiling, their traced memory phases.
+# Throughput uses the "files" column only: item_count has meant top-level
+# items in early versions and every file later. The store fills in files for
+# older runs where item_count is known to count files (see metrics.py); the
+# rest (estimates, and base/optimized runs from a CSV log) are left out.
+# Runs that cannot be used (e.g. legacy rows with bad values) are skipped.
+def load_runs(sink=None):
+    sink = sink or get_metrics_sink()
+    phases = sink.read_memory_phases() if hasattr(sink, "read_memory_phases") else {}
+    runs = []
+    skipped = estimates = unknown = 0
+    for row in sink.read():
+        if row.get("files") is None:
+            if row.get("version") in NOT_FILE_COUNTS:
+                estimates += 1
+            else:
+                unknown += 1
+            continue
+        try:
+            files = int(row["files"])
+            elapsed = float(row["elapsed_time_sec"])
+            runs.append({
+                "version": row["version"],
+                "time": datetime.fromtimestamp(float(row["timestamp"])),
+                "path": row["path"],
+                "files": files,
+                "bytes": int(row["total_size_bytes"]),
+                "elapsed": elapsed,
+                "files_per_sec": files / elapsed if elapsed > 0 else math.nan,
+                "memory_phases": phases.get(row.get("id"), []),
+            })
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+    if skipped:
+        print(f"Skipped {skipped} unreadable runs")
+    if estimates:
+        print(f"Left out {estimates} estimate runs (they count directories listed, not files)")
+    if unknown:
+        print(f"Left out {unknown} runs without a file count (base/optimized runs from a CSV log, "
+              f"whose item count may be top-level items)")
+    return [run for run in runs if not math.isnan(run["files_per_sec"])]
+
+#======================================================
+# Tree size class of a run: the order of magnitude of its file count,
+# so only scans of similar size are compared with each other
+def size_bucket(files):
+    return 0 if files < 10 else int(math.log10(files))
+
+def bucket_label(bucket):
+    return f"~1e{bucket} files"
+
+#======================================================
+# One-sided Mann-Whitney U test (normal approximation with tie correction):
+# p-value for "values in `a` tend to be smaller than values in `b`".
+# Rank based, so a few outlier runs (cold caches, busy machine) do not dominate.
+def mann_whitney_less(a, b):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    n1, n2 = len(a), len(b)
+    values = np.concatenate([a, b])
+    order = values.argsort(kind="mergesort")
+    _, first, counts = np.unique(values[order], return_index=True, return_counts=True)
+    ranks = np.empty(len(values))
+    ranks[order] = np.repeat(first + (counts + 1) / 2, counts)  # Average rank for ties
+
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    tie_term = (counts ** 3 - counts).sum() / (n * (n - 1))
+    sd = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sd == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 + 0.5) / sd  # +0.5 continuity correction
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+#======================================================
+# Compare throughput samples; a slowdown is flagged only when it is both
+# significant and at least `min_drop` on the medians
+def compare(slow, fast, alpha=ALPHA, min_drop=MIN_DROP):
+    slow_median = float(np.median(slow))
+    fast_median = float(np.median(fast))
+    ratio = slow_median / fast_median if fast_median else math.nan
+    p_value = mann_whitney_less(slow, fast)
+    return {
+        "ratio": ratio,
+        "p_value": p_value,
+        "regression": p_value < alpha and ratio <= 1 - min_drop,
+    }
+
+#======================================================
+# Group runs by (version, path, size bucket) and look for slowdowns:
+#   - between versions: every version against REFERENCE_VERSION on the same path and size
+#   - over time: the newest RECENT_RUNS runs of a group against its older runs
+def analyze_benchmarks(runs, recent=RECENT_RUNS, alpha=ALPHA, min_drop=MIN_DROP):
+    groups = {}
+    for run in sorted(runs, key=lambda r: r["time"]):
+        groups.setdefault((run["version"], run["path"], size_bucket(run["files"])), []).append(run)
+
+    summary = []
+    for (version, path, bucket), group in sorted(groups.items()):
+        rates = [run["files_per_sec"] for run in group]
+        peaks = [max(p["peak_bytes"] for p in run["memory_phases"]) for run in group if run["memory_phases"]]
+        summary.append({
+            "version": version, "path": path, "bucket": bucket, "runs": len(group),
+            "median": float(np.median(rates)),
+            "q1": float(np.percentile(rates, 25)), "q3": float(np.percentile(rates, 75)),
+            "last": group[-1]["time"],
+            "profiled": len(peaks),
+            "peak_traced": float(np.median(peaks)) if peaks else None,
+            "phases": next((run["memory_phases"] for run in reversed(group) if run["memory_phases"]), []),
+        })
+
+    #--------------------------------------------------
+    # 1) Versions against the reference version
+    versions = []
+    for (version, path, bucket), group in sorted(groups.items()):
+        reference = groups.get((REFERENCE_VERSION, path, bucket))
+        if version == REFERENCE_VERSION or reference is None:
+            continue
+        if len(group) < MIN_RUNS or len(reference) < MIN_RUNS:
+            continue
+        result = compare([r["files_per_sec"] for r in group], [r["files_per_sec"] for r in reference],
+                         alpha, min_drop)
+        versions.append({"version": version, "path": path, "bucket": bucket, **result})
+
+    #--------------------------------------------------
+    # 2) Recent runs against the history of the same group
+    history = []
+    for (version, path, bucket), group in sorted(groups.items()):
+        older, newer = group[:-recent], group[-recent:]
+        if len(older) < MIN_RUNS or len(newer) < MIN_RUNS:
+            continue
+        result = compare([r["files_per_sec"] for r in newer], [r["files_per_sec"] for r in older],
+                         alpha, min_drop)
+        history.append({"version": version, "path": path, "bucket": bucket,
+                        "since": newer[0]["time"], **result})
+
+    return {"groups": groups, "summary": summary, "versions": versions, "history": history}
+
+#======================================================
+# Print the per-group throughput and every comparison, regressions marked
+def show_benchmark_report(report):
+    print(f"\n{'Version':<12} {'Path':<25} {'Tree size':<14} {'Runs':>5} {'Median files/s':>15} {'IQR':>21}")
+    print("-" * 97)
+    for s in report["summary"]:
+        print(f"{s['version']:<12} {s['path']:<25} {bucket_label(s['bucket']):<14} {s['runs']:>5} "
+              f"{s['median']:>15,.0f} {s['q1']:>10,.0f}-{s['q3']:<10,.0f}")
+
+    print(f"\nVersus {REFERENCE_VERSION!r} (same path and tree size)")
+    print(f"{'Version':<12} {'Path':<25} {'Tree size':<14} {'Speed':>8} {'p-value':>9}")
+    print("-" * 72)
+    for c in report["versions"]:
+        flag = "  SLOWER" if c["regression"] else ""
+        print(f"{c['version']:<12} {c['path']:<25} {bucket_label(c['bucket']):<14} "
+              f"{c['ratio']:>7.2f}x {c['p_value']:>9.4f}{flag}")
+
+    print(f"\nRecent runs versus earlier runs of the same group")
+    print(f"{'Version':<12} {'Path':<25} {'Tree size':<14} {'Speed':>8} {'p-value':>9}  Since")
+    print("-" * 90)
+    for c in report["history"]:
+        flag = "  REGRESSION" if c["regression"] else ""
+        print(f"{c['version']:<12} {c['path']:<25} {bucket_label(c['bucket']):<14} "
+              f"{c['ratio']:>7.2f}x {c['p_value']:>9.4f}  {c['since']:%Y-%m-%d %H:%M}{flag}")
+
+    profiled = [s for s in report["summary"] if s["profiled"]]
+    if profiled:
+        print(f"\nTraced memory of profiled runs (tracemalloc)")
+        print(f"{'Version':<12} {'Path':<25} {'Tree size':<14} {'Runs':>5} {'Median peak':>12}  Latest run by phase")
+        print("-" * 100)
+        for s in profiled:
+            phases = ", ".join(f"{p['phase']} {bytes_to_readable(p['peak_bytes'])}" for p in s["phases"])
+            print(f"{s['version']:<12} {s['path']:<25} {bucket_label(s['bucket']):<14} {s['profiled']:>5} "
+                  f"{bytes_to_readable(s['peak_traced']):>12}  {phases}")
+
+    flagged = [c for c in report["versions"] + report["history"] if c["regression"]]
+    print(f"\n{len(flagged)} significant slowdown(s) found." if flagged else "\nNo significant slowdowns found.")
+
+#======================================================
+# Charts: median throughput of each version per path/size (IQR as error bars)
+# and throughput of every run over time
+def plot_benchmark_report(report):
+    summary = report["summary"]
+    if not summary:
+        print("No benchmark runs to plot.")
+        return
+    fig, (bars, timeline) = plt.subplots(2, 1, figsize=(12, 9))
+
+    #--------------------------------------------------
+    # 1) Versions side by side for each path and tree size
+    cases = sorted({(s["path"], s["bucket"]) for s in summary})
+    versions = sorted({s["version"] for s in summary}, key=lambda v: (v != REFERENCE_VERSION, v))
+    width = 0.8 / len(versions)
+    by_key = {(s["version"], s["path"], s["bucket"]): s for s in summary}
+    for i, version in enumerate(versions):
+        stats = [by_key.get((version, path, bucket)) for path, bucket in cases]
+        medians = [s["median"] if s else 0 for s in stats]
+        errors = [[s["median"] - s["q1"] if s else 0 for s in stats],
+                  [s["q3"] - s["median"] if s else 0 for s in stats]]
+        bars.bar(np.arange(len(cases)) + i * width, medians, width, yerr=errors, capsize=3, label=version)
+    bars.set_xticks(np.arange(len(cases)) + width * (len(versions) - 1) / 2)
+    bars.set_xticklabels([f"{path}\n{bucket_label(bucket)}" for path, bucket in cases], fontsize=8)
+    bars.set_ylabel("Files / second (median)")
+    bars.set_title("Throughput by version")
+    bars.legend()
+
+    #--------------------------------------------------
+    # 2) Every run over time, one line per group
+    for (version, path, bucket), group in report["groups"].items():
+        timeline.plot([r["time"] for r in group], [r["files_per_sec"] for r in group], marker="o",
+                      label=f"{version} {path} {bucket_label(bucket)}")
+    timeline.set_ylabel("Files / second")
+    timeline.set_title("Throughput over time")
+    timeline.legend(fontsize=7)
+    fig.autofmt_xdate()
+
+    plt.tight_layout()
+    plt.show(block=False)
+    print("Close the plot window manually to finish.")
+
+#======================================================
+# Load the runs, print the report and show the charts
+def benchmark_report(sink=None):
+    sink = sink or get_metrics_sink()
+    try:
+        if os.path.exists(LEGACY_CSV_LOG) and hasattr(sink, "import_csv"):
+            imported = sink.import_csv(LEGACY_CSV_LOG)
+            if imported:
+                print(f"Imported {imported} runs from {LEGACY_CSV_LOG}")
+        runs = load_runs(sink)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Cannot read benchmark metrics: {e}")
+        return None
+    report = analyze_benchmarks(runs)
+    show_benchmark_report(report)
+    plot_benchmark_report(report)
+    return report
@@ -1,60 +1,61 @@
 #======================================================
 # Imports required for logging system and process metrics
 import os
-import csv
-from datetime import datetime
+import time
+import random
+import subprocess
+from contextlib import contextmanager
 import psutil
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.rotational import is_rotational, inode_walk
+from disk_analyzer_utils.metrics import METRIC_COLUMNS, get_metrics_sink
 
 #======================================================
-# Function to log performance metrics into a CSV file
+# Function to log performance metrics into the metrics store
 def log_benchmark(
     path,              # Path that was scanned
-    item_count,        # Number of files/folders processed
+    item_count,        # Number of files/folders processed (differs between callers, see `files`)
     total_size,        # Aggregate size in bytes of all processed items
     elapsed_time,      # Time taken (in seconds) to complete the scan
     version,           # "base" or "optimized"
-    filename="benchmark_log.csv"  # CSV file to append results to
+    sink=None,         # MetricsSink to record to (default: the shared SQLite store)
+    memory_phases=None,# Per-phase memory of a profiled scan (MemoryProfiler.phases)
+    checkpoint_time=None,# Seconds spent writing checkpoints, for checkpointed scans
+    files=None         # Files scanned, the count the benchmark report's files/second uses (None if not counted)
 ):
     """
-    Logs a detailed performance benchmark into a CSV file.
-    Includes system and process stats at the time of logging.
+    Logs a detailed performance benchmark into the metrics store
+    (benchmark_log.db, see metrics.py). Includes system and process stats
+    at the time of logging.
     
     Metrics:
       - Program version ("base" vs "optimized")
       - Timestamp
       - Path scanned
-      - Item count and total size
+      - Item count, file count and total size
       - Elapsed time
       - CPU and memory usage
       - System-wide disk I/O
       - Process-specific disk I/O
       - Thread count
       - Context-switch counts
+      - Traced memory per scan phase, if the scan was profiled
+      - Checkpoint overhead, if the scan was checkpointed
     """
 
     #======================================================
-    # 1) Define the CSV header (only used when creating a new file)
-    header = [
-        "version", "timestamp", "path", "item_count", "total_size_bytes",
-        "elapsed_time_sec", "cpu_percent", "mem_percent",
-        "disk_read_bytes", "disk_write_bytes",
-        "proc_read_bytes", "proc_write_bytes",
-        "num_threads", "ctx_switches_vol", "ctx_switches_invol"
-    ]
-
-    #======================================================
-    # 2) Collect system-wide CPU and memory usage
+    # 1) Collect system-wide CPU and memory usage
     cpu_pct = psutil.cpu_percent(interval=None)         # Percent CPU usage
     mem_pct = psutil.virtual_memory().percent           # Percent RAM used
 
     #======================================================
-    # 3) Get global disk I/O stats (since system start)
+    # 2) Get global disk I/O stats (since system start)
     disk_io = psutil.disk_io_counters()
     disk_read_bytes = disk_io.read_bytes
     disk_write_bytes = disk_io.write_bytes
 
     #======================================================
-    # 4) Get stats specific to the current Python process
+    # 3) Get stats specific to the current Python process
     proc = psutil.Process()
     io = proc.io_counters()
     proc_read_bytes = io.read_bytes
@@ -65,30 +66,100 @@ def log_benchmark(
     ctx_invol = ctx.involuntary
 
     #======================================================
-    # 5) Prepare the row of data to write to CSV
-    row = [
+    # 4) Hand the run to the metrics sink (committed at once by default, safe with concurrent scans)
+    values = [
         version,
-        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        time.time(),
         path,
         item_count,
         total_size,
-        f"{elapsed_time:.4f}",
-        f"{cpu_pct:.1f}",
-        f"{mem_pct:.1f}",
+        round(elapsed_time, 4),
+        cpu_pct,
+        mem_pct,
         disk_read_bytes,
         disk_write_bytes,
         proc_read_bytes,
         proc_write_bytes,
         num_threads,
         ctx_vol,
-        ctx_invol
+        ctx_invol,
+        None if checkpoint_time is None else round(checkpoint_time, 4),
+        files
     ]
+    row = dict(zip(METRIC_COLUMNS, values))
+    row["memory_phases"] = memory_phases
+    (sink or get_metrics_sink()).write(row)
 
-    #======================================================
-    # 6) Append the row to the CSV file (add header if new file)
-    write_header = not os.path.exists(filename)
-    with open(filename, mode="a", newline="") as f:
-        writer = csv.writer(f)
-        if write_header:
-            writer.writerow(header)
-        writer.writerow(row)
+#======================================================
+# Drop the kernel page/dentry/inode caches so every run reads the disk (root only)
+def drop_caches():
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+#======================================================
+# (files, bytes) under `path`, summed by the base engine's get_size with the
+# given os.walk-compatible walker; the file count comes from its ScanTree
+def _walk_size(path, walk):
+    from disk_analyzer.analyzer import get_size  # It imports this module (through engines.py)
+    tree = ScanTree(path)
+    total = get_size(path, tree=tree, walk=walk)
+    tree.rollup()
+    return tree.counts[0], total
+
+#======================================================
+# Create a file-backed ext4 image, mount it on a loop device and fill it with
+# a test tree (root only). Files are created in shuffled order so directory
+# order and inode order differ, like on a long-lived filesystem.
+# A context manager giving the mount point; the image is unmounted when the
+# block ends, also if filling it or the benchmark fails:
+#   with make_test_image("/tmp/test.img", "/mnt/test") as path:
+#       benchmark_traversal_order(path)
+@contextmanager
+def make_test_image(image_path, mount_point, size_mb=1024, dirs=200, files_per_dir=200):
+    subprocess.check_call(["truncate", "-s", f"{size_mb}M", image_path])
+    subprocess.check_call(["mkfs.ext4", "-q", "-F", image_path])
+    os.makedirs(mount_point, exist_ok=True)
+    subprocess.check_call(["mount", "-o", "loop", image_path, mount_point])
+    try:
+        jobs = [(d, f) for d in range(dirs) for f in range(files_per_dir)]
+        random.shuffle(jobs)
+        for d, f in jobs:
+            folder = os.path.join(mount_point, f"dir{d:04d}")
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, f"file{f:05d}"), "wb") as out:
+                out.write(b"\0" * random.randint(0, 8192))
+        yield mount_point
+    finally:
+        subprocess.check_call(["umount", mount_point])
+
+#======================================================
+# Compare directory-order (os.walk) and inode-order traversal on a (cold) disk.
+# Every run is logged with log_benchmark as version "walk-order" / "inode-order".
+def benchmark_traversal_order(path, repeat=3):
+    print(f"Benchmarking traversal order on {path} (rotational: {is_rotational(path)})")
+    cold = True
+    results = {}
+    for version, walk in (("walk-order", os.walk), ("inode-order", inode_walk)):
+        results[version] = []
+        for _ in range(repeat):
+            cold = drop_caches() and cold
+            start_time = time.time()
+            count, total = _walk_size(path, walk)
+            elapsed_time = time.time() - start_time
+            results[version].append(elapsed_time)
+            log_benchmark(path, count, total, elapsed_time, version=version, files=count)
+
+    if not cold:
+        print("Could not drop caches (needs root): timings are warm-cache and understate the gain.")
+    print(f"\n{'Order':<15} {'Best (s)':>10} {'Mean (s)':>10}")
+    print("-" * 37)
+    for version, times in results.items():
+        print(f"{version:<15} {min(times):>10.4f} {sum(times) / len(times):>10.4f}")
+    speedup = min(results["walk-order"]) / max(min(results["inode-order"]), 1e-9)
+    print(f"Inode order speed-up: {speedup:.2f}x")
+    return results
@@ -0,0 +1,190 @@
+#======================================================
+# Imports for the full-screen (ncdu-style) tree browser
+import numpy as np
+from disk_analyzer_utils.utils import bytes_to_readable
+from disk_analyzer_utils.treefile import MappedTree
+
+try:
+    import curses  # Not bundled with Python on Windows (needs the windows-curses package)
+except ImportError:
+    curses = None
+
+SORT_KEYS = ("size", "count")
+BAR_WIDTH = 10
+
+#======================================================
+# Whether the full-screen browser can run on this system
+def browser_available():
+    return curses is not None
+
+#======================================================
+# Child lookup over an already scanned tree (a ScanTree or a MappedTree).
+# Only the in-memory / mapped columns are used, so opening a directory
+# never touches the filesystem, and every lookup is vectorized with NumPy.
+class TreeIndex:
+    def __init__(self, tree):
+        self.tree = tree
+        if isinstance(tree, MappedTree):
+            # Pre-order: the children of i are found by hopping from one child subtree to the next
+            self.sizes, self.counts, self.parents = tree.sizes, tree.counts, tree.parents
+            self.name = tree.name
+            self._ends = tree.ends
+        else:
+            # ScanTree: group node indexes by parent once, a lookup is then two binary searches
+            tree.rollup()
+            self.sizes = np.array(tree.sizes, dtype=np.int64)
+            self.counts = np.array(tree.counts, dtype=np.int64)
+            self.parents = np.array(tree.parents, dtype=np.int64)
+            self.name = tree.names.__getitem__
+            self._ends = None
+            self._by_parent = np.argsort(self.parents, kind="stable")
+            self._sorted_parents = self.parents[self._by_parent]
+
+    def path(self, node):
+        return self.tree.path(node)
+
+    #--------------------------------------------------
+    # Child node indexes of `node` as an array, sorted by size or file count (largest first)
+    def children(self, node, sort_key="size"):
+        if self._ends is not None:
+            kids = np.array(self.tree.children(node), dtype=np.int64)  # O(children), only their pages are read
+        else:
+            lo, hi = np.searchsorted(self._sorted_parents, [node, node + 1])
+            kids = self._by_parent[lo:hi]
+        column = self.sizes if sort_key == "size" else self.counts
+        return kids[np.argsort(-column[kids], kind="stable")]
+
+#======================================================
+# Curses browser state. Only the rows that fit on the screen are drawn,
+# so a directory with millions of children scrolls as fast as a small one.
+class Browser:
+    def __init__(self, tree):
+        self.index = TreeIndex(tree)
+        self.sort_key = SORT_KEYS[0]
+        self.levels = []  # Parent levels: (node, rows, sort key, cursor, top)
+        self._enter(0)
+
+    #--------------------------------------------------
+    # Show the children of `node`, cursor on the first (or given) row
+    def _enter(self, node, rows=None, cursor=0, top=0):
+        self.node = node
+        self.rows = self.index.children(node, self.sort_key) if rows is None else rows
+        self.cursor = cursor
+        self.top = top
+        # Bytes of files directly in this folder (not in any subdirectory)
+        self.direct_size = int(self.index.sizes[node]) - int(self.index.sizes[self.rows].sum())
+
+    def _resort(self):
+        selected = self.rows[self.cursor] if len(self.rows) else None
+        self._enter(self.node)
+        if selected is not None:
+            self.cursor = int(np.flatnonzero(self.rows == selected)[0])
+
+    #--------------------------------------------------
+    # Navigation; returns False when the root is left
+    def open_selected(self):
+        if len(self.rows):
+            self.levels.append((self.node, self.rows, self.sort_key, self.cursor, self.top))
+            self._enter(int(self.rows[self.cursor]))
+
+    def go_up(self):
+        if not self.levels:
+            return False
+        node, rows, sort_key, cursor, top = self.levels.pop()
+        self._enter(node, rows, cursor, top)
+        if sort_key != self.sort_key:
+            self._resort()  # Sort order was changed further down
+        return True
+
+    def toggle_sort(self):
+        self.sort_key = SORT_KEYS[(SORT_KEYS.index(self.sort_key) + 1) % len(SORT_KEYS)]
+        self._resort()
+
+    #--------------------------------------------------
+    # Draw header, the visible slice of rows and the key help
+    def draw(self, screen):
+        height, width = screen.getmaxyx()
+        list_height = max(height - 3, 1)
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + list_height:
+            self.top = self.cursor - list_height + 1
+
+        index = self.index
+        total = int(index.sizes[self.node])
+        screen.erase()
+        _put(screen, 0, width, f" {index.path(self.node)}   {bytes_to_readable(total)} in "
+                               f"{int(index.counts[self.node]):,} files   (sorted by {self.sort_key})",
+             curses.A_REVERSE)
+
+        if not len(self.rows):
+            _put(screen, 1, width, "   (no subdirectories)")
+        for row, child in enumerate(self.rows[self.top:self.top + list_height], start=1):
+            size = int(index.sizes[child])
+            share = size / total if total else 0
+            bar = "#" * round(share * BAR_WIDTH)
+            line = (f" {bytes_to_readable(size):>10} {share * 100:>6.1f}% [{bar:<{BAR_WIDTH}}] "
+                    f"{int(index.counts[child]):>12,}  {_printable(index.name(child))}/")
+            selected = self.top + row - 1 == self.cursor
+            _put(screen, row, width, line, curses.A_REVERSE if selected else curses.A_NORMAL)
+
+        _put(screen, height - 2, width,
+             f" {len(self.rows):,} subdirectories, {bytes_to_readable(self.direct_size)} in files directly here")
+        _put(screen, height - 1, width,
+             " Up/Down move  PgUp/PgDn page  Enter/Right open  Left/Backspace back  s sort  q quit",
+             curses.A_REVERSE)
+        screen.refresh()
+        return list_height
+
+    #--------------------------------------------------
+    # Key loop. Returns True when the user backs out of the root
+    # (same as "0" in the text menu, restart), False on quit.
+    def run(self, screen):
+        curses.curs_set(0)
+        screen.keypad(True)
+        while True:
+            page = self.draw(screen)
+            key = screen.getch()
+            last = len(self.rows) - 1
+            if key in (curses.KEY_UP, ord("k")):
+                self.cursor = max(self.cursor - 1, 0)
+            elif key in (curses.KEY_DOWN, ord("j")):
+                self.cursor = max(min(self.cursor + 1, last), 0)
+            elif key == curses.KEY_PPAGE:
+                self.cursor = max(self.cursor - page, 0)
+            elif key == curses.KEY_NPAGE:
+                self.cursor = max(min(self.cursor + page, last), 0)
+            elif key in (curses.KEY_HOME, ord("g")):
+                self.cursor = 0
+            elif key in (curses.KEY_END, ord("G")):
+                self.cursor = max(last, 0)
+            elif key in (curses.KEY_ENTER, curses.KEY_RIGHT, ord("\n"), ord("\r"), ord("l")):
+                self.open_selected()
+            elif key in (curses.KEY_LEFT, curses.KEY_BACKSPACE, 127, 8, ord("h")):
+                if not self.go_up():
+                    return True
+            elif key == ord("s"):
+                self.toggle_sort()
+            elif key == ord("q"):
+                return False
+
+#======================================================
+# Write one screen line, clipped to the terminal width
+def _put(screen, y, width, text, attr=0):
+    try:
+        screen.addnstr(y, 0, text.ljust(width), max(width - 1, 0), attr)
+    except curses.error:
+        pass  # Terminal too small
+
+#======================================================
+# Names can hold undecodable bytes (surrogates) curses cannot print
+def _printable(name):
+    return name.encode("utf-8", "backslashreplace").decode("utf-8")
+
+#======================================================
+# Browse a scanned tree full-screen; see Browser.run for the return value
+def browse(tree):
+    if curses is None:
+        raise RuntimeError("curses is not available (on Windows install the windows-curses package)")
+    browser = Browser(tree)  # Built before curses starts, so errors print normally
+    return curses.wrapper(browser.run)
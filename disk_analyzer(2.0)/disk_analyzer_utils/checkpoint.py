@@ -0,0 +1,173 @@
+#======================================================
+# Imports for checkpointing and resuming long scans
+import os
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+from disk_analyzer_utils.ages import AgeHistogram
+from disk_analyzer_utils.sizes import SizeHistogram
+from disk_analyzer_utils.owners import OwnerUsage
+from disk_analyzer_utils.tree import ScanTree
+
+#======================================================
+# Defaults for checkpoints
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SEC = 30     # Seconds between checkpoints of one folder's walk
+CHECK_EVERY_DIRS = 256  # Directories walked between looks at the clock / stop flag
+
+#======================================================
+# Raised in a walker thread after it saved its state because the scan is stopping
+class ScanStopped(Exception):
+    pass
+
+#--------------------------------------------------
+# Checkpoint file of a scan root (one per root, like snapshot names)
+def checkpoint_path(base_path, directory=CHECKPOINT_DIR):
+    safe_root = os.path.abspath(base_path).strip(os.sep).replace(os.sep, "_").replace(":", "") or "root"
+    return os.path.join(directory, f"{safe_root}.ckpt")
+
+#--------------------------------------------------
+# Delete the checkpoint of a scan root (with its SQLite WAL files)
+def remove_checkpoint(filename):
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(filename + suffix)
+        except OSError:
+            pass
+
+#======================================================
+# Checkpoint of one scan in a small SQLite file. Every top-level folder is
+# saved on its own, by the thread walking it, between two directories:
+#   - nodes:    the folder's ScanTree rows. Only nodes added since the last save
+#               are inserted, and nodes that were pending then and are walked
+#               now get their final size/count, so a save costs what was walked
+#               since the previous one, not the whole tree
+#   - frontier: directories listed but not walked yet (path, node)
+#   - items:    running total, cold-data and owner totals, and whether it is done
+# Resuming walks only the frontier of every unfinished folder, so the result
+# is the same as that of an uninterrupted scan.
+class Checkpoint:
+    def __init__(self, base_path, directory=CHECKPOINT_DIR, every_sec=CHECKPOINT_SEC):
+        os.makedirs(directory, exist_ok=True)
+        self.filename = checkpoint_path(base_path, directory)
+        self.every_sec = every_sec
+        self.seconds = 0.0  # Time spent saving, for the benchmark log
+        self.saves = 0
+        self._lock = threading.Lock()  # One connection shared by the walker threads
+        self._stop = threading.Event()
+        self._saved = {}   # item -> (nodes saved so far, node indexes pending at that save)
+        self._last = {}    # item -> time of its last save
+
+        self.db = sqlite3.connect(self.filename, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS items (name TEXT PRIMARY KEY, done INTEGER, total INTEGER, "
+                        "ages TEXT, owners TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS nodes (item TEXT, node INTEGER, parent INTEGER, name TEXT, "
+                        "size INTEGER, count INTEGER, PRIMARY KEY (item, node))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS frontier (item TEXT, node INTEGER, path TEXT)")
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('version', ?)", (str(CHECKPOINT_VERSION),))
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('base_path', ?)", (os.path.abspath(base_path),))
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('started', ?)", (str(time.time()),))
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if int(meta["version"]) != CHECKPOINT_VERSION or meta["base_path"] != os.path.abspath(base_path):
+            self.db.close()
+            raise ValueError(f"{self.filename} is not a checkpoint of {base_path} (v{CHECKPOINT_VERSION})")
+        self.started = float(meta["started"])
+        self.resumed = self.db.execute("SELECT COUNT(*) FROM items").fetchone()[0] > 0
+
+    #--------------------------------------------------
+    # Ask every walker to save and stop (Ctrl-C); they raise ScanStopped
+    def request_stop(self):
+        self._stop.set()
+
+    @property
+    def stopping(self):
+        return self._stop.is_set()
+
+    # The first save of a folder is due CHECKPOINT_SEC after its walk started
+    def due(self, name):
+        return time.time() - self._last.setdefault(name, time.time()) >= self.every_sec
+
+    #--------------------------------------------------
+    # Save the state of one folder's walk (called by the thread walking it).
+    # `pending` maps the paths not walked yet to their node in `tree`.
+    def save_item(self, name, tree, pending, total, ages, owners, done=False):
+        start = time.perf_counter()
+        ages.flush()
+        owners.flush()
+        ages_state = json.dumps({"now": ages.now, "mtime": ages.mtime_bytes.tolist(),
+                                 "atime": ages.atime_bytes.tolist(), "sizes": ages.sizes.state()})
+        owners_state = json.dumps({"users": [[k, *v] for k, v in owners.users.items()],
+                                   "groups": [[k, *v] for k, v in owners.groups.items()]})
+        pending_nodes = set(pending.values())
+
+        with self._lock:
+            saved, was_pending = self._saved.get(name, (0, set()))
+            new_rows = [(name, i, tree.parents[i], tree.names[i], tree.sizes[i], tree.counts[i])
+                        for i in range(saved, len(tree))]
+            walked = [(tree.sizes[i], tree.counts[i], name, i) for i in was_pending - pending_nodes]
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?)", new_rows)
+                self.db.executemany("UPDATE nodes SET size = ?, count = ? WHERE item = ? AND node = ?", walked)
+                self.db.execute("DELETE FROM frontier WHERE item = ?", (name,))
+                self.db.executemany("INSERT INTO frontier VALUES (?, ?, ?)",
+                                    [(name, node, path) for path, node in pending.items()])
+                self.db.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?)",
+                                (name, int(done), total, ages_state, owners_state))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self._saved[name] = (len(tree), pending_nodes)
+            self._last[name] = time.time()
+            self.saves += 1
+            self.seconds += time.perf_counter() - start
+
+    #--------------------------------------------------
+    # Saved state of one folder, or None if it was not started.
+    # Returns {"done", "total", "tree", "frontier" {path: node}, "ages", "owners"}.
+    def load_item(self, name, path):
+        with self._lock:
+            item = self.db.execute("SELECT done, total, ages, owners FROM items WHERE name = ?", (name,)).fetchone()
+            if item is None:
+                return None
+            rows = self.db.execute("SELECT parent, name, size, count FROM nodes WHERE item = ? ORDER BY node",
+                                   (name,)).fetchall()
+            frontier = dict(self.db.execute("SELECT path, node FROM frontier WHERE item = ?", (name,)))
+        done, total, ages_state, owners_state = item
+
+        tree = ScanTree(path, prefix=name)
+        tree.parents = [parent for parent, _, _, _ in rows]
+        tree.names = [node_name for _, node_name, _, _ in rows]
+        tree.sizes = [size for _, _, size, _ in rows]
+        tree.counts = [count for _, _, _, count in rows]
+
+        ages_state = json.loads(ages_state)
+        ages = AgeHistogram(ages_state["now"])
+        ages.mtime_bytes = np.array(ages_state["mtime"], dtype=np.float64)
+        ages.atime_bytes = np.array(ages_state["atime"], dtype=np.float64)
+        ages.sizes = SizeHistogram.from_state(ages_state.get("sizes", {}))  # Empty in checkpoints of older versions
+        owners_state = json.loads(owners_state)
+        owners = OwnerUsage()
+        owners.users = {key: [size, count] for key, size, count in owners_state["users"]}
+        owners.groups = {key: [size, count] for key, size, count in owners_state["groups"]}
+
+        # Later saves of this folder continue where the loaded one ended
+        self._saved[name] = (len(tree), set(frontier.values()))
+        return {"done": bool(done), "total": total, "tree": tree, "frontier": frontier,
+                "ages": ages, "owners": owners}
+
+    #--------------------------------------------------
+    # Keep the file for a later resume, or delete it after a complete scan
+    def close(self):
+        self.db.close()
+
+    def finish(self):
+        self.db.close()
+        remove_checkpoint(self.filename)
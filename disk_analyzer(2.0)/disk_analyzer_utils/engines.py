@@ -0,0 +1,210 @@
+#======================================================
+# Imports for the scan engine registry, shared reporting and cross-check harness
+import os
+import inspect
+import importlib
+import psutil
+from disk_analyzer_utils.plotting import plot
+from disk_analyzer_utils.benchmark import log_benchmark
+from disk_analyzer_utils.utils import show_analysis, bytes_to_readable
+from disk_analyzer_utils.snapshot import save_snapshot
+from disk_analyzer_utils.memprofile import MemoryProfiler
+from disk_analyzer_utils.history import record_usage
+
+#======================================================
+# Modules that register an engine when imported. A new engine is a module
+# with a @register_engine scan function, added to this list.
+ENGINE_MODULES = (
+    "disk_analyzer.analyzer",           # base
+    "disk_analyzer_threaded.analyzer",  # threadpool
+    "disk_analyzer_optimize.analyzer",  # optimized (asyncio)
+    "disk_analyzer_fdwalk.analyzer",    # fdwalk (openat/fstatat)
+)
+MAX_DIFF_ROWS = 10  # Differing top-level folders printed by the cross-check
+
+#======================================================
+# Result of one scan, the same for every engine:
+#   engine  - registry name, also the benchmark log version
+#   path    - scanned folder
+#   tree    - ScanTree of the scan (disk_usage set, not necessarily rolled up)
+#   rows    - result rows for show_analysis / plot ({"path", "size", "cold", "owners", "sizes"})
+#   elapsed - scan time in seconds (listing and walking, no reporting)
+# `version` (logged to the benchmark log) and `checkpoint_time` can be set by
+# the caller, e.g. for resumed or checkpointed scans.
+class ScanResult:
+    def __init__(self, engine, path, tree, rows, elapsed):
+        self.engine = engine
+        self.path = path
+        self.tree = tree
+        self.rows = rows
+        self.elapsed = elapsed
+        self.version = engine
+        self.checkpoint_time = None
+
+    @property
+    def total_size(self):
+        return sum(row["size"] for row in self.rows)
+
+    # Every file scanned (the tree root's count after rollup)
+    @property
+    def file_count(self):
+        self.tree.rollup()
+        return self.tree.counts[0]
+
+    @property
+    def dir_count(self):
+        return len(self.tree) - 1 + self.tree.spilled
+
+    # (size, file count) of every top-level folder, by name
+    def folders(self):
+        self.tree.rollup()
+        tree = self.tree
+        return {tree.names[i]: (tree.sizes[i], tree.counts[i]) for i in range(1, len(tree)) if tree.parents[i] == 0}
+
+#======================================================
+# Registry: engine name -> Engine. `scan(base_path, follow_symlinks=False,
+# profiler=None)` returns a ScanResult (or None if the folder cannot be
+# listed); it may be a coroutine function. Scan functions only collect, all
+# output goes through report_scan() so every engine reports the same way.
+class Engine:
+    def __init__(self, name, description, scan):
+        self.name = name
+        self.description = description
+        self.scan = scan
+
+ENGINES = {}
+
+def register_engine(name, description):
+    def decorator(scan):
+        ENGINES[name] = Engine(name, description, scan)
+        return scan
+    return decorator
+
+#--------------------------------------------------
+# Import every engine module (once) and return the registry
+def load_engines():
+    for module in ENGINE_MODULES:
+        importlib.import_module(module)
+    return ENGINES
+
+#--------------------------------------------------
+# Run one engine's scan, awaiting it if the engine is asynchronous
+async def run_scan(name, base_path, **options):
+    result = load_engines()[name].scan(base_path, **options)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+#======================================================
+# Shared reporting: time, memory, table, chart, optional snapshot, the benchmark
+# log and the usage history (filesystem and top-level item sizes, for forecasts).
+# `profiler` is the MemoryProfiler that was passed to the scan, `store` the
+# SpillStore holding spilled parts of the tree, if any. With owner_split=True
+# the per-owner table is also split by top-level item. The tree file (.dsa, for
+# browsing without rescanning) is written after every scan unless tree_file=False;
+# with snapshot=True the text snapshot is written next to it.
+def report_scan(result, snapshot=False, profiler=None, store=None, owner_split=False, tree_file=True):
+    profiler = profiler or MemoryProfiler(False)
+    print(f"Analyze time: {result.elapsed} s.")
+    process = psutil.Process(os.getpid())
+    print(f"Memory used: {process.memory_info().rss / 1024 ** 2:.2f} MB")
+
+    show_analysis(result.rows, *result.tree.disk_usage, owner_split=owner_split)
+    plot(result.rows, result.path)
+    result.tree.rollup()  # Root count = every file scanned, logged for files/second throughput
+    profiler.phase("report")
+    if snapshot:
+        print(f"Snapshot saved: {save_snapshot(result.tree, store=store)}")
+        profiler.phase("snapshot")
+    elif tree_file:
+        print(f"Tree file saved: {save_snapshot(result.tree, store=store, text=False)}")
+        profiler.phase("snapshot")
+    profiler.stop()
+    profiler.report()
+    log_benchmark(result.path, result.file_count, result.total_size, result.elapsed, version=result.version,
+                  memory_phases=profiler.phases, checkpoint_time=result.checkpoint_time, files=result.file_count)
+    # Only real items get a size series: summary rows such as "<N other files>"
+    # change meaning from scan to scan (and would skew largest_first's estimates)
+    record_usage(result.path, result.tree.disk_usage, [row for row in result.rows if not row["path"].startswith("<")])
+
+#======================================================
+# Scan with any registered engine and report it; returns the ScanResult
+# With prioritize=True the largest folders are scanned first (every built-in engine supports it)
+async def analyze_with(name, base_path="/", snapshot=False, follow_symlinks=False, profile_memory=False,
+                       owner_split=False, prioritize=False):
+    print(f"Analyzing: {base_path} ({name} engine)")
+    profiler = MemoryProfiler(profile_memory)
+    options = {"prioritize": True} if prioritize else {}  # Engines without the option still run unprioritized
+    result = await run_scan(name, base_path, follow_symlinks=follow_symlinks, profiler=profiler, **options)
+    if result is None:
+        profiler.stop()
+        return None
+    report_scan(result, snapshot, profiler, owner_split=owner_split)
+    return result
+
+#======================================================
+# Benchmark harness: scan `base_path` `repeat` times with every engine (or
+# the given ones), log every run, and check that all engines agree on total
+# size and file count. Directory counts are compared too but only noted:
+# os.walk lists a symlink to a directory as an (empty) directory, inode_walk
+# as a skipped link, so they differ by design. Engines take turns within each round,
+# so cache warm-up does not favour whichever runs last. Only the last tree
+# of each engine is kept, for the per-folder comparison.
+# Returns {engine: {"times", "totals", "last"}} and whether all totals matched.
+async def cross_check(base_path, names=None, repeat=1, follow_symlinks=False):
+    engines = load_engines()
+    names = list(names or engines)
+    results = {name: {"times": [], "totals": set(), "last": None} for name in names}
+    for round_number in range(1, repeat + 1):
+        for name in names:
+            print(f"Round {round_number}/{repeat}: {name} on {base_path}")
+            result = await run_scan(name, base_path, follow_symlinks=follow_symlinks)
+            if result is None:
+                continue
+            log_benchmark(base_path, result.file_count, result.total_size, result.elapsed, version=name,
+                          files=result.file_count)
+            runs = results[name]
+            runs["times"].append(result.elapsed)
+            runs["totals"].add((result.total_size, result.file_count))
+            runs["last"] = result
+
+    #--------------------------------------------------
+    # Timings and totals, each engine against the first one that scanned
+    reference = next((runs["last"] for runs in results.values() if runs["last"]), None)
+    if reference is None:
+        print("No engine could scan this folder.")
+        return results, False
+    expected = (reference.total_size, reference.file_count)
+    print(f"\n{'Engine':<12} {'Best (s)':>10} {'Mean (s)':>10} {'Files':>12} {'Dirs':>10} {'Size':>12}  Totals")
+    print("-" * 80)
+    all_match = True
+    for name, runs in results.items():
+        last = runs["last"]
+        if last is None:
+            print(f"{name:<12} {'failed':>10}")
+            all_match = False
+            continue
+        match = runs["totals"] == {expected}
+        all_match = all_match and match
+        times = runs["times"]
+        print(f"{name:<12} {min(times):>10.4f} {sum(times) / len(times):>10.4f} {last.file_count:>12,} "
+              f"{last.dir_count:>10,} {bytes_to_readable(last.total_size):>12}  "
+              f"{'same' if match else 'DIFFERENT'}{'' if last.dir_count == reference.dir_count else ' (dirs differ)'}")
+
+    #--------------------------------------------------
+    # Where the totals differ, show which top-level folders disagree
+    expected_folders = reference.folders()
+    for name, runs in results.items():
+        if runs["last"] is None or runs["last"] is reference:
+            continue
+        found = runs["last"].folders()
+        differing = sorted(f for f in expected_folders.keys() | found.keys()
+                           if expected_folders.get(f) != found.get(f))
+        if differing:
+            print(f"\n{name} differs from {reference.engine} in {len(differing)} top-level folders:")
+            for folder in differing[:MAX_DIFF_ROWS]:
+                print(f"  {folder:<40} {expected_folders.get(folder)} vs {found.get(folder)} (size, files)")
+
+    print("\nAll engines report identical totals." if all_match else
+          "\nEngines disagree (files changing during the runs also cause this).")
+    return results, all_match
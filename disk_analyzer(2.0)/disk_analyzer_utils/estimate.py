@@ -0,0 +1,223 @@
+#======================================================
+# Imports for sampling-based size estimation
+import os
+import stat
+import math
+import time
+import random
+import shutil
+from disk_analyzer_utils.plotting import plot
+from disk_analyzer_utils.benchmark import log_benchmark
+from disk_analyzer_utils.utils import show_analysis, bytes_to_readable
+from disk_analyzer_utils.symlinks import VisitedDirs
+
+#======================================================
+# Defaults for the estimate mode
+TARGET_REL_ERROR = 0.05  # Stop when every 95% interval is within +-5% of its estimate
+MIN_PROBES = 30          # Probes per folder before its interval is trusted
+Z_95 = 1.96              # Normal quantile for a 95% confidence interval
+REPORT_EVERY_SEC = 1.0
+
+#======================================================
+# One listed directory. Subdirectories whose whole subtree has been listed
+# are "done" (their exact totals are folded into done_size / done_count),
+# the others stay "open" and are the ones probes can still descend into.
+class _Dir:
+    __slots__ = ("parent", "own_size", "own_count", "done_size", "done_count", "open", "position")
+
+    def __init__(self, parent, own_size, own_count, subdirs):
+        self.parent = parent
+        self.own_size = own_size
+        self.own_count = own_count
+        self.done_size = 0
+        self.done_count = 0
+        self.open = subdirs
+        self.position = {path: i for i, path in enumerate(subdirs)}
+
+    def close_child(self, path, size, count):
+        i = self.position.pop(path)
+        last = self.open.pop()
+        if last != path:  # Swap-remove keeps random choice O(1)
+            self.open[i] = last
+            self.position[last] = i
+        self.done_size += size
+        self.done_count += count
+
+#======================================================
+# Knuth-style random probes over a directory tree.
+# A probe walks from a folder down to a leaf, choosing one open subdirectory
+# at random at each level, and multiplies what it sees by the number of open
+# choices above it; the mean of many probes is an unbiased subtree estimate.
+# Listings are cached, and subtrees that have been listed completely count
+# exactly, so small trees converge to the exact total.
+class TreeSampler:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.dirs = {}       # path -> _Dir of every listed directory
+        self.complete = {}   # path -> (size, count) of fully listed subtrees
+
+    #--------------------------------------------------
+    # List one directory (files are lstat'ed once, links are skipped like in get_size)
+    def _list(self, path, parent):
+        own_size = own_count = 0
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                            if not stat.S_ISLNK(st.st_mode):
+                                own_size += st.st_size
+                                own_count += 1
+                    except OSError:
+                        pass  # Ignore unreadable entries
+        except OSError:
+            pass  # Unreadable directory counts as empty
+        node = self.dirs[path] = _Dir(parent, own_size, own_count, subdirs)
+        return node
+
+    #--------------------------------------------------
+    # One probe from `root`; returns an unbiased (size, file count) estimate of its subtree
+    def probe(self, root):
+        if root in self.complete:
+            return self.complete[root]
+        size = count = 0
+        weight = 1
+        path, parent = root, None
+        while True:
+            node = self.dirs.get(path) or self._list(path, parent)
+            size += weight * (node.own_size + node.done_size)
+            count += weight * (node.own_count + node.done_count)
+            if not node.open:
+                self._finish(path, node)
+                return size, count
+            weight *= len(node.open)
+            path, parent = self.rng.choice(node.open), path
+
+    #--------------------------------------------------
+    # A directory has no open subdirectories left: record its exact totals
+    # and close it in its parent, which may complete in turn
+    def _finish(self, path, node):
+        while not node.open:
+            size = node.own_size + node.done_size
+            count = node.own_count + node.done_count
+            self.complete[path] = (size, count)
+            del self.dirs[path]
+            if node.parent is None:
+                return
+            parent = self.dirs[node.parent]
+            parent.close_child(path, size, count)
+            path, node = node.parent, parent
+
+#======================================================
+# Running mean and 95% interval of the probe results for one top-level folder
+class FolderEstimate:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.probes = 0
+        self.size_sum = self.size_sq = 0.0
+        self.count_sum = 0.0
+        self.exact = None  # (size, count) once the folder is fully listed
+
+    def add(self, size, count):
+        self.probes += 1
+        self.size_sum += size
+        self.size_sq += size * size
+        self.count_sum += count
+
+    @property
+    def size(self):
+        if self.exact is not None:
+            return self.exact[0]
+        return self.size_sum / self.probes if self.probes else 0
+
+    @property
+    def count(self):
+        if self.exact is not None:
+            return self.exact[1]
+        return self.count_sum / self.probes if self.probes else 0
+
+    # Half-width of the 95% confidence interval of the size
+    @property
+    def error(self):
+        if self.exact is not None:
+            return 0
+        if self.probes < 2:
+            return math.inf
+        variance = max(self.size_sq / self.probes - self.size ** 2, 0) * self.probes / (self.probes - 1)
+        return Z_95 * math.sqrt(variance / self.probes)
+
+    def converged(self, rel_error):
+        if self.exact is not None:
+            return True
+        return self.probes >= MIN_PROBES and self.error <= rel_error * self.size
+
+#======================================================
+# Estimate the size of every item in `base_path` by sampling.
+# Refines until every folder has converged, `time_limit` seconds have passed
+# (None = no limit) or the user presses Ctrl-C. Files in `base_path` are exact.
+def estimate_sizes(base_path, time_limit=None, rel_error=TARGET_REL_ERROR, seed=None):
+    sampler = TreeSampler(seed)
+    scanned = VisitedDirs()
+    folders, rows = [], []
+
+    #--------------------------------------------------
+    # 1) Top-level items, deduplicated by (st_dev, st_ino) like analyze()
+    for item in os.listdir(base_path):
+        item_path = os.path.join(base_path, item)
+        try:
+            st = os.stat(item_path)
+        except OSError:
+            continue  # Broken link
+        if os.path.splitext(item)[1].lower() == ".tmp" or not scanned.first_visit(st):
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            folders.append(FolderEstimate(item, item_path))
+        elif stat.S_ISREG(st.st_mode):
+            rows.append({"path": item, "size": st.st_size, "count": 1, "error": 0})
+
+    #--------------------------------------------------
+    # 2) Probe the folders, each time the one with the widest interval
+    #    (after a round-robin warm-up), so effort goes where the doubt is
+    start = last_report = time.time()
+    try:
+        while True:
+            pending = [f for f in folders if not f.converged(rel_error)]
+            if not pending or (time_limit is not None and time.time() - start >= time_limit):
+                break
+            warming = [f for f in pending if f.probes < MIN_PROBES]
+            folder = min(warming, key=lambda f: f.probes) if warming else max(pending, key=lambda f: f.error)
+            folder.add(*sampler.probe(folder.path))
+            if folder.path in sampler.complete:
+                folder.exact = sampler.complete[folder.path]
+
+            if time.time() - last_report >= REPORT_EVERY_SEC:
+                last_report = time.time()
+                estimate = sum(f.size for f in folders)
+                print(f"{last_report - start:6.1f} s: ~{bytes_to_readable(estimate)} estimated, "
+                      f"{sum(f.probes for f in folders)} probes, "
+                      f"{len(folders) - len(pending)}/{len(folders)} folders converged (Ctrl-C to stop)")
+    except KeyboardInterrupt:
+        print("Stopped, showing the current estimate.")
+
+    rows += [{"path": f.name, "size": round(f.size), "count": round(f.count), "error": f.error} for f in folders]
+    return rows, len(sampler.complete) + len(sampler.dirs)
+
+#======================================================
+# Estimate mode: same table and chart as a scan, marked as estimated
+def estimate_analysis(base_path="/", time_limit=None, rel_error=TARGET_REL_ERROR):
+    print(f"Estimating: {base_path}")
+    start_time = time.time()
+    total, used, free = shutil.disk_usage(base_path)
+    disk_data, listed = estimate_sizes(base_path, time_limit, rel_error)
+    elapsed_time = time.time() - start_time
+    print(f"Estimate time: {elapsed_time} s. Directories listed: {listed}")
+
+    show_analysis(disk_data, total, used, free)
+    plot(disk_data, f"{base_path}, estimated")
+    log_benchmark(base_path, listed, sum(d["size"] for d in disk_data), elapsed_time, version="estimate")
+    return disk_data
@@ -0,0 +1,135 @@
+#======================================================
+# Imports for fd-relative traversal (openat/fstatat through dir_fd)
+import os
+
+#======================================================
+# Defaults for fd-relative walks
+FD_LIMIT = 256  # Directory fds one scan may hold open (shared by its walks)
+MIN_WALK_FDS = 2  # A walk needs its current directory and that one's parent
+
+# Directories are opened relative to their parent's fd, never through symlinks
+OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_CLOEXEC", 0)
+NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+
+#--------------------------------------------------
+# Whether this platform can open and stat relative to a directory fd (not on Windows)
+def fd_walk_supported():
+    return os.open in os.supports_dir_fd and os.stat in os.supports_dir_fd and os.scandir in os.supports_fd
+
+#--------------------------------------------------
+# Fds each of `walks` concurrent walks may hold, so that all of them together
+# stay within `fd_limit` and within half of the process's open-file limit
+def fds_per_walk(fd_limit=FD_LIMIT, walks=1):
+    try:
+        import resource  # Unix only, like dir_fd itself
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            fd_limit = min(fd_limit, soft // 2)
+    except (ImportError, ValueError, OSError):
+        pass
+    return max(MIN_WALK_FDS, fd_limit // max(walks, 1))
+
+#--------------------------------------------------
+# Default listing of an open directory: (dirnames, filenames) from os.scandir,
+# which reads a dup of the fd. Symlinks count as files.
+def scandir_list(fd):
+    dirnames, filenames = [], []
+    with os.scandir(fd) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)  # d_type, no stat
+            except OSError:
+                is_dir = False
+            (dirnames if is_dir else filenames).append(entry.name)
+    return dirnames, filenames
+
+#======================================================
+# One directory of an fd walk. Only its own name and its parent are kept;
+# the full path is built on demand by path(), e.g. for a largest-files entry.
+# `node` is free for the caller (the ScanTree node of the directory).
+class FdDir:
+    __slots__ = ("name", "parent", "fd", "node")
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.fd = None
+        self.node = None
+
+    def path(self):
+        parts = []
+        folder = self
+        while folder is not None:
+            parts.append(folder.name)
+            folder = folder.parent
+        return os.path.join(*reversed(parts))
+
+#======================================================
+# Top-down walk like os.fwalk: yields (folder, dirnames, filenames, dir_fd)
+# where `folder` is an FdDir, and the caller stats the files with
+# os.stat(name, dir_fd=dir_fd, follow_symlinks=False). Every directory is
+# opened relative to its parent's fd, so the kernel resolves one name per
+# open and per stat instead of the whole path, and no path strings are built.
+#   - depth first; the fds of the directories on the way down are kept open,
+#     at most `fd_limit` of them. Past that the outermost ones are closed and
+#     reopened (one component at a time) when the walk gets back to them
+#   - symlinks are not followed below `top`: they are listed in filenames, so a
+#     nofollow stat shows them as links (os.walk lists them as empty directories)
+#   - the caller may prune dirnames in place, like with os.walk
+# `top` itself is opened like os.walk opens it (a link to a directory is entered).
+# `list_dir(fd)` lists a directory (scandir_list, or NativeCalls.list_dir for getdents64).
+def fd_walk(top, fd_limit=FD_LIMIT, onerror=None, list_dir=scandir_list):
+    fd_limit = max(fd_limit, MIN_WALK_FDS)
+    held = []  # Folders with an open fd, outermost first (all on the current way down)
+
+    #--------------------------------------------------
+    # Open a folder's fd, reopening closed ancestors first
+    def open_dir(folder):
+        if folder.parent is None:
+            fd = os.open(folder.name, OPEN_FLAGS)
+        else:
+            if folder.parent.fd is None:
+                open_dir(folder.parent)
+            fd = os.open(folder.name, OPEN_FLAGS | NOFOLLOW, dir_fd=folder.parent.fd)
+        if len(held) >= fd_limit:
+            outermost = held.pop(0)
+            os.close(outermost.fd)
+            outermost.fd = None
+        folder.fd = fd
+        held.append(folder)
+
+    def close_dir(folder):
+        if folder.fd is not None:
+            held.remove(folder)
+            os.close(folder.fd)
+            folder.fd = None
+
+    way_down = []  # (folder, names of subdirectories still to visit)
+    folder = FdDir(top, None)
+    try:
+        while folder is not None:
+            try:
+                open_dir(folder)
+                dirnames, filenames = list_dir(folder.fd)
+            except OSError as e:
+                close_dir(folder)
+                if onerror is not None:
+                    onerror(e)
+            else:
+                yield folder, dirnames, filenames, folder.fd
+                way_down.append((folder, iter(list(dirnames))))
+
+            # Next subdirectory: of this folder, or of the nearest folder above with some left
+            folder = None
+            while way_down and folder is None:
+                parent, remaining = way_down[-1]
+                name = next(remaining, None)
+                if name is None:
+                    way_down.pop()
+                    close_dir(parent)
+                else:
+                    folder = FdDir(name, parent)
+    finally:
+        for folder in held:
+            os.close(folder.fd)
+            folder.fd = None
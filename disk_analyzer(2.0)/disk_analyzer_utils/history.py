@@ -0,0 +1,256 @@
+#======================================================
+# Imports for the usage history and growth forecasts
+import os
+import time
+import socket
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+import numpy as np
+from disk_analyzer_utils.utils import bytes_to_readable
+
+#======================================================
+# Defaults for the usage history
+HISTORY_DB = "usage_history.db"
+HISTORY_SCHEMA_VERSION = 1
+BUSY_TIMEOUT_SEC = 30       # How long a writer waits for another process's transaction
+FORECAST_WINDOW_DAYS = 90   # Trends are fitted to this many recent days
+MIN_SAMPLES = 3             # Series with fewer samples in the window get no trend
+DRIVER_ROWS = 5             # Fastest-growing top-level items listed per filesystem
+MAX_FULL_DAYS = 100 * 365  # Dates further away are not shown
+DAY_SEC = 86400
+
+#======================================================
+# Mount point of the filesystem holding `path` (the key of its usage series)
+def mount_point(path):
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+#======================================================
+# Usage of filesystems and of the top-level items of scanned folders over
+# time, in a small SQLite file (WAL, like the metrics store):
+#   - fs_series / fs_samples:   (host, mount point) -> total and used bytes at each scan
+#   - dir_series / dir_samples: (filesystem, scanned root, item) -> size at each scan
+# Series get integer ids, and samples are stored by (series, day), clustered
+# by series (WITHOUT ROWID): a series keeps its latest sample of each day, so
+# hourly daemon rescans do not multiply the history, a forecast reads every
+# series in one ordered pass, and importing the same file twice adds nothing.
+class UsageHistory:
+    def __init__(self, filename=HISTORY_DB):
+        self.filename = filename
+        with self._connect() as db:
+            self._create_schema(db)
+
+    def _connect(self):
+        db = sqlite3.connect(self.filename, timeout=BUSY_TIMEOUT_SEC, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return closing(db)
+
+    def _create_schema(self, db):
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)", (str(HISTORY_SCHEMA_VERSION),))
+            version = int(db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0])
+            if version > HISTORY_SCHEMA_VERSION:
+                raise RuntimeError(f"{self.filename} uses history schema v{version}, "
+                                   f"this program only knows v{HISTORY_SCHEMA_VERSION}")
+            db.execute("CREATE TABLE IF NOT EXISTS fs_series (id INTEGER PRIMARY KEY, host TEXT, mount TEXT, "
+                       "UNIQUE (host, mount))")
+            db.execute("CREATE TABLE IF NOT EXISTS fs_samples (series INTEGER, day INTEGER, timestamp REAL, "
+                       "total INTEGER, used INTEGER, PRIMARY KEY (series, day)) WITHOUT ROWID")
+            db.execute("CREATE TABLE IF NOT EXISTS dir_series (id INTEGER PRIMARY KEY, fs INTEGER, root TEXT, "
+                       "name TEXT, UNIQUE (fs, root, name))")
+            db.execute("CREATE TABLE IF NOT EXISTS dir_samples (series INTEGER, day INTEGER, timestamp REAL, "
+                       "size INTEGER, PRIMARY KEY (series, day)) WITHOUT ROWID")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    #--------------------------------------------------
+    # Id of a series, created on first use
+    @staticmethod
+    def _series(db, table, columns, key):
+        db.execute(f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+                   f"VALUES ({', '.join('?' * len(key))})", key)
+        return db.execute(f"SELECT id FROM {table} WHERE {' AND '.join(c + ' = ?' for c in columns)}",
+                          key).fetchone()[0]
+
+    #--------------------------------------------------
+    # Record one scan: the (total, used, free) of the filesystem holding `path`
+    # and the size of every top-level item in `rows` (result rows of the scan)
+    def record(self, path, disk_usage, rows=(), taken_at=None, host=None):
+        taken_at = taken_at or time.time()
+        host = host or socket.gethostname()
+        root = os.path.abspath(path)
+        total, used, _ = disk_usage
+        day = int(taken_at // DAY_SEC)
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                fs = self._series(db, "fs_series", ("host", "mount"), (host, mount_point(root)))
+                db.execute("INSERT OR REPLACE INTO fs_samples VALUES (?, ?, ?, ?, ?)", (fs, day, taken_at, total, used))
+                samples = [(self._series(db, "dir_series", ("fs", "root", "name"), (fs, root, row["path"])),
+                            day, taken_at, row["size"]) for row in rows]
+                db.executemany("INSERT OR REPLACE INTO dir_samples VALUES (?, ?, ?, ?)", samples)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    #--------------------------------------------------
+    # Merge the history file of another host (or an older copy) into this one;
+    # returns the number of filesystem samples added
+    def import_history(self, filename):
+        if not os.path.isfile(filename):  # ATTACH would create an empty database
+            raise FileNotFoundError(f"No such history file: {filename}")
+        with self._connect() as db:
+            db.execute("ATTACH DATABASE ? AS other", (filename,))
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                before = db.execute("SELECT COUNT(*) FROM fs_samples").fetchone()[0]
+                db.execute("INSERT OR IGNORE INTO fs_series (host, mount) SELECT host, mount FROM other.fs_series")
+                db.execute("INSERT OR IGNORE INTO fs_samples SELECT f.id, s.day, s.timestamp, s.total, s.used "
+                           "FROM other.fs_samples s JOIN other.fs_series o ON s.series = o.id "
+                           "JOIN fs_series f ON f.host = o.host AND f.mount = o.mount")
+                db.execute("INSERT OR IGNORE INTO dir_series (fs, root, name) SELECT f.id, d.root, d.name "
+                           "FROM other.dir_series d JOIN other.fs_series o ON d.fs = o.id "
+                           "JOIN fs_series f ON f.host = o.host AND f.mount = o.mount")
+                db.execute("INSERT OR IGNORE INTO dir_samples SELECT m.id, s.day, s.timestamp, s.size "
+                           "FROM other.dir_samples s JOIN other.dir_series d ON s.series = d.id "
+                           "JOIN other.fs_series o ON d.fs = o.id "
+                           "JOIN fs_series f ON f.host = o.host AND f.mount = o.mount "
+                           "JOIN dir_series m ON m.fs = f.id AND m.root = d.root AND m.name = d.name")
+                added = db.execute("SELECT COUNT(*) FROM fs_samples").fetchone()[0] - before
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("DETACH DATABASE other")
+        return added
+
+    #--------------------------------------------------
+    # Least-squares sums of every series over its samples since `since` (unix
+    # time), computed inside SQLite so only one row per series is read back,
+    # however long the history. Times are in days since `since`, values are
+    # column `value`. Returns {name: array, one entry per series}:
+    #   series, samples, t, tt, y, yy, ty (sums of t, t*t, ...),
+    #   last_time, last (value at the last sample) and every `extra` column there
+    def series_sums(self, table, value, since=0, extra=()):
+        columns = "".join(f", {column}" for column in extra)
+        # The bare columns after MAX(timestamp) are taken from the row holding the maximum
+        query = (f"SELECT series, COUNT(*), TOTAL(t), TOTAL(t * t), TOTAL(y), TOTAL(y * y), TOTAL(t * y), "
+                 f"MAX(timestamp), y{columns} FROM (SELECT series, timestamp, (timestamp - ?) / {DAY_SEC}.0 AS t, "
+                 f"{value} * 1.0 AS y{columns} FROM {table} WHERE timestamp >= ?) GROUP BY series")
+        with self._connect() as db:
+            rows = db.execute(query, (since, since)).fetchall()
+        names = ("series", "samples", "t", "tt", "y", "yy", "ty", "last_time", "last") + tuple(extra)
+        return dict(zip(names, np.array(rows, dtype=np.float64).reshape(-1, len(names)).T))
+
+    # Latest recorded size of every top-level item of `root` on this host: {name: bytes}
+    def latest_sizes(self, root, host=None):
+        with self._connect() as db:
+            return dict((name, size) for name, size, _ in db.execute(
+                "SELECT d.name, s.size, MAX(s.day) FROM dir_series d JOIN fs_series f ON d.fs = f.id "
+                "JOIN dir_samples s ON s.series = d.id WHERE f.host = ? AND d.root = ? GROUP BY d.id",
+                (host or socket.gethostname(), os.path.abspath(root))))
+
+    # Names of all series: ({id: (host, mount)}, {id: (filesystem id, root, name)})
+    def series_names(self):
+        with self._connect() as db:
+            fs_names = {i: (host, mount) for i, host, mount in db.execute("SELECT id, host, mount FROM fs_series")}
+            dir_names = {i: (fs_id, root, name) for i, fs_id, root, name in
+                         db.execute("SELECT id, fs, root, name FROM dir_series")}
+        return fs_names, dir_names
+
+#--------------------------------------------------
+# Record one scan in the default history file
+def record_usage(path, disk_usage, rows=(), taken_at=None):
+    UsageHistory().record(path, disk_usage, rows, taken_at)
+
+#======================================================
+# Least-squares line of every series at once from its sums (series_sums()),
+# as whole-array NumPy operations. Returns arrays, one entry per series:
+#   slope (units per day), fitted (the line's value at the last sample),
+#   r2 (fit quality, 0..1)
+# Series with fewer than MIN_SAMPLES samples (or all at one time) have a NaN slope.
+def fit_trends(sums, since):
+    n = sums["samples"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s_tt = sums["tt"] - sums["t"] ** 2 / n
+        s_ty = sums["ty"] - sums["t"] * sums["y"] / n
+        s_yy = sums["yy"] - sums["y"] ** 2 / n
+        slope = np.where((n >= MIN_SAMPLES) & (s_tt > 0), s_ty / s_tt, np.nan)
+        r2 = np.clip(np.where(s_yy > 0, s_ty * s_ty / (s_tt * s_yy), 1.0), 0.0, 1.0)
+        last_t = (sums["last_time"] - since) / DAY_SEC
+        fitted = sums["y"] / n + slope * (last_t - sums["t"] / n)
+    return {"slope": slope, "fitted": fitted, "r2": r2}
+
+#======================================================
+# Forecast of every filesystem in the history, soonest full first:
+# [{"host", "mount", "used", "total", "growth" (bytes/day), "r2", "samples",
+#   "days_left" (None if not growing), "full_at", "drivers" [(path, bytes/day, size)]}]
+# Trends are fitted to the last `window_days` days; time to full is counted
+# from the line's value at the last sample, so one noisy scan does not move it.
+def forecast(history=None, window_days=FORECAST_WINDOW_DAYS, now=None):
+    history = history or UsageHistory()
+    since = (now or time.time()) - window_days * DAY_SEC
+    fs = history.series_sums("fs_samples", "used", since, extra=("total",))
+    dirs = history.series_sums("dir_samples", "size", since)
+    fs_fit = fit_trends(fs, since)
+    dir_fit = fit_trends(dirs, since)
+    fs_names, dir_names = history.series_names()
+
+    # Growing top-level items per filesystem, fastest first
+    drivers = {}
+    growing = np.flatnonzero(dir_fit["slope"] > 0)
+    for i in growing[np.argsort(-dir_fit["slope"][growing], kind="stable")].tolist():
+        fs_id, root, name = dir_names[int(dirs["series"][i])]
+        rows = drivers.setdefault(fs_id, [])
+        if len(rows) < DRIVER_ROWS:
+            rows.append((os.path.join(root, name), float(dir_fit["slope"][i]), int(dirs["last"][i])))
+
+    forecasts = []
+    with np.errstate(invalid="ignore", divide="ignore"):
+        days_left = np.maximum(0.0, (fs["total"] - fs_fit["fitted"]) / fs_fit["slope"])
+    for i, series in enumerate(fs["series"].astype(np.int64).tolist()):
+        growth = fs_fit["slope"][i]
+        left = float(days_left[i]) if growth > 0 else None
+        host, mount = fs_names[series]
+        forecasts.append({
+            "host": host, "mount": mount, "used": int(fs["last"][i]), "total": int(fs["total"][i]),
+            "growth": None if np.isnan(growth) else float(growth), "r2": float(fs_fit["r2"][i]),
+            "samples": int(fs["samples"][i]), "days_left": left,
+            "full_at": None if left is None else float(fs["last_time"][i]) + left * DAY_SEC,
+            "drivers": drivers.get(series, []),
+        })
+    forecasts.sort(key=lambda f: (f["days_left"] is None, f["days_left"] or 0, f["host"], f["mount"]))
+    return forecasts
+
+#--------------------------------------------------
+# Print forecasts as a table, each filesystem followed by its growth drivers
+def show_forecast(forecasts, window_days=FORECAST_WINDOW_DAYS):
+    print(f"\nGrowth forecast from the last {window_days} days of usage history "
+          f"({len(forecasts)} filesystems)\n")
+    print(f"{'Host':<16} {'Mount':<20} {'Used':>10} {'Total':>10} {'Growth/day':>12} {'Full in':>10} "
+          f"{'Full on':>11} {'Fit':>5}")
+    print("-" * 101)
+    for f in forecasts:
+        growth, full_in, full_on, fit = f"({f['samples']} scans)", "-", "-", "-"
+        if f["growth"] is not None:
+            growth = f"{'-' if f['growth'] < 0 else '+'}{bytes_to_readable(abs(f['growth']))}"
+            full_in = "never" if f["days_left"] is None else f"{f['days_left']:.0f} d"
+            if f["days_left"] is not None and f["days_left"] < MAX_FULL_DAYS:
+                full_on = datetime.fromtimestamp(f["full_at"]).strftime("%Y-%m-%d")
+            fit = f"{f['r2']:.2f}"
+        print(f"{f['host'][:16]:<16} {f['mount'][:20]:<20} {bytes_to_readable(f['used']):>10} "
+              f"{bytes_to_readable(f['total']):>10} {growth:>12} {full_in:>10} {full_on:>11} {fit:>5}")
+        for path, growth, size in f["drivers"]:
+            print(f"{'':<16}   {path[:40]:<40} +{bytes_to_readable(growth)}/day, now {bytes_to_readable(size)}")
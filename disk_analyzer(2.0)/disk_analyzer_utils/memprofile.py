@@ -0,0 +1,83 @@
+#======================================================
+# Imports for tracemalloc-based memory accounting
+import tracemalloc
+from disk_analyzer_utils.utils import bytes_to_readable
+
+#======================================================
+# Defaults for the memory report
+TRACE_FRAMES = 1   # Stack depth kept per allocation (1 = allocating line only, cheapest)
+TOP_SITES = 5      # Allocation sites reported per phase
+
+# Allocations made by tracemalloc, this profiler or the import machinery are not reported
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+#======================================================
+# Opt-in memory profiler for one scan. The scan calls phase(name) when a
+# phase ends (e.g. "list", "scan", "report", "snapshot"); each phase records
+# the traced memory at its end, its peak, and the allocation sites that grew
+# most during it. Disabled profilers cost nothing, so scans call phase() always.
+class MemoryProfiler:
+    def __init__(self, enabled=True, frames=TRACE_FRAMES, top=TOP_SITES):
+        self.enabled = enabled
+        self.top = top
+        self.phases = []
+        self._started_here = False
+        if enabled:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._started_here = True
+            tracemalloc.reset_peak()
+            self._last = self._snapshot()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    #--------------------------------------------------
+    # Close the current phase and start the next one
+    def phase(self, name):
+        if not self.enabled:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self._snapshot()
+        growth = [stat for stat in snapshot.compare_to(self._last, "lineno") if stat.size_diff > 0]
+        self.phases.append({
+            "phase": name,
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top_sites": [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in growth[:self.top]
+            ],
+        })
+        self._last = snapshot
+        tracemalloc.reset_peak()  # Peak of the next phase starts from here
+
+    #--------------------------------------------------
+    # Stop tracing (if this profiler started it) and free the last snapshot
+    def stop(self):
+        if self.enabled:
+            self._last = None
+            if self._started_here:
+                tracemalloc.stop()
+
+    #--------------------------------------------------
+    # Print peak / end memory and the top allocation sites of every phase
+    def report(self):
+        if not self.phases:
+            return
+        print(f"\n{'Memory phase':<14} {'Traced at end':>14} {'Peak':>12}")
+        print("-" * 42)
+        for p in self.phases:
+            print(f"{p['phase']:<14} {bytes_to_readable(p['current_bytes']):>14} {bytes_to_readable(p['peak_bytes']):>12}")
+        for p in self.phases:
+            if p["top_sites"]:
+                print(f"\nTop allocation growth during '{p['phase']}':")
+                for site in p["top_sites"]:
+                    print(f"  {bytes_to_readable(site['size_diff']):>12} {site['count_diff']:>10} blocks  {site['site']}")
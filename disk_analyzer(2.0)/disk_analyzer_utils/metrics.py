@@ -0,0 +1,252 @@
+#======================================================
+# Imports for the benchmark metrics store
+import os
+import csv
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+#======================================================
+# Defaults for the metrics store
+METRICS_DB = "benchmark_log.db"
+METRICS_SCHEMA_VERSION = 4  # v2: memory_phases table, v3: checkpoint_sec column, v4: files column
+RETENTION_DAYS = 365     # Older runs are deleted when new ones are written
+BATCH_SIZE = 1           # Runs buffered per transaction (1: every run is committed when it is logged)
+BUSY_TIMEOUT_SEC = 30    # How long a writer waits for another process's transaction
+
+# Columns of one benchmark run, in storage order (timestamp is unix time)
+METRIC_COLUMNS = (
+    "version", "timestamp", "path", "item_count", "total_size_bytes",
+    "elapsed_time_sec", "cpu_percent", "mem_percent",
+    "disk_read_bytes", "disk_write_bytes",
+    "proc_read_bytes", "proc_write_bytes",
+    "num_threads", "ctx_switches_vol", "ctx_switches_invol",
+    "checkpoint_sec", "files",
+)
+# Columns added after v1 (with the version that added them); older databases
+# get them with ALTER TABLE, older CSV logs leave them empty
+ADDED_COLUMNS = {"checkpoint_sec": 3, "files": 4}
+# Versions whose item_count is not a file count: "estimate" counts the
+# directories it listed. "base" and "optimized" counted top-level items until
+# the benchmark report existed, so in CSV logs (which may be that old) their
+# count means either; every run they logged to this store counts files.
+NOT_FILE_COUNTS = ("estimate",)
+CSV_UNKNOWN_COUNTS = ("base", "optimized")
+# Columns stored as text; the others are numbers (or empty)
+TEXT_COLUMNS = ("version", "path")
+# Columns of the optional per-phase memory records of a run (see memprofile.py)
+PHASE_COLUMNS = ("phase", "current_bytes", "peak_bytes", "top_sites")
+
+#======================================================
+# Metrics sink interface. log_benchmark() hands every run (a dict with
+# METRIC_COLUMNS as keys, plus an optional "memory_phases" list) to the
+# current sink; another sink can be plugged in with set_metrics_sink().
+# Sinks that buffer runs write them out in flush(), which close() calls
+# (the current sink is closed when the program exits).
+class MetricsSink(ABC):
+    @abstractmethod
+    def write(self, row):
+        ...
+
+    def flush(self):
+        pass
+
+    # All stored runs as dicts (with a unique "id"), oldest first
+    @abstractmethod
+    def read(self):
+        ...
+
+    def close(self):
+        self.flush()
+
+#======================================================
+# SQLite store in WAL mode, safe for many scans writing at the same time:
+#   - runs are written in short IMMEDIATE transactions of `batch_size` runs;
+#     with the default of 1 every run is committed as soon as it is logged, so
+#     a crash later on loses nothing. Larger batches (e.g. benchmark loops
+#     logging many runs) buffer up to batch_size - 1 runs until the next
+#     flush(). A busy timeout waits instead of failing when another process is writing
+#   - WAL lets readers (the benchmark report) run while scans write
+#   - the schema version is kept in a meta table and checked on open;
+#     older databases are upgraded in place
+#   - runs older than `retention_days` are deleted on every write, through
+#     the timestamp and run_id indexes, so only expired rows are touched
+class SQLiteMetricsSink(MetricsSink):
+    def __init__(self, filename=METRICS_DB, retention_days=RETENTION_DAYS, batch_size=BATCH_SIZE):
+        self.filename = filename
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()  # Threads of one process share the buffer
+        with self._connect() as db:
+            self._create_schema(db)
+
+    def _connect(self):
+        db = sqlite3.connect(self.filename, timeout=BUSY_TIMEOUT_SEC, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, far fewer fsyncs
+        return _Closing(db)
+
+    #--------------------------------------------------
+    # Create or upgrade tables on first use, refuse databases written by a newer version
+    def _create_schema(self, db):
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)", (str(METRICS_SCHEMA_VERSION),))
+            version = int(db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0])
+            if version > METRICS_SCHEMA_VERSION:
+                raise RuntimeError(f"{self.filename} uses metrics schema v{version}, "
+                                   f"this program only knows v{METRICS_SCHEMA_VERSION}")
+            db.execute(f"CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, "
+                       f"{', '.join(METRIC_COLUMNS)})")
+            db.execute("CREATE INDEX IF NOT EXISTS runs_time ON runs (timestamp)")
+            existing = {row[1] for row in db.execute("PRAGMA table_info(runs)")}
+            for column in ADDED_COLUMNS:
+                if column not in existing:
+                    db.execute(f"ALTER TABLE runs ADD COLUMN {column}")
+            if "files" not in existing:
+                # v4: older runs get their item_count where it is known to be a file
+                # count. Runs imported from a CSV log have whole-second timestamps.
+                db.execute(f"UPDATE runs SET files = item_count WHERE version NOT IN "
+                           f"({', '.join('?' * len(NOT_FILE_COUNTS))}) AND NOT (version IN "
+                           f"({', '.join('?' * len(CSV_UNKNOWN_COUNTS))}) AND timestamp = CAST(timestamp AS INTEGER))",
+                           NOT_FILE_COUNTS + CSV_UNKNOWN_COUNTS)
+            # v2: memory of each phase of a profiled run, top_sites as JSON
+            db.execute(f"CREATE TABLE IF NOT EXISTS memory_phases (run_id INTEGER, "
+                       f"{', '.join(PHASE_COLUMNS)})")
+            db.execute("CREATE INDEX IF NOT EXISTS memory_phases_run ON memory_phases (run_id)")
+            db.execute("UPDATE meta SET value = ? WHERE key = 'schema_version'", (str(METRICS_SCHEMA_VERSION),))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    #--------------------------------------------------
+    # Buffer one run (and its memory phases); a full batch is committed right away
+    def write(self, row):
+        with self._lock:
+            self._pending.append((tuple(row.get(column) for column in METRIC_COLUMNS), row.get("memory_phases") or []))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        placeholders = ", ".join("?" * len(METRIC_COLUMNS))
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for values, phases in rows:
+                    run_id = db.execute(f"INSERT INTO runs ({', '.join(METRIC_COLUMNS)}) "
+                                        f"VALUES ({placeholders})", values).lastrowid
+                    db.executemany("INSERT INTO memory_phases VALUES (?, ?, ?, ?, ?)", [
+                        (run_id, p["phase"], p["current_bytes"], p["peak_bytes"], json.dumps(p["top_sites"]))
+                        for p in phases
+                    ])
+                if self.retention_days:
+                    # Phases of the expired runs first (found by run_id), then the runs
+                    cutoff = time.time() - self.retention_days * 86400
+                    db.execute("DELETE FROM memory_phases WHERE run_id IN (SELECT id FROM runs WHERE timestamp < ?)",
+                               (cutoff,))
+                    db.execute("DELETE FROM runs WHERE timestamp < ?", (cutoff,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def read(self):
+        self.flush()
+        with self._connect() as db:
+            cursor = db.execute(f"SELECT id, {', '.join(METRIC_COLUMNS)} FROM runs ORDER BY timestamp, id")
+            return [dict(zip(("id",) + METRIC_COLUMNS, values)) for values in cursor]
+
+    # Memory phases of every profiled run, as {run id: [phase dicts in order]}
+    def read_memory_phases(self):
+        self.flush()
+        phases = {}
+        with self._connect() as db:
+            for run_id, *values in db.execute(
+                f"SELECT run_id, {', '.join(PHASE_COLUMNS)} FROM memory_phases ORDER BY run_id, rowid"
+            ):
+                phase = dict(zip(PHASE_COLUMNS, values))
+                phase["top_sites"] = json.loads(phase["top_sites"])
+                phases.setdefault(run_id, []).append(phase)
+        return phases
+
+    #--------------------------------------------------
+    # One-time import of a legacy benchmark_log.csv (remembered in the meta table).
+    # CSV values are text; they are stored as numbers like the logged runs.
+    # files is taken from item_count where that is a file count (see NOT_FILE_COUNTS).
+    def import_csv(self, csv_file):
+        key = "imported:" + os.path.abspath(csv_file)
+        rows = []
+        with open(csv_file, newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    row["timestamp"] = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp()
+                    known = row["version"] not in NOT_FILE_COUNTS + CSV_UNKNOWN_COUNTS
+                    row["files"] = row["item_count"] if known else None  # No files column in CSV logs
+                    rows.append(tuple(_csv_value(column, row.get(column) if column in ADDED_COLUMNS else row[column])
+                                      for column in METRIC_COLUMNS))
+                except (KeyError, TypeError, ValueError):
+                    pass  # Rows interleaved by concurrent writers
+        placeholders = ", ".join("?" * len(METRIC_COLUMNS))
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            if db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                db.execute("ROLLBACK")
+                return 0
+            db.executemany(f"INSERT INTO runs ({', '.join(METRIC_COLUMNS)}) VALUES ({placeholders})", rows)
+            db.execute("INSERT INTO meta VALUES (?, ?)", (key, str(time.time())))
+            db.execute("COMMIT")
+        return len(rows)
+
+#--------------------------------------------------
+# Stored value of a CSV field: text columns as is, numbers as int or float, empty as None
+def _csv_value(column, value):
+    if column in TEXT_COLUMNS or not isinstance(value, str):
+        return value
+    if value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+#======================================================
+# sqlite3's own context manager only ends the transaction; this one closes
+class _Closing:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+#======================================================
+# Current sink (created on first use, flushed when the program exits)
+_sink = None
+
+def get_metrics_sink():
+    global _sink
+    if _sink is None:
+        set_metrics_sink(SQLiteMetricsSink())
+    return _sink
+
+def set_metrics_sink(sink):
+    global _sink
+    if _sink is not None:
+        _sink.close()
+    else:
+        atexit.register(lambda: _sink.close())
+    _sink = sink
@@ -0,0 +1,139 @@
+#======================================================
+# Imports for the native Linux backend (getdents64 + statx through ctypes)
+import os
+import sys
+import stat
+import ctypes
+import struct
+import platform
+from functools import lru_cache
+
+#======================================================
+# Defaults for the native backend
+GETDENTS_BUFFER = 1 << 20  # Bytes per getdents64 call (1 MiB holds ~30k entries, so most folders take one call)
+
+# Only the fields the scan uses are requested; AT_STATX_DONT_SYNC lets NFS/Lustre
+# answer from cached attributes instead of revalidating them with the server
+AT_SYMLINK_NOFOLLOW = 0x100
+AT_STATX_DONT_SYNC = 0x4000
+STATX_TYPE, STATX_MODE, STATX_UID, STATX_GID = 0x1, 0x2, 0x8, 0x10
+STATX_ATIME, STATX_MTIME, STATX_INO, STATX_SIZE = 0x20, 0x40, 0x100, 0x200
+STATX_MASK = STATX_TYPE | STATX_MODE | STATX_UID | STATX_GID | STATX_ATIME | STATX_MTIME | STATX_INO | STATX_SIZE
+STATX_FLAGS = AT_SYMLINK_NOFOLLOW | AT_STATX_DONT_SYNC
+
+# struct statx (256 bytes): uid, gid @20, mode @28, ino @32, size @40, atime @64, mtime @112
+STATX_SIZE_BYTES = 256
+STATX_FIELDS = struct.Struct("<20xIIH2xQQ16xq40xq")
+DT_UNKNOWN, DT_DIR = 0, 4
+DIRENT_NAME = 19  # struct linux_dirent64: d_ino u64, d_off s64, d_reclen u16, d_type u8, d_name
+
+# Syscall numbers, used where the C library has no wrapper (glibc < 2.28 / 2.30)
+SYSCALLS = {
+    "x86_64": {"getdents64": 217, "statx": 332},
+    "aarch64": {"getdents64": 61, "statx": 291},
+}
+
+#======================================================
+# ctypes entry points for getdents64(fd, buffer, size) and
+# statx(dirfd, name, flags, mask, buffer), or None off Linux
+@lru_cache(maxsize=1)
+def _functions():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+    if hasattr(libc, "getdents64") and hasattr(libc, "statx"):
+        getdents64, statx = libc.getdents64, libc.statx
+        getdents64.argtypes = (ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t)
+        getdents64.restype = ctypes.c_ssize_t
+        statx.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_uint, ctypes.c_void_p)
+        statx.restype = ctypes.c_int
+        return getdents64, statx
+
+    numbers = SYSCALLS.get(platform.machine())
+    if numbers is None:
+        return None
+    syscall = libc.syscall
+    syscall.restype = ctypes.c_long
+    # Variadic call: 64-bit arguments are passed with their ctypes type
+    def getdents64(fd, buffer, size):
+        return syscall(numbers["getdents64"], fd, buffer, ctypes.c_size_t(size))
+    def statx(dir_fd, name, flags, mask, buffer):
+        return syscall(numbers["statx"], dir_fd, name, flags, ctypes.c_uint(mask), buffer)
+    return getdents64, statx
+
+#--------------------------------------------------
+# Whether the backend works here: Linux with both calls allowed (containers
+# may block statx with seccomp). Returns None if it does, else the reason.
+@lru_cache(maxsize=1)
+def native_unavailable():
+    if _functions() is None:
+        return "needs Linux with getdents64/statx"
+    try:
+        fd = os.open(".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            calls = NativeCalls(4096)
+            calls.list_dir(fd)
+            calls.lstat(b".", fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        return f"getdents64/statx failed: {e}"
+    return None
+
+#======================================================
+# getdents64/statx with their own buffers. The buffers are reused for every
+# call, so one NativeCalls belongs to one thread (e.g. one per walk).
+class NativeCalls:
+    def __init__(self, buffer_size=GETDENTS_BUFFER):
+        self.buffer_size = buffer_size
+        self._getdents64, self._statx = _functions()
+        self._dirents = ctypes.create_string_buffer(buffer_size)
+        self._stat = ctypes.create_string_buffer(STATX_SIZE_BYTES)
+
+    #--------------------------------------------------
+    # Entries of the open directory `fd` as (dirnames, filenames), without "." and "..".
+    # Subdirectory names are str (they become tree names and are opened),
+    # file names stay bytes for lstat(). Symlinks count as files, like in fd_walk.
+    # The fd's offset is consumed, so call this once per opened directory.
+    def list_dir(self, fd):
+        getdents64, buffer, size = self._getdents64, self._dirents, self.buffer_size
+        dirnames, filenames = [], []
+        while True:
+            n = getdents64(fd, buffer, size)
+            if n < 0:
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error))
+            if n == 0:
+                return dirnames, filenames
+            data = ctypes.string_at(buffer, n)
+            pos = 0
+            while pos < n:
+                end = data.index(b"\0", pos + DIRENT_NAME)
+                name = data[pos + DIRENT_NAME:end]
+                d_type = data[pos + 18]
+                pos += data[pos + 16] | data[pos + 17] << 8  # d_reclen
+                if name == b"." or name == b"..":
+                    continue
+                if d_type == DT_UNKNOWN:  # Some filesystems do not fill d_type
+                    try:
+                        d_type = DT_DIR if stat.S_ISDIR(self.lstat(name, fd).st_mode) else 0
+                    except OSError:
+                        d_type = 0
+                if d_type == DT_DIR:
+                    dirnames.append(os.fsdecode(name))
+                else:
+                    filenames.append(name)
+
+    #--------------------------------------------------
+    # lstat of `name` (bytes) relative to directory `dir_fd`, with statx asking only
+    # for the fields the scan uses. Returns an os.stat_result (mode, ino, uid, gid,
+    # size, whole-second atime and mtime), so it works wherever an lstat result does.
+    def lstat(self, name, dir_fd):
+        if self._statx(dir_fd, name, STATX_FLAGS, STATX_MASK, self._stat) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), os.fsdecode(name))
+        uid, gid, mode, ino, size, atime, mtime = STATX_FIELDS.unpack_from(self._stat)
+        return os.stat_result((mode, ino, 0, 1, uid, gid, size, atime, mtime, mtime))
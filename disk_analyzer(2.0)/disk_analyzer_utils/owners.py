@@ -0,0 +1,117 @@
+#======================================================
+# Imports for per-owner (uid/gid) aggregation
+from array import array
+from functools import lru_cache
+import numpy as np
+
+try:
+    import pwd  # Unix only; on Windows st_uid/st_gid are always 0
+    import grp
+except ImportError:
+    pwd = grp = None
+
+#======================================================
+# Defaults for the owner report
+NAME_CACHE_SIZE = 4096  # Distinct uids/gids whose names are remembered
+OWNER_ROWS = 15         # Owners listed (largest first), the rest are summed
+OWNER_SPLIT_ROWS = 3    # Users listed per top-level item in the per-directory split
+
+#======================================================
+# Collects (size, uid, gid) of files and sums bytes and file counts per owner.
+# Like AgeHistogram, stat values are only appended per file and summed in
+# batches with NumPy, so the scan loop does no per-file dictionary work.
+class OwnerUsage:
+    def __init__(self, batch_size=65536):
+        self.batch_size = batch_size
+        self.users = {}   # uid -> [bytes, files]
+        self.groups = {}  # gid -> [bytes, files]
+        self._reset_batch()
+
+    def _reset_batch(self):
+        self._sizes = array("d")
+        self._uids = array("q")
+        self._gids = array("q")
+
+    #--------------------------------------------------
+    # Record one file from the stat result the scan already has
+    def add(self, st):
+        self._sizes.append(st.st_size)
+        self._uids.append(st.st_uid)
+        self._gids.append(st.st_gid)
+        if len(self._sizes) >= self.batch_size:
+            self.flush()
+
+    #--------------------------------------------------
+    # Fold the pending batch into the per-owner totals
+    def flush(self):
+        if not self._sizes:
+            return
+        sizes = np.frombuffer(self._sizes, dtype=np.float64)
+        for ids, totals in ((self._uids, self.users), (self._gids, self.groups)):
+            keys, inverse = np.unique(np.frombuffer(ids, dtype=np.int64), return_inverse=True)
+            byte_sums = np.bincount(inverse, weights=sizes)
+            file_counts = np.bincount(inverse)
+            for key, size, count in zip(keys.tolist(), byte_sums.tolist(), file_counts.tolist()):
+                entry = totals.setdefault(key, [0, 0])
+                entry[0] += int(size)
+                entry[1] += count
+        self._reset_batch()
+
+    #--------------------------------------------------
+    # Combine another collector (e.g. from a worker thread) into this one
+    def merge(self, other):
+        other.flush()
+        for source, totals in ((other.users, self.users), (other.groups, self.groups)):
+            for key, (size, count) in source.items():
+                entry = totals.setdefault(key, [0, 0])
+                entry[0] += size
+                entry[1] += count
+
+    #--------------------------------------------------
+    # Plain totals for a result row: {"users": {uid: (bytes, files)}, "groups": {gid: ...}}
+    def totals(self):
+        self.flush()
+        return {
+            "users": {uid: tuple(entry) for uid, entry in self.users.items()},
+            "groups": {gid: tuple(entry) for gid, entry in self.groups.items()},
+        }
+
+#======================================================
+# Sum the "owners" totals of several result rows
+def merge_owner_totals(rows):
+    merged = {"users": {}, "groups": {}}
+    for row in rows:
+        for kind in ("users", "groups"):
+            for key, (size, count) in row["owners"][kind].items():
+                size_sum, count_sum = merged[kind].get(key, (0, 0))
+                merged[kind][key] = (size_sum + size, count_sum + count)
+    return merged
+
+#--------------------------------------------------
+# Owners of one kind as [(name, bytes, files)], largest first; past `limit`
+# the rest is summed into one "<N others>" entry
+def top_owners(totals, kind, limit=OWNER_ROWS):
+    name = user_name if kind == "users" else group_name
+    ranked = sorted(totals[kind].items(), key=lambda item: item[1][0], reverse=True)
+    rows = [(name(key), size, count) for key, (size, count) in ranked[:limit]]
+    rest = ranked[limit:]
+    if rest:
+        rows.append((f"<{len(rest)} others>", sum(s for _, (s, _) in rest), sum(c for _, (_, c) in rest)))
+    return rows
+
+#======================================================
+# Owner names, looked up once per id (pwd/grp can hit NSS/LDAP, far too slow per file).
+# Ids without an entry (deleted users, files from another machine) show as the number.
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def user_name(uid):
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except (KeyError, AttributeError):
+        return str(uid)
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def group_name(gid):
+    try:
+        return grp.getgrgid(gid).gr_name
+    except (KeyError, AttributeError):
+        return str(gid)
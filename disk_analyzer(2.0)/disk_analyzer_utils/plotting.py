@@ -1,9 +1,12 @@
 #======================================================
 # Imports for plotting
 import math
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 from disk_analyzer_utils.utils import bytes_to_readable
+from disk_analyzer_utils.owners import merge_owner_totals, top_owners
+from disk_analyzer_utils.sizes import SIZE_PLOT_ITEMS, merge_size_counts, octave_counts
 
 #======================================================
 # Function to plot disk usage data in paginated horizontal bar charts
@@ -76,3 +79,59 @@ def plot(data, base_path, page_size=20):
             plt.close(fig)
         else:
             print("Last page. Close the plot window manually to finish.")
+
+    #======================================================
+    # 12) Bytes per user and group, if the scan recorded owners
+    owner_rows = [item for item in data if item.get("owners")]
+    if owner_rows:
+        plot_owners(owner_rows, base_path)
+
+    #======================================================
+    # 13) File-size distribution, if the scan recorded it
+    size_rows = [item for item in data if "sizes" in item]
+    if size_rows:
+        plot_sizes(size_rows, base_path)
+
+#======================================================
+# Bar charts of the bytes owned by each user and group (largest first)
+def plot_owners(data, base_path):
+    owners = merge_owner_totals(data)
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    for ax, kind, title in zip(axes, ("users", "groups"), ("User", "Group")):
+        rows = top_owners(owners, kind)
+        bars = ax.barh([name for name, _, _ in rows], [size for _, size, _ in rows], color='salmon')
+        ax.invert_yaxis()
+        ax.set_xlabel("Size")
+        ax.set_title(f"Usage by {title.lower()} ({base_path})")
+        ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: bytes_to_readable(x)))
+        for bar, (_, size, count) in zip(bars, rows):
+            ax.text(bar.get_width() * 1.01, bar.get_y() + bar.get_height() / 2,
+                    f"{bytes_to_readable(size)} ({count:,} files)", va='center', fontsize=8)
+        ax.grid(axis='x', linestyle='--', alpha=0.6)
+    plt.tight_layout()
+    plt.show(block=False)
+    print("Owner chart shown.")
+
+#======================================================
+# File counts per power-of-two size class: all items as bars, the largest
+# items (by bytes) as lines on top, from their log-bucketed histograms
+def plot_sizes(data, base_path):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    bounds, counts = octave_counts(merge_size_counts(data))
+    ax.bar(range(len(counts)), counts, color='lightgray', label="All items")
+    first = bounds[0] if len(bounds) else 1
+    for item in sorted(data, key=lambda x: x["size"], reverse=True)[:SIZE_PLOT_ITEMS]:
+        item_bounds, item_counts = octave_counts(item["sizes"])
+        if len(item_counts):
+            ax.plot(np.log2(item_bounds / first), item_counts, marker='o', label=item["path"])
+    ax.set_xticks(range(len(bounds)))
+    ax.set_xticklabels([bytes_to_readable(bound).replace(".00", "") for bound in bounds], rotation=45, ha='right')
+    ax.set_xlabel("File size (from)")
+    ax.set_ylabel("Files")
+    ax.set_yscale('log')  # Counts span orders of magnitude
+    ax.set_title(f"File size distribution ({base_path})")
+    ax.legend(fontsize=8)
+    ax.grid(axis='y', linestyle='--', alpha=0.6)
+    plt.tight_layout()
+    plt.show(block=False)
+    print("File size chart shown.")
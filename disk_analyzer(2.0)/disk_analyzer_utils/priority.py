@@ -0,0 +1,125 @@
+#======================================================
+# Imports for the prioritized scan order and the live top-N ranking
+import stat
+import time
+import heapq
+import sqlite3
+import statistics
+from disk_analyzer_utils.history import UsageHistory
+from disk_analyzer_utils.utils import bytes_to_readable
+
+#======================================================
+# Defaults for prioritized scans
+PROGRESS_ROWS = 5  # Largest finished items shown on each live ranking line
+TOP_ROWS = 10      # Ranking whose settling time is reported when the scan ends
+
+#--------------------------------------------------
+# Cheap size score of a folder from its own stat: st_nlink - 2 is its number
+# of subfolders on most Unix filesystems, so st_nlink - 1 is subfolders + 1
+# (a folder without subfolders still counts once), and st_size grows with its
+# number of entries. Not bytes; estimate_sizes() calibrates it against history.
+def dir_score(st):
+    return max(st.st_size, 1) * max(st.st_nlink - 1, 1)
+
+#======================================================
+# Expected size in bytes of the top-level items of `base_path`, given as
+# (name, stat) pairs. Per item, the first of:
+#   - its size in the previous run (the usage history, see history.py)
+#   - st_size for a file
+#   - dir_score() times the median bytes per score point of the folders that have history
+# Returns {name: bytes}, None for folders when no folder has history.
+def estimate_sizes(base_path, items, history=None):
+    try:
+        previous = (history or UsageHistory()).latest_sizes(base_path)
+    except sqlite3.Error:
+        previous = {}  # History unreadable (e.g. locked past the timeout): heuristics only
+    ratios = [previous[name] / dir_score(st) for name, st in items
+              if name in previous and stat.S_ISDIR(st.st_mode)]
+    ratio = statistics.median(ratios) if ratios else None
+    estimates = {}
+    for name, st in items:
+        if name in previous:
+            estimates[name] = previous[name]
+        elif not stat.S_ISDIR(st.st_mode):
+            estimates[name] = st.st_size
+        else:
+            estimates[name] = None if ratio is None else dir_score(st) * ratio
+    return estimates
+
+#--------------------------------------------------
+# Listed items of a scan, (name, path, stat) like list_items() returns them,
+# in scan order: folders first, largest expected first (by dir_score() when
+# nothing is known), then files, which take no time.
+# Returns (ordered items, ScanProgress for the live ranking).
+def largest_first(base_path, items):
+    estimates = estimate_sizes(base_path, [(name, st) for name, _, st in items])
+
+    def key(item):
+        name, _, st = item
+        expected = estimates[name]
+        return (not stat.S_ISDIR(st.st_mode), -(dir_score(st) if expected is None else expected))
+
+    ordered = sorted(items, key=key)
+    known = sum(1 for name, _, st in items if stat.S_ISDIR(st.st_mode) and estimates[name] is not None)
+    folders = sum(1 for _, _, st in items if stat.S_ISDIR(st.st_mode))
+    print(f"Scanning largest first: {known} of {folders} folders sized from the last scan or its calibration.")
+    return ordered, ScanProgress(estimates)
+
+#======================================================
+# Live ranking of a prioritized scan: every finished item is added, and a
+# line with the largest items so far is printed whenever they change. The
+# ranking is marked "likely final" once no unfinished item is expected to be
+# larger than the smallest item shown. At the end, summary() reports when the
+# final top-TOP_ROWS ranking was first reached.
+class ScanProgress:
+    def __init__(self, estimates, rows=PROGRESS_ROWS, top=TOP_ROWS):
+        self.pending = dict(estimates)  # Unfinished items -> expected bytes (or None)
+        self.items = len(estimates)
+        self.rows = rows
+        self.top = top
+        self.largest = []  # Min-heap of the `top` largest finished items, (size, name)
+        self.start = time.time()
+        self._shown = None
+        self._ranking = None
+        self._ranked_at = self.start  # When the current top-`top` ranking appeared
+
+    #--------------------------------------------------
+    # One item finished (`row` is its result row, None if it was skipped)
+    def add(self, name, row):
+        self.pending.pop(name, None)
+        if row is None:
+            return
+        entry = (row["size"], row["path"])
+        if len(self.largest) < self.top:
+            heapq.heappush(self.largest, entry)
+        elif entry > self.largest[0]:
+            heapq.heapreplace(self.largest, entry)
+        else:
+            return  # Smaller than the whole ranking: nothing changes
+        largest = sorted(self.largest, reverse=True)
+        ranking = tuple(name for _, name in largest)
+        if ranking != self._ranking:
+            self._ranking = ranking
+            self._ranked_at = time.time()
+        shown = largest[:self.rows]
+        if tuple(name for _, name in shown) != self._shown:
+            self._shown = tuple(name for _, name in shown)
+            final = " (likely final)" if self.likely_final(shown) else ""
+            print(f"[{self.items - len(self.pending)}/{self.items} done, {time.time() - self.start:.1f} s] "
+                  + ", ".join(f"{name} {bytes_to_readable(size)}" for size, name in shown) + final)
+
+    # No unfinished item is expected to beat the smallest one shown
+    def likely_final(self, shown):
+        if not self.pending:
+            return True
+        expected = list(self.pending.values())
+        if len(shown) < self.rows or None in expected:
+            return False
+        return max(expected) < shown[-1][0]
+
+    #--------------------------------------------------
+    def summary(self):
+        elapsed = time.time() - self.start
+        settled = self._ranked_at - self.start
+        print(f"Top {self.top} ranking was final after {settled:.2f} s of {elapsed:.2f} s "
+              f"({settled / max(elapsed, 1e-9) * 100:.0f}% of the scan time).")
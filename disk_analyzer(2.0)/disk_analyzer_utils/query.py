@@ -0,0 +1,492 @@
+#======================================================
+# Imports for the file index and its vectorized queries
+import os
+import re
+import json
+import shlex
+import stat
+import time
+import shutil
+from array import array
+from functools import partial
+from datetime import datetime
+import numpy as np
+from disk_analyzer_utils.fdwalk import FD_LIMIT, fd_walk, fd_walk_supported
+from disk_analyzer_utils.owners import pwd, grp, user_name, group_name
+from disk_analyzer_utils.plotting import plot
+from disk_analyzer_utils.utils import show_analysis, bytes_to_readable
+
+#======================================================
+# Defaults for file indexes and queries
+INDEX_DIR = "indexes"
+INDEX_VERSION = 1
+QUERY_ROWS = 20      # Rows shown per query (largest first), the rest are one "<N others>" row
+MAX_EXTENSIONS = 65535  # Distinct extensions with their own code; later ones share OTHER_EXTENSIONS
+OTHER_EXTENSIONS = "<other>"  # Label of the shared code MAX_EXTENSIONS (never a real extension)
+
+# One column per file attribute (array typecode, also the NumPy dtype).
+# Times are whole seconds; "dir" is the pre-order number of the file's folder.
+FILE_COLUMNS = (("size", "q"), ("mtime", "q"), ("atime", "q"), ("uid", "I"), ("gid", "I"),
+                ("dir", "I"), ("ext", "H"), ("name_end", "q"))
+
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2,
+              "g": 1024 ** 3, "gb": 1024 ** 3, "t": 1024 ** 4, "tb": 1024 ** 4}
+AGE_UNITS = {"s": 1, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+GROUP_BY = ("dir", "ext", "user", "group", "file")
+GATHER_RATIO = 16    # Filter only the matching files once fewer than 1 in 16 are left
+MAX_ID_LIST = 8      # Owner ids compared one by one up to this many (np.isin sorts)
+MAX_BINCOUNT_ID = 1 << 20  # Owner ids counted directly (bincount) below this
+MAX_OWNER_ID = (1 << 32) - 1  # uid/gid columns are uint32
+
+QUERY_HELP = """Query terms (all must match), e.g.  size>1G age>90d under=/var uid=1000
+  size>1G  size<=500M     file size (B, K, M, G, T; powers of 1024)
+  age>90d  age<1w         time since last modification (s, h, d, w, y), at index time
+  idle>180d               time since last access
+  under=/var              files below a folder ("quote paths" with spaces)
+  ext=.log,.gz            extensions (any of them)
+  uid=1000  user=alice    owner (any of a comma list); gid= and group= likewise
+  by=dir|ext|user|group|file  how results are grouped (default dir), top=N rows"""
+
+#======================================================
+# Collects one record per file during an index walk, in typed arrays (no
+# per-file objects), plus the folder tree as (parent, name) pairs.
+# save() writes every column as a .npy file that FileTable maps back.
+class FileIndex:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.columns = {name: array(code) for name, code in FILE_COLUMNS}
+        self.names = bytearray()  # File names back to back, ends in the "name_end" column
+        self.ext_codes = {"": 0}
+        self.dir_parents = [-1]
+        self.dir_names = [self.root]
+
+    def __len__(self):
+        return len(self.columns["size"])
+
+    #--------------------------------------------------
+    # Add a folder below folder `parent`; returns its number (parents come first)
+    def add_dir(self, parent, name):
+        self.dir_parents.append(parent)
+        self.dir_names.append(name)
+        return len(self.dir_names) - 1
+
+    #--------------------------------------------------
+    # Record one file of folder `node` from the stat result the walk already has
+    def add(self, node, name, st):
+        columns = self.columns
+        columns["size"].append(st.st_size)
+        columns["mtime"].append(int(st.st_mtime))
+        columns["atime"].append(int(st.st_atime))
+        columns["uid"].append(st.st_uid)
+        columns["gid"].append(st.st_gid)
+        columns["dir"].append(node)
+        ext = os.path.splitext(name)[1].lower()
+        code = self.ext_codes.get(ext)
+        if code is None:
+            if len(self.ext_codes) < MAX_EXTENSIONS:
+                code = self.ext_codes[ext] = len(self.ext_codes)
+            else:
+                # Table full: the shared code gets its own entry (and label in "exts")
+                code = self.ext_codes.setdefault(OTHER_EXTENSIONS, MAX_EXTENSIONS)
+        columns["ext"].append(code)
+        self.names += os.fsencode(name)
+        columns["name_end"].append(len(self.names))
+
+    #--------------------------------------------------
+    # Write the index to its own folder in `directory`; returns that folder.
+    # Folders are renumbered in pre-order (every folder before its subfolders,
+    # a subtree's folders consecutive), so "under a folder" is a range of
+    # numbers [node, end) and one comparison per file.
+    def save(self, directory=INDEX_DIR, taken_at=None, disk_usage=None):
+        taken_at = taken_at or time.time()
+        safe_root = self.root.strip(os.sep).replace(os.sep, "_").replace(":", "") or "root"
+        out = os.path.join(directory, f"{datetime.fromtimestamp(taken_at).strftime('%Y%m%d-%H%M%S')}_{safe_root}")
+        os.makedirs(out, exist_ok=True)
+
+        count = len(self.dir_names)
+        children = [[] for _ in range(count)]
+        for node in range(1, count):
+            children[self.dir_parents[node]].append(node)
+        order = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(reversed(children[node]))
+        subtree = [1] * count
+        for node in range(count - 1, 0, -1):  # Parents come before their children
+            subtree[self.dir_parents[node]] += subtree[node]
+        order = np.array(order, dtype=np.int64)
+        rank = np.empty(count, dtype=np.int64)
+        rank[order] = np.arange(count)
+        parents = np.array(self.dir_parents, dtype=np.int64)[order]
+        dir_columns = {
+            "dir_parent": np.where(parents < 0, -1, rank[np.maximum(parents, 0)]),
+            "dir_end": np.arange(count) + np.array(subtree, dtype=np.int64)[order],
+        }
+        dir_names = bytearray()
+        dir_name_ends = array("q")
+        for node in order.tolist():
+            dir_names += os.fsencode(self.dir_names[node])
+            dir_name_ends.append(len(dir_names))
+        dir_columns["dir_name_end"] = np.frombuffer(dir_name_ends, dtype=np.int64)
+
+        for name, code in FILE_COLUMNS:
+            values = np.frombuffer(self.columns[name], dtype=code)
+            if name == "dir":
+                values = rank[values].astype(code)
+            np.save(os.path.join(out, f"{name}.npy"), values)
+        for name, values in dir_columns.items():
+            np.save(os.path.join(out, f"{name}.npy"), values)
+        with open(os.path.join(out, "names.bin"), "wb") as f:
+            f.write(self.names)
+        with open(os.path.join(out, "dir_names.bin"), "wb") as f:
+            f.write(dir_names)
+        exts = sorted(self.ext_codes, key=self.ext_codes.get)
+        with open(os.path.join(out, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "root": self.root, "taken_at": taken_at,
+                       "disk_usage": list(disk_usage or shutil.disk_usage(self.root)),
+                       "files": len(self), "dirs": count, "exts": exts}, f)
+        return out
+
+#======================================================
+# Walk `base_path` and save a file index of it; returns the index folder.
+# Uses the fd-relative walk (one name resolved per stat) where supported.
+# Only regular files are indexed; symlinks are not followed.
+def index_files(base_path, directory=INDEX_DIR, fd_limit=FD_LIMIT):
+    taken_at = time.time()
+    index = FileIndex(base_path)
+    if fd_walk_supported():
+        lstat = partial(os.stat, follow_symlinks=False)
+        for folder, dirnames, filenames, dir_fd in fd_walk(base_path, fd_limit, lambda e: None):
+            folder.node = 0 if folder.parent is None else index.add_dir(folder.parent.node, folder.name)
+            for f in filenames:
+                try:
+                    st = lstat(f, dir_fd=dir_fd)
+                except OSError:
+                    continue  # Ignore unreadable files
+                if stat.S_ISREG(st.st_mode):
+                    index.add(folder.node, f, st)
+    else:
+        nodes = {os.path.abspath(base_path): 0}
+        for root, dirnames, filenames in os.walk(base_path):
+            node = nodes.pop(os.path.abspath(root))
+            for d in dirnames:
+                nodes[os.path.abspath(os.path.join(root, d))] = index.add_dir(node, d)
+            for f in filenames:
+                try:
+                    st = os.lstat(os.path.join(root, f))
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    index.add(node, f, st)
+    return index.save(directory, taken_at)
+
+#--------------------------------------------------
+# Saved index folders, oldest first
+def list_indexes(directory=INDEX_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, d) for d in os.listdir(directory)
+                  if os.path.isfile(os.path.join(directory, d, "index.json")))
+
+#======================================================
+# A saved file index, with the columns memory-mapped (np.load mmap_mode="r"):
+# opening is instant and a query reads only the columns it filters on.
+# Python API:
+#   table = FileTable(index_files("/srv"))
+#   files = table.select(size=(1 << 30, None), under="/srv/logs", uid=[1000])
+#   rows = table.rows(files, by="ext")     # rows for show_analysis()/plot()
+class FileTable:
+    def __init__(self, path):
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} is not a file index (v{INDEX_VERSION})")
+        self.path = path
+        self.root = meta["root"]
+        self.taken_at = meta["taken_at"]
+        self.disk_usage = tuple(meta["disk_usage"])
+        self.exts = meta["exts"]
+        self.ext_codes = {ext: code for code, ext in enumerate(self.exts)}
+        self.columns = {name: self._load(f"{name}.npy") for name, _ in FILE_COLUMNS}
+        self.dir_parent = self._load("dir_parent.npy")
+        self.dir_end = self._load("dir_end.npy")
+        self.dir_name_end = self._load("dir_name_end.npy")
+        self.names = self._bytes("names.bin")
+        self.dir_names = self._bytes("dir_names.bin")
+
+    def _load(self, name):
+        values = np.load(os.path.join(self.path, name), mmap_mode="r")
+        return values if values.size else np.asarray(values)
+
+    def _bytes(self, name):
+        filename = os.path.join(self.path, name)
+        if os.path.getsize(filename) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(filename, dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.columns["size"])
+
+    #--------------------------------------------------
+    # Names and paths, built only for the rows that are shown
+    def dir_name(self, node):
+        start = int(self.dir_name_end[node - 1]) if node else 0
+        return os.fsdecode(self.dir_names[start:int(self.dir_name_end[node])].tobytes())
+
+    def dir_path(self, node):
+        parts = []
+        while node > 0:
+            parts.append(self.dir_name(node))
+            node = int(self.dir_parent[node])
+        return os.path.join(self.root, *reversed(parts))
+
+    def file_name(self, index):
+        ends = self.columns["name_end"]
+        start = int(ends[index - 1]) if index else 0
+        return os.fsdecode(self.names[start:int(ends[index])].tobytes())
+
+    def file_path(self, index):
+        return os.path.join(self.dir_path(int(self.columns["dir"][index])), self.file_name(index))
+
+    #--------------------------------------------------
+    # Subfolders of a folder (hopping over pre-order subtrees)
+    def subdirs(self, node):
+        kids = []
+        child, end = node + 1, int(self.dir_end[node])
+        while child < end:
+            kids.append(child)
+            child = int(self.dir_end[child])
+        return kids
+
+    # Folder number of a path inside the index, or ValueError
+    def find_dir(self, path):
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            raise ValueError(f"{path} is not inside the index of {self.root}")
+        node = 0
+        for part in ([] if relative == os.curdir else relative.split(os.sep)):
+            node = next((kid for kid in self.subdirs(node) if self.dir_name(kid) == part), None)
+            if node is None:
+                raise ValueError(f"{path} is not a folder in the index of {self.root}")
+        return node
+
+    #--------------------------------------------------
+    # Numbers (ascending) of the files matching all given filters, each one
+    # a vectorized comparison over a whole column:
+    #   size/mtime/atime  (low, high) inclusive bounds, None for open
+    #   under             a folder path
+    #   ext               extensions (".log"; "" for none), any of them
+    #   uid/gid           owner ids, any of them
+    # Once few files are left, the next filters only read those files' values.
+    # Numbers rather than a boolean mask: take() with them is several times
+    # faster than masking a memory-mapped column.
+    def select(self, size=None, mtime=None, atime=None, under=None, ext=None, uid=None, gid=None):
+        tests = []  # (column, function of its values -> bool array)
+        for name, bounds in (("size", size), ("mtime", mtime), ("atime", atime)):
+            if bounds is not None:
+                tests.append((name, partial(_in_range, *bounds)))
+        if under is not None:
+            node = self.find_dir(under)
+            if node > 0:
+                tests.append(("dir", partial(_in_range, node, int(self.dir_end[node]) - 1)))
+        unlisted = set()  # Asked extensions without their own code, found by name among OTHER_EXTENSIONS
+        if ext is not None:
+            wanted = {e.lower() for e in ext}
+            codes = [self.ext_codes[e] for e in wanted if e in self.ext_codes and e != OTHER_EXTENSIONS]
+            if OTHER_EXTENSIONS in self.ext_codes:
+                unlisted = wanted - set(self.ext_codes)
+                if unlisted:
+                    codes.append(self.ext_codes[OTHER_EXTENSIONS])
+            tests.append(("ext", partial(_any_of, codes)))
+        for name, ids in (("uid", uid), ("gid", gid)):
+            if ids is not None:
+                tests.append((name, partial(_any_of, ids)))
+
+        if not tests:
+            return np.arange(len(self))
+        mask = np.ones(len(self), dtype=bool)
+        selected = None  # Numbers of the files still matching, once there are few
+        for name, test in tests:
+            column = self.columns[name]
+            if selected is None:
+                mask &= test(column)
+                if np.count_nonzero(mask) * GATHER_RATIO < len(mask):
+                    selected = np.flatnonzero(mask)
+            else:
+                selected = selected[test(column[selected])]
+        selected = np.flatnonzero(mask) if selected is None else selected
+        if unlisted:
+            # Files with the shared code match only if their own extension was asked for
+            other = _take(self.columns["ext"], selected) == self.ext_codes[OTHER_EXTENSIONS]
+            keep = [not shared or os.path.splitext(self.file_name(i))[1].lower() in unlisted
+                    for i, shared in zip(selected.tolist(), other.tolist())]
+            selected = selected[np.array(keep, dtype=bool)]
+        return selected
+
+    #--------------------------------------------------
+    # Result rows {"path", "size", "count"} of the `selected` files, grouped
+    #   dir    by subfolder of `under` (or of the root); "<files>" for the files directly in it
+    #   ext    by extension
+    #   user / group  by owner name
+    #   file   the largest files themselves
+    # Largest first; past `limit` rows the rest is one "<N others>" row.
+    def rows(self, selected, by="dir", under=None, limit=QUERY_ROWS):
+        sizes = self.columns["size"]
+        if by == "file":
+            chosen = _take(sizes, selected)
+            if len(selected) > limit:
+                top = np.argpartition(-chosen, limit - 1)[:limit]
+                selected, chosen = selected[top], chosen[top]
+            return [{"path": self.file_path(int(i)), "size": int(s), "count": 1}
+                    for i, s in sorted(zip(selected.tolist(), chosen.tolist()), key=lambda r: r[1], reverse=True)]
+
+        weights = _take(sizes, selected).astype(np.float64)
+        if by == "dir":
+            node = 0 if under is None else self.find_dir(under)
+            kids = self.subdirs(node)
+            labels = ["<files>"] + [self.dir_name(kid) for kid in kids]
+            # Group of every folder (a subtree is one range), looked up per file
+            group_of = np.zeros(len(self.dir_end), dtype=np.int32)
+            for group, kid in enumerate(kids, 1):
+                group_of[kid:int(self.dir_end[kid])] = group
+            keys = group_of.take(_take(self.columns["dir"], selected))
+        elif by == "ext":
+            labels = [ext or "<no extension>" for ext in self.exts]
+            keys = _take(self.columns["ext"], selected)
+        elif by in ("user", "group"):
+            keys = _take(self.columns["uid" if by == "user" else "gid"], selected)
+            if len(keys) and int(keys.max()) < MAX_BINCOUNT_ID:
+                ids = np.flatnonzero(np.bincount(keys))  # Only the ids present
+                keys = np.searchsorted(ids, keys)
+            else:
+                ids, keys = np.unique(keys, return_inverse=True)
+            name = user_name if by == "user" else group_name
+            labels = [name(i) for i in ids.tolist()]
+        else:
+            raise ValueError(f"Unknown grouping {by!r} (one of {', '.join(GROUP_BY)})")
+        byte_sums = np.bincount(keys, weights=weights, minlength=len(labels))
+        file_counts = np.bincount(keys, minlength=len(labels))
+        ranked = sorted(((labels[k], int(byte_sums[k]), int(file_counts[k])) for k in np.flatnonzero(file_counts)),
+                        key=lambda r: r[1], reverse=True)
+        rows = [{"path": label, "size": size, "count": count} for label, size, count in ranked[:limit]]
+        rest = ranked[limit:]
+        if rest:
+            rows.append({"path": f"<{len(rest)} others>", "size": sum(r[1] for r in rest),
+                         "count": sum(r[2] for r in rest)})
+        return rows
+
+#--------------------------------------------------
+# Vectorized tests used by select()
+def _in_range(low, high, values):
+    if low is None:
+        return values <= high
+    if high is None:
+        return values >= low
+    result = values >= low
+    result &= values <= high
+    return result
+
+# Values of the selected files (the column itself if all are selected)
+def _take(column, selected):
+    return column if len(selected) == len(column) else column.take(selected)
+
+def _any_of(ids, values):
+    if len(ids) > MAX_ID_LIST:
+        return np.isin(values, np.array(ids, dtype=values.dtype))
+    result = np.zeros(len(values), dtype=bool)
+    for i in ids:
+        result |= values == i
+    return result
+
+#======================================================
+# Parse a query expression (see QUERY_HELP) into (select() filters, options)
+# Ages are counted back from `now`, the time the index was taken.
+TERM = re.compile(r"^(\w+)(>=|<=|>|<|=)(.+)$")
+
+def parse_query(text, now):
+    filters = {}
+    options = {"by": "dir", "top": QUERY_ROWS}
+
+    def bound(name, low=None, high=None):
+        old_low, old_high = filters.get(name, (None, None))
+        if low is not None and old_low is not None:
+            low = max(low, old_low)
+        if high is not None and old_high is not None:
+            high = min(high, old_high)
+        filters[name] = (old_low if low is None else low, old_high if high is None else high)
+
+    for term in shlex.split(text):  # Raises ValueError on an unclosed quote
+        match = TERM.match(term)
+        if match is None:
+            raise ValueError(f"cannot read {term!r}")
+        field, op, value = match.group(1).lower(), match.group(2), match.group(3)
+        if field == "size":
+            number = re.match(r"^(\d+(?:\.\d+)?)([a-zA-Z]*)$", value)
+            if number is None or number.group(2).lower() not in SIZE_UNITS:
+                raise ValueError(f"bad size {value!r}")
+            size = int(float(number.group(1)) * SIZE_UNITS[number.group(2).lower()])
+            if op in ("=", ">=", ">"):
+                bound("size", low=size + (op == ">"))
+            if op in ("=", "<=", "<"):
+                bound("size", high=size - (op == "<"))
+        elif field in ("age", "idle"):
+            number = re.match(r"^(\d+(?:\.\d+)?)([a-zA-Z]?)$", value)
+            if number is None or op == "=" or (number.group(2) or "d").lower() not in AGE_UNITS:
+                raise ValueError(f"bad age {term!r} (use > or < and s, h, d, w, y)")
+            cutoff = int(now - float(number.group(1)) * AGE_UNITS[(number.group(2) or "d").lower()])
+            column = "mtime" if field == "age" else "atime"
+            if op[0] == ">":
+                bound(column, high=cutoff)  # Older than: last change before the cutoff
+            else:
+                bound(column, low=cutoff)
+        elif op != "=":
+            raise ValueError(f"use = with {field}")
+        elif field in ("under", "path"):
+            filters["under"] = value
+        elif field == "ext":
+            filters["ext"] = [e if e.startswith(".") or not e else "." + e for e in value.split(",")]
+        elif field in ("uid", "gid"):
+            if not all(part.isdigit() and int(part) <= MAX_OWNER_ID for part in value.split(",")):
+                raise ValueError(f"bad {field} {value!r} (0 to {MAX_OWNER_ID})")
+            filters[field] = [int(part) for part in value.split(",")]
+        elif field in ("user", "group"):
+            lookup = (lambda n: pwd.getpwnam(n).pw_uid) if field == "user" else (lambda n: grp.getgrnam(n).gr_gid)
+            try:
+                filters["uid" if field == "user" else "gid"] = [lookup(part) for part in value.split(",")]
+            except (KeyError, AttributeError):
+                raise ValueError(f"unknown {field} in {value!r}")
+        elif field == "by":
+            if value not in GROUP_BY:
+                raise ValueError(f"by= is one of {', '.join(GROUP_BY)}")
+            options["by"] = value
+        elif field == "top":
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"bad top {value!r}")
+            options["top"] = int(value)
+        else:
+            raise ValueError(f"unknown field {field!r}")
+    return filters, options
+
+#--------------------------------------------------
+# Run a query expression on a FileTable; returns (rows, matching files, bytes, seconds)
+def run_query(table, text):
+    filters, options = parse_query(text, table.taken_at)
+    start = time.perf_counter()
+    selected = table.select(**filters)
+    matched_bytes = int(_take(table.columns["size"], selected).sum())
+    rows = table.rows(selected, options["by"], filters.get("under"), options["top"])
+    return rows, len(selected), matched_bytes, time.perf_counter() - start
+
+#======================================================
+# Query mode: same table and chart as a scan, for the files matching `text`
+def query_analysis(table, text):
+    rows, matched, matched_bytes, seconds = run_query(table, text)
+    print(f"\n{matched:,} of {len(table):,} files match ({bytes_to_readable(matched_bytes)}), "
+          f"query time: {seconds:.3f} s")
+    if not rows:
+        return rows
+    show_analysis(rows, *table.disk_usage)
+    plot(rows, f"{table.root}: {text}")
+    return rows
@@ -0,0 +1,226 @@
+#======================================================
+# Imports for the HTML report export
+import os
+import json
+import html
+from collections import deque
+from datetime import datetime
+import numpy as np
+from disk_analyzer_utils.utils import bytes_to_readable
+
+#======================================================
+# Defaults for HTML reports
+REPORT_DIR = "reports"
+CHUNK_ENTRIES = 4000  # Child rows per chunk file (the first chunk is inlined in index.html)
+MAX_CHILDREN = 200    # Children listed per folder (largest first), the rest are one "<N other folders>" row
+SUMMARY_ROWS = 20     # Largest top-level folders in the summary table
+
+#======================================================
+# Export a tree file (MappedTree, see treefile.py) as an HTML report that
+# opens from the local filesystem with no server:
+#   <directory>/<name>/index.html   summary + the top levels of the tree, inline
+#   <directory>/<name>/chunks/N.js  children of deeper folders, loaded on expand
+# A folder's children are one group; groups are packed into chunks breadth
+# first, so the first chunk holds the top levels and every expand loads at
+# most one small file. Chunks are scripts calling DSA.chunk(N, {...}) (JSON
+# inside), because browsers block fetch()/XHR of local files but not <script src>.
+# Nothing is held per node beyond the folders queued for packing, so the
+# export of a 20M-directory tree file uses little memory.
+# Returns the path of index.html.
+def export_report(tree, directory=REPORT_DIR, name=None):
+    name = name or os.path.splitext(os.path.basename(tree.filename))[0]
+    out = os.path.join(directory, name)
+    os.makedirs(os.path.join(out, "chunks"), exist_ok=True)
+    sizes, counts, ends = tree.sizes, tree.counts, tree.ends
+
+    #--------------------------------------------------
+    # Children of a folder as rows [node, name, size, files, folders, chunk],
+    # largest first, and a "<files>" row for the files directly inside;
+    # `chunk` is where the row's own children are (-1: none)
+    def child_group(node):
+        kids = []
+        child, end = node + 1, int(ends[node])
+        while child < end:  # Pre-order: hop from one child subtree to the next
+            kids.append(child)
+            child = int(ends[child])
+        kids = np.array(kids, dtype=np.int64)
+        kids = kids[np.argsort(-sizes[kids], kind="stable")]
+        shown, hidden = kids[:MAX_CHILDREN], kids[MAX_CHILDREN:]
+        rows = [[int(k), tree.name(int(k)), int(sizes[k]), int(counts[k]), int(ends[k]) - int(k) - 1, -1]
+                for k in shown]
+        if len(hidden):
+            rows.append([-1, f"<{len(hidden)} other folders>", int(sizes[hidden].sum()),
+                         int(counts[hidden].sum()), int((ends[hidden] - hidden).sum()), -1])
+        direct_size = int(sizes[node]) - int(sizes[kids].sum())
+        direct_files = int(counts[node]) - int(counts[kids].sum())
+        if direct_files > 0:
+            rows.append([-1, "<files>", direct_size, direct_files, 0, -1])
+        return rows
+
+    #--------------------------------------------------
+    # Pack groups breadth first into chunks of up to CHUNK_ENTRIES rows: each
+    # group goes into the chunk being filled, and once it does not fit a new
+    # chunk is started. A group's chunk is chosen when its parent's rows are
+    # made, so the parent row can point at it. Only (folder, chunk) pairs are
+    # queued; rows are made again when a group is written.
+    first_chunk = None
+
+    def write_chunk(number, groups):
+        nonlocal first_chunk
+        script = f"DSA.chunk({number}, {json.dumps(groups, separators=(',', ':'))});\n"
+        if number == 0:
+            first_chunk = script
+        else:
+            with open(os.path.join(out, "chunks", f"{number}.js"), "w", encoding="utf-8") as f:
+                f.write(script)
+
+    filling, filled = 0, len(child_group(0))  # Chunk that the next group goes into, rows it holds
+    queue = deque([(0, 0)])  # (folder, chunk of its group), breadth first
+    writing, groups = 0, {}
+    while queue:
+        node, number = queue.popleft()
+        if number != writing:  # Chunks are filled in queue order, so this one is complete
+            write_chunk(writing, groups)
+            writing, groups = number, {}
+        rows = child_group(node)
+        groups[node] = rows
+        for row in rows:
+            child = row[0]
+            if child < 0 or int(ends[child]) == child + 1:
+                continue  # "others" row or no subfolders
+            size = len(child_group(child))
+            if filled + size > CHUNK_ENTRIES:
+                filling, filled = filling + 1, 0
+            row[5] = filling
+            filled += size
+            queue.append((child, filling))
+    write_chunk(writing, groups)
+
+    #--------------------------------------------------
+    # Summary: drive usage, totals and the largest top-level folders
+    total, used_bytes, free = tree.disk_usage
+    top = child_group(0)[:SUMMARY_ROWS]
+    summary_rows = "\n".join(
+        f"<tr><td>{html.escape(row[1])}</td><td class=num>{bytes_to_readable(row[2])}</td>"
+        f"<td class=num>{row[3]:,}</td><td class=num>{row[4]:,}</td></tr>" for row in top)
+    page = _PAGE.format(
+        root=html.escape(tree.root),
+        taken=datetime.fromtimestamp(tree.taken_at).strftime("%Y-%m-%d %H:%M:%S"),
+        size=bytes_to_readable(int(sizes[0])), files=f"{int(counts[0]):,}", folders=f"{len(tree) - 1:,}",
+        disk_total=bytes_to_readable(total), disk_used=bytes_to_readable(used_bytes),
+        disk_free=bytes_to_readable(free), chunks=filling + 1,
+        summary_rows=summary_rows,
+        # "<" only occurs inside JSON strings; escaped, no name can end the inline <script>
+        root_json=json.dumps([0, tree.root, int(sizes[0]), int(counts[0]), len(tree) - 1, 0]).replace("<", "\\u003c"),
+        first_chunk=first_chunk.replace("<", "\\u003c"),
+    )
+    filename = os.path.join(out, "index.html")
+    with open(filename, "w", encoding="utf-8", errors="backslashreplace") as f:  # Names that are not valid UTF-8 are escaped
+        f.write(page)
+    return filename
+
+#======================================================
+# Report page: plain HTML, CSS and JavaScript, no external files except chunks/
+_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Disk usage: {root}</title>
+<style>
+body {{ font-family: sans-serif; margin: 1.5em; color: #222; }}
+table {{ border-collapse: collapse; }}
+td, th {{ padding: 2px 10px; text-align: left; }}
+.num {{ text-align: right; font-variant-numeric: tabular-nums; }}
+#tree div.row {{ display: flex; align-items: center; white-space: nowrap; cursor: default; }}
+#tree div.row:hover {{ background: #eef; }}
+#tree .name {{ width: 40em; overflow: hidden; text-overflow: ellipsis; }}
+#tree .toggle {{ display: inline-block; width: 1.2em; cursor: pointer; color: #555; }}
+#tree .bar {{ width: 12em; height: 0.8em; background: #ddd; margin: 0 1em; }}
+#tree .bar span {{ display: block; height: 100%; background: #4a7bd0; }}
+#tree .cell {{ width: 8em; text-align: right; font-variant-numeric: tabular-nums; }}
+</style></head>
+<body>
+<h1>Disk usage of {root}</h1>
+<p>Scanned {taken}. {size} in {files} files and {folders} folders.
+Drive: {disk_total} total, {disk_used} used, {disk_free} free.</p>
+<h2>Largest top-level folders</h2>
+<table><tr><th>Folder</th><th class=num>Size</th><th class=num>Files</th><th class=num>Folders</th></tr>
+{summary_rows}
+</table>
+<h2>Tree</h2>
+<p>Click a folder to expand it. Deeper levels are loaded on demand ({chunks} chunk files).</p>
+<div id="tree"></div>
+<script>
+var DSA = {{
+  groups: {{}},    // folder node -> child rows [node, name, size, files, folders, chunk]
+  loaded: {{}},    // chunk number -> true
+  waiting: {{}},   // chunk number -> callbacks
+  chunk: function (number, groups) {{
+    for (var node in groups) DSA.groups[node] = groups[node];
+    DSA.loaded[number] = true;
+    (DSA.waiting[number] || []).forEach(function (callback) {{ callback(); }});
+    delete DSA.waiting[number];
+  }},
+  load: function (number, callback) {{
+    if (DSA.loaded[number]) return callback();
+    if (DSA.waiting[number]) return DSA.waiting[number].push(callback);
+    DSA.waiting[number] = [callback];
+    var script = document.createElement("script");
+    script.src = "chunks/" + number + ".js";
+    script.onerror = function () {{ alert("Missing report file " + script.src); }};
+    document.head.appendChild(script);
+  }}
+}};
+function readable(size) {{
+  var units = ["B", "KB", "MB", "GB", "TB", "PB"];
+  for (var i = 0; i < units.length - 1 && size >= 1024; i++) size /= 1024;
+  return size.toFixed(2) + " " + units[i];
+}}
+function addRow(container, row, parentSize, depth) {{
+  var line = document.createElement("div");
+  line.className = "row";
+  line.style.paddingLeft = (depth * 1.2) + "em";
+  var toggle = document.createElement("span");
+  toggle.className = "toggle";
+  toggle.textContent = row[5] >= 0 ? "\\u25b8" : "";
+  var name = document.createElement("span");
+  name.className = "name";
+  name.textContent = row[1];
+  name.title = row[1];
+  var bar = document.createElement("span");
+  bar.className = "bar";
+  var fill = document.createElement("span");
+  fill.style.width = (parentSize > 0 ? 100 * row[2] / parentSize : 0) + "%";
+  bar.appendChild(fill);
+  line.appendChild(toggle);
+  line.appendChild(name);
+  line.appendChild(bar);
+  [readable(row[2]), row[3].toLocaleString() + " files", row[4].toLocaleString() + " folders"].forEach(function (text) {{
+    var cell = document.createElement("span");
+    cell.className = "cell";
+    cell.textContent = text;
+    line.appendChild(cell);
+  }});
+  var children = document.createElement("div");
+  container.appendChild(line);
+  container.appendChild(children);
+  if (row[5] < 0) return;
+  line.onclick = function () {{
+    if (children.childNodes.length) {{
+      children.style.display = children.style.display === "none" ? "" : "none";
+      toggle.textContent = children.style.display === "none" ? "\\u25b8" : "\\u25be";
+      return;
+    }}
+    toggle.textContent = "\\u2026";
+    DSA.load(row[5], function () {{
+      (DSA.groups[row[0]] || []).forEach(function (child) {{ addRow(children, child, row[2], depth + 1); }});
+      toggle.textContent = "\\u25be";
+    }});
+  }};
+}}
+</script>
+<script>{first_chunk}</script>
+<script>
+var root = {root_json};
+addRow(document.getElementById("tree"), root, root[2], 0);
+document.querySelector("#tree div.row").onclick();
+</script>
+</body></html>
+"""
@@ -0,0 +1,64 @@
+#======================================================
+# Imports for rotational-disk detection and inode-ordered traversal
+import os
+import heapq
+
+#======================================================
+# Check whether the device holding `path` is a spinning disk.
+# Uses /sys/dev/block/<major>:<minor>/queue/rotational (Linux only);
+# anything that cannot be determined is treated as non-rotational.
+def is_rotational(path):
+    try:
+        dev = os.stat(path).st_dev
+        sys_path = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+        # A partition has no queue/ of its own, its parent disk does
+        if os.path.exists(os.path.join(sys_path, "partition")):
+            sys_path = os.path.dirname(sys_path)
+        with open(os.path.join(sys_path, "queue", "rotational")) as f:
+            return f.read().strip() == "1"
+    except (OSError, AttributeError):
+        return False
+
+#======================================================
+# Drop-in replacement for os.walk (top-down, no symlink following) that
+# keeps disk head movement low:
+#   - entries of a directory are returned sorted by inode number, so the
+#     caller's stat calls walk the inode table in order
+#   - directories are visited in ascending inode order in elevator sweeps:
+#     a subdirectory with a lower inode than the current one waits for the next sweep
+# d_ino and d_type from scandir are used, so ordering costs no extra syscalls.
+def inode_walk(top, onerror=None):
+    current = [(0, top)]  # Heap of (inode, path) for this sweep
+    upcoming = []          # Directories behind the head, for the next sweep
+    while current or upcoming:
+        if not current:
+            current, upcoming = upcoming, []
+        position, path = heapq.heappop(current)
+
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.inode())
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+
+        dirnames, filenames, subdirs = [], [], []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dirnames.append(entry.name)
+                subdirs.append(entry)
+            else:
+                filenames.append(entry.name)
+
+        yield path, dirnames, filenames
+
+        kept = set(dirnames)  # Caller may prune dirnames like with os.walk
+        for entry in subdirs:
+            if entry.name in kept:
+                heap = current if entry.inode() >= position else upcoming
+                heapq.heappush(heap, (entry.inode(), entry.path))
@@ -0,0 +1,101 @@
+#======================================================
+# Imports for file-size distributions
+import numpy as np
+
+#======================================================
+# Buckets of the size histogram: bucket 0 holds empty files, then every
+# power of two [2^e, 2^(e+1)) is split into SUB_BUCKETS equal parts, so a
+# bucket is at most 1/SUB_BUCKETS of its lower bound wide (quantiles within
+# 12.5%). Every power of two is a bucket bound, so counts below 4 KB are exact.
+SUB_BUCKETS = 8
+BUCKETS = 1 + 64 * SUB_BUCKETS  # 513 counts, 4 KB per histogram whatever the file count
+SMALL_FILE = 4096               # "Small" files for the report (a power of two, counted exactly)
+SIZE_QUANTILES = (0.5, 0.99)    # Quantiles shown per item
+SIZE_PLOT_ITEMS = 5             # Largest items drawn in the size distribution chart
+
+#--------------------------------------------------
+# Bucket number of each size (integer array). frexp gives size = m * 2^exp
+# with m in [0.5, 1), so 2^(exp-1) is the power of two and 2m - 1 the
+# position inside it. Exact up to 2^53 bytes.
+def bucket_of(sizes):
+    sizes = np.asarray(sizes, dtype=np.float64)
+    mantissa, exponent = np.frexp(sizes)
+    buckets = 1 + (exponent.astype(np.int64) - 1) * SUB_BUCKETS + ((2 * mantissa - 1) * SUB_BUCKETS).astype(np.int64)
+    return np.where(sizes > 0, np.minimum(buckets, BUCKETS - 1), 0)
+
+# Lower and upper size bound of every bucket (float arrays)
+def bucket_bounds():
+    k = np.arange(BUCKETS - 1)
+    power = np.exp2(k // SUB_BUCKETS)
+    lower = power * (1 + (k % SUB_BUCKETS) / SUB_BUCKETS)
+    return np.concatenate(([0.0], lower)), np.concatenate(([0.0], lower + power / SUB_BUCKETS))
+
+#======================================================
+# Log-bucketed histogram of file sizes: a fixed array of counts, so memory
+# does not grow with the number of files, and two histograms merge exactly
+# by adding their counts (e.g. from parallel workers). Fed in batches, like
+# AgeHistogram, which owns one and passes it the sizes it already collects.
+class SizeHistogram:
+    def __init__(self, counts=None):
+        self.counts = np.zeros(BUCKETS, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    #--------------------------------------------------
+    # Count a batch of sizes (NumPy array or buffer)
+    def add_sizes(self, sizes):
+        self.counts += np.bincount(bucket_of(sizes), minlength=BUCKETS)
+
+    #--------------------------------------------------
+    # Combine another histogram into this one
+    def merge(self, other):
+        self.counts += other.counts
+
+    #--------------------------------------------------
+    # Sparse form for JSON (checkpoints): {bucket: count} of the non-empty buckets
+    def state(self):
+        used = np.flatnonzero(self.counts)
+        return dict(zip(used.tolist(), self.counts[used].tolist()))
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls()
+        for bucket, count in state.items():
+            histogram.counts[int(bucket)] = count
+        return histogram
+
+#======================================================
+# Sum the "sizes" counts of several result rows (exact)
+def merge_size_counts(rows):
+    return sum((row["sizes"] for row in rows), np.zeros(BUCKETS, dtype=np.int64))
+
+#--------------------------------------------------
+# Size below which a fraction `q` of the counted files lie, interpolated
+# linearly inside its bucket
+def size_quantile(counts, q):
+    total = int(counts.sum())
+    if total == 0:
+        return 0
+    cumulative = np.cumsum(counts)
+    target = q * total
+    bucket = min(int(np.searchsorted(cumulative, target)), BUCKETS - 1)
+    lower, upper = bucket_bounds()
+    before = cumulative[bucket] - counts[bucket]
+    return float(lower[bucket] + (upper[bucket] - lower[bucket]) * (target - before) / counts[bucket])
+
+#--------------------------------------------------
+# Files, files below SMALL_FILE and the SIZE_QUANTILES of a row's counts
+def size_summary(counts):
+    return {"files": int(counts.sum()),
+            "small": int(counts[:bucket_of(SMALL_FILE)].sum()),
+            "quantiles": [size_quantile(counts, q) for q in SIZE_QUANTILES]}
+
+#--------------------------------------------------
+# Counts per power of two, for charts: (lower bound of each power, files),
+# from the first to the last non-empty one; empty files are counted with 1 B
+def octave_counts(counts):
+    per_octave = np.add.reduceat(counts[1:], np.arange(0, BUCKETS - 1, SUB_BUCKETS))
+    per_octave[0] += counts[0]
+    used = np.flatnonzero(per_octave)
+    if not len(used):
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    span = slice(used[0], used[-1] + 1)
+    return np.exp2(np.arange(len(per_octave)))[span], per_octave[span]
@@ -0,0 +1,236 @@
+#======================================================
+# Imports for saving and comparing scan snapshots
+import os
+import time
+import heapq
+from datetime import datetime
+from disk_analyzer_utils.plotting import plot
+from disk_analyzer_utils.utils import bytes_to_readable
+from disk_analyzer_utils.treefile import TreeFileWriter, TREE_FILE_EXT
+
+#======================================================
+# Snapshot file layout (plain text, one directory per line):
+#   #disk_analyzer-snapshot <TAB> v1 <TAB> root <TAB> unix time
+#   relative/path <TAB> subtree size <TAB> file count
+# Lines are in component-wise path order (a parent is directly followed by
+# its whole subtree), so two snapshots can be diffed with a streaming merge-join.
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_MAGIC = "#disk_analyzer-snapshot"
+SNAPSHOT_VERSION = "v1"
+
+#======================================================
+# Escape characters that would break the tab/newline separated format
+def escape_name(name):
+    return name.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+#======================================================
+# Sort key for a snapshot path; the root sorts before everything
+def _path_key(path):
+    return [] if path == "." else path.split("/")
+
+# The same order as one bytes string, for stores that can only sort blobs (spill.py).
+# UTF-32 keeps code point order (surrogatepass for undecodable names), and the
+# separator NUL, which is never in a name, sorts below every character.
+def path_sort_bytes(path):
+    return b"" if path == "." else path.replace("/", "\0").encode("utf-32-be", "surrogatepass")
+
+#======================================================
+# (escaped path, name, size, count) of every node of a rolled-up ScanTree,
+# in pre-order with children sorted by escaped name
+def tree_records(tree):
+    names = [escape_name(n) for n in tree.names]
+    children = [[] for _ in names]
+    for i in range(1, len(names)):
+        children[tree.parents[i]].append(i)
+    for kids in children:
+        kids.sort(key=names.__getitem__)
+
+    stack = [(0, ".")]
+    while stack:
+        node, path = stack.pop()
+        yield path, tree.names[node], tree.sizes[node], tree.counts[node]
+        for child in reversed(children[node]):
+            stack.append((child, names[child] if node == 0 else path + "/" + names[child]))
+
+#======================================================
+# Write a ScanTree to a snapshot file and return its filename.
+# A binary tree file (for offline browsing) is written next to it with the same name.
+# With text=False only the tree file is written, and its filename is returned.
+# If part of the tree was spilled to a SpillStore, the rest is added to the store
+# and both files are streamed from it, so the tree is never fully in memory.
+def save_snapshot(tree, directory=SNAPSHOT_DIR, store=None, text=True):
+    tree.rollup()
+    os.makedirs(directory, exist_ok=True)
+    taken_at = time.time()
+    safe_root = tree.root.strip(os.sep).replace(os.sep, "_").replace(":", "") or "root"
+    stem = os.path.join(directory, f"{datetime.fromtimestamp(taken_at).strftime('%Y%m%d-%H%M%S')}_{safe_root}")
+    filename = stem + ".snap"
+
+    if store is not None:
+        paths = tree.relative_paths()
+        store.add((paths[i], tree.names[i], tree.sizes[i], tree.counts[i]) for i in range(len(tree)))
+        del paths
+        records = store.records()
+    else:
+        records = tree_records(tree)
+
+    #--------------------------------------------------
+    # Pre-order gives the component-wise sorted path order the diff needs
+    writer = TreeFileWriter(stem + TREE_FILE_EXT, tree.root, tree.disk_usage, taken_at)
+    if not text:
+        for path, name, size, count in records:
+            writer.add(0 if path == "." else path.count("/") + 1, name, size, count)
+        writer.finish()
+        return stem + TREE_FILE_EXT
+    with open(filename, "w", encoding="utf-8", errors="surrogateescape") as f:
+        f.write(f"{SNAPSHOT_MAGIC}\t{SNAPSHOT_VERSION}\t{escape_name(tree.root)}\t{taken_at:.0f}\n")
+        for path, name, size, count in records:
+            f.write(f"{path}\t{size}\t{count}\n")
+            writer.add(0 if path == "." else path.count("/") + 1, name, size, count)
+    writer.finish()
+    return filename
+
+#======================================================
+# List snapshot files, oldest first
+def list_snapshots(directory=SNAPSHOT_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".snap"))
+
+#======================================================
+# Read the header of a snapshot file
+def read_snapshot_header(filename):
+    with open(filename, encoding="utf-8", errors="surrogateescape") as f:
+        magic, version, root, taken_at = f.readline().rstrip("\n").split("\t")
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"{filename} is not a {SNAPSHOT_VERSION} snapshot file")
+    return {"file": filename, "root": root, "taken_at": float(taken_at)}
+
+#======================================================
+# Stream (key, path, size, count) records of a snapshot file
+def iter_snapshot(filename):
+    with open(filename, encoding="utf-8", errors="surrogateescape") as f:
+        f.readline()  # Skip header
+        for line in f:
+            path, size, count = line.rstrip("\n").rsplit("\t", 2)
+            yield _path_key(path), path, int(size), int(count)
+
+#======================================================
+# Keep only the `top` largest items seen so far in a min-heap
+def _keep_top(heap, top, score, item):
+    if len(heap) < top:
+        heapq.heappush(heap, (score, item["path"], item))
+    elif score > heap[0][0]:
+        heapq.heapreplace(heap, (score, item["path"], item))
+
+#======================================================
+# Compare two snapshots with a merge-join over their sorted records.
+# Memory use is bounded by `top`, not by the number of directories.
+# Both must be snapshots of the same root (ValueError otherwise).
+def diff_snapshots(old_file, new_file, top=20):
+    old_header = read_snapshot_header(old_file)
+    new_header = read_snapshot_header(new_file)
+    if old_header["root"] != new_header["root"]:
+        raise ValueError(f"Snapshots of different folders: {old_header['root']} and {new_header['root']}")
+    elapsed = new_header["taken_at"] - old_header["taken_at"]
+    hours = elapsed / 3600 if elapsed > 0 else 0
+
+    changed, added, removed = [], [], []
+    added_root = removed_root = None  # Current new / vanished subtree being skipped
+    total_delta = 0
+
+    old_records = iter_snapshot(old_file)
+    new_records = iter_snapshot(new_file)
+    old = next(old_records, None)
+    new = next(new_records, None)
+
+    while old is not None or new is not None:
+        #--------------------------------------------------
+        # Directory only in the old snapshot: vanished (report the subtree root only)
+        if new is None or (old is not None and old[0] < new[0]):
+            key, path, size, count = old
+            if removed_root is None or key[:len(removed_root)] != removed_root:
+                removed_root = key
+                _keep_top(removed, top, size, {"path": path, "size": size, "count": count})
+            old = next(old_records, None)
+
+        #--------------------------------------------------
+        # Directory only in the new snapshot: new subtree (report the root only)
+        elif old is None or new[0] < old[0]:
+            key, path, size, count = new
+            if added_root is None or key[:len(added_root)] != added_root:
+                added_root = key
+                _keep_top(added, top, size, {"path": path, "size": size, "count": count})
+            new = next(new_records, None)
+
+        #--------------------------------------------------
+        # Directory in both: size change
+        else:
+            _, path, old_size, _ = old
+            _, _, new_size, new_count = new
+            delta = new_size - old_size
+            if path == ".":
+                total_delta = delta
+            elif delta:
+                _keep_top(changed, top, abs(delta), {
+                    "path": path,
+                    "old_size": old_size,
+                    "size": new_size,
+                    "count": new_count,
+                    "delta": delta,
+                    "percent": (delta / old_size * 100) if old_size else float("inf"),
+                    "rate_per_hour": (delta / hours) if hours else 0,
+                })
+            old = next(old_records, None)
+            new = next(new_records, None)
+
+    return {
+        "old": old_header,
+        "new": new_header,
+        "elapsed": elapsed,
+        "total_delta": total_delta,
+        "changed": [item for _, _, item in sorted(changed, reverse=True)],
+        "added": [item for _, _, item in sorted(added, reverse=True)],
+        "removed": [item for _, _, item in sorted(removed, reverse=True)],
+    }
+
+#======================================================
+# Print signed sizes (bytes_to_readable only handles positive values)
+def _signed(size):
+    return ("-" if size < 0 else "+") + bytes_to_readable(abs(size))
+
+#======================================================
+# Display a snapshot diff as tables
+def show_diff(diff):
+    #--------------------------------------------------
+    # 1) Summary of the two snapshots
+    old_time = datetime.fromtimestamp(diff["old"]["taken_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    new_time = datetime.fromtimestamp(diff["new"]["taken_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"\nSnapshot diff of {diff['new']['root']}: {old_time} -> {new_time}")
+    print(f"Total change: {_signed(diff['total_delta'])} in {diff['elapsed'] / 3600:.2f} h\n")
+
+    #--------------------------------------------------
+    # 2) Directories that changed most
+    print(f"{'Changed directory':<40} {'Change':>12} {'% change':>10} {'Per hour':>12} {'Now':>10}")
+    print("-" * 88)
+    for item in diff["changed"]:
+        print(f"{item['path']:<40} {_signed(item['delta']):>12} {item['percent']:>9.1f}% "
+              f"{_signed(item['rate_per_hour']):>12} {bytes_to_readable(item['size']):>10}")
+
+    #--------------------------------------------------
+    # 3) New and vanished subtrees
+    for title, items in (("New subtree", diff["added"]), ("Vanished subtree", diff["removed"])):
+        print(f"\n{title:<40} {'Size':>12} {'Files':>10}")
+        print("-" * 64)
+        for item in items:
+            print(f"{item['path']:<40} {bytes_to_readable(item['size']):>12} {item['count']:>10}")
+
+#======================================================
+# Plot the subtrees that grew (changed + new) with the usual bar chart
+def plot_diff(diff):
+    grown = [{"path": item["path"], "size": item["delta"]} for item in diff["changed"] if item["delta"] > 0]
+    grown += [{"path": item["path"] + " (new)", "size": item["size"]} for item in diff["added"] if item["size"] > 0]
+    if not grown:
+        print("Nothing grew between these snapshots.")
+        return
+    plot(grown, f"growth of {diff['new']['root']}")
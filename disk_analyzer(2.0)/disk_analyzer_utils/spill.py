@@ -0,0 +1,99 @@
+#======================================================
+# Imports for the on-disk spill store
+import os
+import sqlite3
+import tempfile
+import weakref
+import threading
+import psutil
+from disk_analyzer_utils.snapshot import escape_name, path_sort_bytes
+
+#======================================================
+# Bytes a directory takes in a ScanTree's columns (its name, list slots and
+# size/count ints), measured with tracemalloc on a 200k-directory tree
+NODE_BYTES = 200
+
+#======================================================
+# Temporary on-disk store for finished subtrees of a ScanTree, used when a
+# scan must stay under a memory budget. Rows are (sort key, escaped path, name,
+# subtree size, file count); the sort key (path_sort_bytes) makes ORDER BY
+# return the same component-wise pre-order the snapshot writer uses, so the
+# full result can be written out again without loading it back into memory.
+class SpillStore:
+    def __init__(self, directory=None, cache_kb=8192):
+        handle, self.filename = tempfile.mkstemp(prefix="disk_analyzer_spill_", suffix=".db", dir=directory)
+        os.close(handle)
+        self._lock = threading.Lock()  # Worker threads spill through one connection
+        self._db = sqlite3.connect(self.filename, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("PRAGMA temp_store=FILE")
+        self._db.execute(f"PRAGMA cache_size=-{cache_kb}")  # Keep SQLite's own memory small
+        self._db.execute("CREATE TABLE nodes (sortkey BLOB, path BLOB, name BLOB, size INTEGER, count INTEGER)")
+        self.rows = 0
+
+    #--------------------------------------------------
+    # Write (relative path, name, size, count) rows
+    def add(self, rows):
+        def encoded():
+            for path, name, size, count in rows:
+                escaped = escape_name(path)
+                yield path_sort_bytes(escaped), os.fsencode(escaped), os.fsencode(name), size, count
+
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?)", encoded())
+            self._db.commit()
+            self.rows += self._db.total_changes - before
+
+    #--------------------------------------------------
+    # Stream (escaped path, name, size, count) in snapshot order
+    def records(self):
+        with self._lock:
+            self._db.execute("CREATE INDEX IF NOT EXISTS nodes_order ON nodes (sortkey)")
+        for path, name, size, count in self._db.execute(
+            "SELECT path, name, size, count FROM nodes ORDER BY sortkey"
+        ):
+            yield os.fsdecode(path), os.fsdecode(name), size, count
+
+    #--------------------------------------------------
+    # Remove the temporary database
+    def close(self):
+        self._db.close()
+        os.unlink(self.filename)
+
+#======================================================
+# Memory ceiling for a scan. Workers call over() every `check_every`
+# directories; when the tracked trees' columns pass `spill_ratio` of the
+# limit they move finished subtrees to the store. The headroom below the
+# limit covers the work done between two checks and the rest of the process.
+# The trees are counted rather than RSS: memory freed by a spill mostly stays
+# with the process, so RSS would stay high and every later check would spill again.
+class MemoryBudget:
+    def __init__(self, limit_mb, check_every=2000, spill_ratio=0.75, directory=None):
+        self.limit = limit_mb * 1024 ** 2
+        self.threshold = self.limit * spill_ratio
+        self.check_every = check_every
+        self.store = SpillStore(directory)
+        self.peak_rss = 0
+        self._process = psutil.Process(os.getpid())
+        self._trees = weakref.WeakSet()  # Trees being filled (dropped once no longer used)
+        self._trees_lock = threading.Lock()  # Workers add and count them concurrently
+
+    #--------------------------------------------------
+    # Count a ScanTree against the budget while it exists
+    def track(self, tree):
+        with self._trees_lock:
+            self._trees.add(tree)
+
+    # Bytes held by the tracked trees
+    def held(self):
+        with self._trees_lock:
+            return sum(len(tree) for tree in self._trees) * NODE_BYTES
+
+    def over(self):
+        self.peak_rss = max(self.peak_rss, self._process.memory_info().rss)  # Reported after the scan
+        return self.held() > self.threshold
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,39 @@
+#======================================================
+# Imports for symlink following with cycle detection
+import os
+import threading
+
+#======================================================
+# Set of directory identities (st_dev, st_ino) already scanned.
+# A symlink or bind-mount alias leads to the same identity as the real
+# directory, so each physical directory is claimed exactly once.
+# Shared by worker threads, so the check-and-add is done under a lock.
+class VisitedDirs:
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def first_visit(self, st):
+        key = (st.st_dev, st.st_ino)
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            return True
+
+#======================================================
+# os.walk replacement that follows directory symlinks but enters each physical
+# directory only once (so loops like a -> .. end immediately). The caller
+# claims `top` in `visited` before walking it. Costs one stat per subdirectory.
+def follow_walk(top, visited, onerror=None):
+    for dirpath, dirnames, filenames in os.walk(top, onerror=onerror, followlinks=True):
+        keep = []
+        for d in dirnames:
+            try:
+                st = os.stat(os.path.join(dirpath, d))  # Follows the link to the real directory
+            except OSError:
+                continue  # Broken link
+            if visited.first_visit(st):
+                keep.append(d)
+        dirnames[:] = keep  # os.walk only descends into what is left
+        yield dirpath, dirnames, filenames
@@ -0,0 +1,213 @@
+#======================================================
+# Imports for low-priority, rate-limited ("polite") scanning
+import os
+import time
+import threading
+import psutil
+
+#======================================================
+# Defaults for polite mode
+POLITE_NICE = 19          # Lowest CPU priority on Unix
+STAT_RATE = 2000          # File stats per second
+DIR_RATE = 200            # Directory reads per second
+BURST_SEC = 0.5           # A bucket holds this many seconds of tokens
+LATENCY_TARGET_MS = 20.0  # Average ms per completed disk I/O above which the scan backs off
+SAMPLE_SEC = 1.0          # How often /proc/diskstats is sampled
+MIN_RATE_SCALE = 0.02     # Backing off never goes below 2% of the configured rates
+RECOVER_STEP = 0.1        # Rates come back by 10% of the configured value per quiet sample
+
+#======================================================
+# The threads of this process as psutil.Process objects (Linux keeps CPU and
+# I/O priority per thread); elsewhere just the process
+def _priority_tasks():
+    proc = psutil.Process()
+    if not os.path.isdir(f"/proc/{proc.pid}/task"):
+        return [proc]
+    tasks = []
+    for thread in proc.threads():
+        try:
+            tasks.append(psutil.Process(thread.id))
+        except psutil.Error:
+            pass  # Thread ended meanwhile
+    return tasks
+
+#======================================================
+# Put this process (every existing thread, and threads started later) in
+# the idle I/O class with the lowest CPU priority. The threads that already
+# exist (e.g. the asyncio worker pool) are changed one by one; new threads
+# inherit them. Returns (what was applied, the previous priorities for
+# restore_priority()).
+def lower_priority():
+    tasks = _priority_tasks()
+    previous = {}  # Thread id -> (nice, ionice) before the change
+    for task in tasks:
+        try:
+            previous[task.pid] = (task.nice(), task.ionice())
+        except (psutil.Error, OSError, AttributeError):
+            pass  # Not readable here: left as it is by restore_priority()
+
+    applied = set()
+    for task in tasks:
+        try:
+            task.nice(POLITE_NICE if os.name != "nt" else psutil.IDLE_PRIORITY_CLASS)
+            applied.add("low CPU priority")
+        except (psutil.Error, OSError):
+            pass
+        try:
+            if hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+                task.ionice(psutil.IOPRIO_CLASS_IDLE)
+            else:
+                task.ionice(psutil.IOPRIO_VERYLOW)  # Windows
+            applied.add("idle I/O priority")
+        except (psutil.Error, OSError, AttributeError, ValueError):
+            pass  # Not supported on this system
+    return sorted(applied), previous
+
+#--------------------------------------------------
+# Give every thread back the priority it had before lower_priority(); threads
+# started since then get the main thread's. Raising the CPU priority again
+# needs root (CAP_SYS_NICE) on Unix, so this may fail: returns True only if
+# everything was restored, otherwise the priority stays lowered until the process exits.
+def restore_priority(previous):
+    if not previous:
+        return True
+    default = previous.get(os.getpid(), next(iter(previous.values())))
+    restored = True
+    for task in _priority_tasks():
+        nice, ionice = previous.get(task.pid, default)
+        try:
+            task.nice(nice)
+        except (psutil.Error, OSError):
+            restored = False
+        try:
+            task.ionice(*ionice) if isinstance(ionice, tuple) else task.ionice(ionice)
+        except (psutil.Error, OSError, AttributeError, ValueError):
+            restored = False
+    return restored
+
+#======================================================
+# Token bucket shared by worker threads. take(n) may ask for more than the
+# bucket holds (a directory with many files): the tokens go negative and the
+# caller sleeps until they are paid back, so the long-run rate is kept.
+class TokenBucket:
+    def __init__(self, rate, burst_sec=BURST_SEC):
+        self.burst_sec = burst_sec
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    def set_rate(self, rate):
+        self.rate = rate
+        self.capacity = max(rate * self.burst_sec, 1)
+
+    def take(self, n=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+#======================================================
+# Average latency of the block device holding `path`, from /proc/diskstats:
+# time spent on reads and writes divided by the I/Os completed since the
+# last sample. Counts every process's I/O, so it sees the real workload too.
+# `available` is False where there is no such device (e.g. tmpfs, overlay, non-Linux).
+class DiskLatency:
+    def __init__(self, path):
+        try:
+            dev = os.stat(path).st_dev
+            self.key = (os.major(dev), os.minor(dev))
+        except (OSError, AttributeError):
+            self.key = None
+        self._last = self._read()
+        self.available = self._last is not None
+
+    def _read(self):
+        if self.key is None:
+            return None
+        try:
+            with open("/proc/diskstats") as f:
+                for line in f:
+                    fields = line.split()
+                    if (int(fields[0]), int(fields[1])) == self.key:
+                        # fields 3/7: reads/writes completed, 6/10: ms spent reading/writing
+                        return int(fields[3]) + int(fields[7]), int(fields[6]) + int(fields[10])
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    # ms per I/O since the previous call, or None if the device was idle
+    def sample(self):
+        current = self._read()
+        if current is None or self._last is None:
+            return None
+        ios, ms = current[0] - self._last[0], current[1] - self._last[1]
+        self._last = current
+        return ms / ios if ios > 0 else None
+
+#======================================================
+# Rate limits for one scan: a token bucket for stat calls and one for
+# directory reads. While the device's latency is above `latency_target_ms`
+# both rates are halved at every sample, and they recover step by step
+# once it is back under the target.
+class Throttle:
+    def __init__(self, path, stat_rate=STAT_RATE, dir_rate=DIR_RATE, latency_target_ms=LATENCY_TARGET_MS):
+        self.stat_rate = stat_rate
+        self.dir_rate = dir_rate
+        self.latency_target_ms = latency_target_ms
+        self.stat_bucket = TokenBucket(stat_rate)
+        self.dir_bucket = TokenBucket(dir_rate)
+        self.latency = DiskLatency(path)
+        self.scale = 1.0
+        self.backoffs = 0
+        self.last_latency_ms = None
+        self._next_sample = time.monotonic() + SAMPLE_SEC
+        self._lock = threading.Lock()
+
+    #--------------------------------------------------
+    # Called by the walkers before (or right after) the work they stand for
+    def stats(self, n=1):
+        self._adapt()
+        if n:
+            self.stat_bucket.take(n)
+
+    def read_dir(self):
+        self._adapt()
+        self.dir_bucket.take(1)
+
+    #--------------------------------------------------
+    # Sample the device latency at most every SAMPLE_SEC and rescale the rates
+    def _adapt(self):
+        if not self.latency.available or time.monotonic() < self._next_sample:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_sample:
+                return  # Another thread sampled meanwhile
+            self._next_sample = time.monotonic() + SAMPLE_SEC
+            latency = self.latency.sample()
+            if latency is None:
+                return
+            self.last_latency_ms = latency
+            if latency > self.latency_target_ms:
+                self.scale = max(self.scale / 2, MIN_RATE_SCALE)
+                self.backoffs += 1
+            else:
+                self.scale = min(self.scale + RECOVER_STEP, 1.0)
+            self.stat_bucket.set_rate(self.stat_rate * self.scale)
+            self.dir_bucket.set_rate(self.dir_rate * self.scale)
+
+    #--------------------------------------------------
+    # One line for the scan output
+    def summary(self):
+        if not self.latency.available:
+            latency = "device latency not available, fixed rates"
+        elif self.last_latency_ms is None:
+            latency = "device idle"
+        else:
+            latency = f"last latency {self.last_latency_ms:.1f} ms/IO, {self.backoffs} backoffs"
+        return (f"Polite mode: up to {self.stat_rate}/s stats, {self.dir_rate}/s directory reads, "
+                f"now at {self.scale * 100:.0f}% ({latency})")
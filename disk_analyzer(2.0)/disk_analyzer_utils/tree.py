@@ -0,0 +1,147 @@
+#======================================================
+# Imports for the scanned directory tree
+import os
+import heapq
+
+#======================================================
+# Directory tree collected during a scan.
+# Nodes are stored column-wise (parallel lists) and a parent is always
+# added before its children, so index 0 is the scanned root.
+#   names[i]   - directory name (root has "")
+#   parents[i] - index of the parent node (-1 for the root)
+#   sizes[i]   - bytes of files directly inside, or of the whole subtree after rollup()
+#   counts[i]  - number of files, same rule as sizes
+# Optionally the `largest_limit` biggest files are kept in a min-heap of (size, path).
+# `prefix` is the root's path relative to the overall scan root, for trees that
+# are built separately (e.g. in a worker thread) and grafted in later.
+class ScanTree:
+    def __init__(self, root, largest_limit=0, prefix=""):
+        self.root = root
+        self.prefix = prefix
+        self.names = [""]
+        self.parents = [-1]
+        self.sizes = [0]
+        self.counts = [0]
+        self.disk_usage = (0, 0, 0)  # (total, used, free) of the scanned drive
+        self.rolled_up = False
+        self.largest_limit = largest_limit
+        self.largest = []
+        self.largest_floor = -1 if largest_limit else float("inf")  # Files must be bigger than this
+        self.spilled = 0  # Nodes moved to a SpillStore so far
+
+    def __len__(self):
+        return len(self.names)
+
+    #--------------------------------------------------
+    # Add a child directory and return its node index
+    def add(self, parent, name):
+        self.names.append(name)
+        self.parents.append(parent)
+        self.sizes.append(0)
+        self.counts.append(0)
+        return len(self.names) - 1
+
+    #--------------------------------------------------
+    # Account files found directly inside a directory
+    def add_files(self, node, size, count):
+        self.sizes[node] += size
+        self.counts[node] += count
+
+    #--------------------------------------------------
+    # Offer a file for the largest-files list (callers check largest_floor first)
+    def add_largest(self, size, path):
+        if len(self.largest) < self.largest_limit:
+            heapq.heappush(self.largest, (size, path))
+        else:
+            heapq.heapreplace(self.largest, (size, path))
+        if len(self.largest) >= self.largest_limit:
+            self.largest_floor = self.largest[0][0]
+
+    #--------------------------------------------------
+    # Attach another (not yet rolled up) tree as a child directory of `parent`
+    def graft(self, parent, name, other):
+        node = self.add(parent, name)  # other's node i becomes node + i
+        self.sizes[node] = other.sizes[0]
+        self.counts[node] = other.counts[0]
+        self.names.extend(other.names[1:])
+        self.parents.extend(p + node for p in other.parents[1:])
+        self.sizes.extend(other.sizes[1:])
+        self.counts.extend(other.counts[1:])
+        for size, path in other.largest:
+            if size > self.largest_floor:
+                self.add_largest(size, path)
+        self.spilled += other.spilled
+        return node
+
+    #--------------------------------------------------
+    # Turn per-directory sizes/counts into subtree totals (children come after parents)
+    def rollup(self):
+        if self.rolled_up:
+            return
+        sizes, counts, parents = self.sizes, self.counts, self.parents
+        for i in range(len(parents) - 1, 0, -1):
+            sizes[parents[i]] += sizes[i]
+            counts[parents[i]] += counts[i]
+        self.rolled_up = True
+
+    #--------------------------------------------------
+    # Path of every node relative to the scan root ("." for the scan root itself)
+    def relative_paths(self):
+        paths = [self.prefix or "."]
+        names, parents = self.names, self.parents
+        for i in range(1, len(names)):
+            parent = parents[i]
+            if parent == 0 and not self.prefix:
+                paths.append(names[i])
+            else:
+                paths.append(paths[parent] + "/" + names[i])
+        return paths
+
+    #--------------------------------------------------
+    # Move finished subtrees to an on-disk SpillStore to free memory.
+    # `pending` are nodes whose directories are not walked yet; they and their
+    # ancestors stay in memory, every other node is finished. Finished nodes are
+    # rolled up, written with their subtree totals, and their totals are folded
+    # into the parent that stays, so a later rollup() still gives exact totals.
+    # Returns {old index: new index} for the nodes that stay.
+    def spill(self, store, pending):
+        names, parents, sizes, counts = self.names, self.parents, self.sizes, self.counts
+        n = len(names)
+
+        # 1) Mark pending directories and their ancestors (the root always stays)
+        keep = [False] * n
+        keep[0] = True
+        for node in pending:
+            while not keep[node]:
+                keep[node] = True
+                node = parents[node]
+
+        # 2) Roll finished nodes up into their parents and write them out
+        for i in range(n - 1, 0, -1):
+            if not keep[i]:
+                sizes[parents[i]] += sizes[i]
+                counts[parents[i]] += counts[i]
+        paths = self.relative_paths()
+        store.add((paths[i], names[i], sizes[i], counts[i]) for i in range(1, n) if not keep[i])
+        del paths
+
+        # 3) Compact the columns to the nodes that stay
+        remap = {}
+        for i in range(n):
+            if keep[i]:
+                remap[i] = len(remap)
+        self.names = [names[i] for i in remap]
+        self.parents = [-1] + [remap[parents[i]] for i in remap if i > 0]
+        self.sizes = [sizes[i] for i in remap]
+        self.counts = [counts[i] for i in remap]
+        self.spilled += n - len(remap)
+        return remap
+
+    #--------------------------------------------------
+    # Absolute path of a single node
+    def path(self, node):
+        parts = []
+        while node > 0:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return os.path.join(self.root, *reversed(parts))
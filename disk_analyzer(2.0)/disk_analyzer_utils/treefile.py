@@ -0,0 +1,200 @@
+#======================================================
+# Imports for the binary, memory-mapped tree file
+import os
+import sys
+import mmap
+import shutil
+import struct
+import tempfile
+from array import array
+import numpy as np
+
+#======================================================
+# Tree file layout (all little-endian, every column 8-byte aligned):
+#   header       magic, version, root length, node count, name blob length,
+#                scan time, disk total / used / free
+#   root         root path bytes, padded to 8 bytes
+#   sizes        int64[n]   subtree size in bytes
+#   counts       int64[n]   subtree file count
+#   parents      int64[n]   parent node index (-1 for the root)
+#   ends         int64[n]   index just after the node's subtree
+#   name_offsets int64[n+1] name of node i is blob[name_offsets[i]:name_offsets[i+1]]
+#   names        byte blob of all directory names
+# Nodes are stored in pre-order (same order as the text snapshot), so a subtree
+# is a contiguous range and the children of i are i+1, ends[i+1], ... < ends[i].
+# That order can be written in one streaming pass, from memory or from a spill store.
+TREE_FILE_MAGIC = b"DSATREE\x00"
+TREE_FILE_VERSION = 2
+TREE_FILE_EXT = ".dsa"
+_HEADER = struct.Struct("<8sIIQQdddd")
+_FLUSH_NODES = 1 << 20  # Nodes buffered per column before writing
+
+#======================================================
+# Round up to the next multiple of 8 bytes
+def _align(offset):
+    return (offset + 7) & ~7
+
+#======================================================
+# Streaming tree file writer. Call add() once per node in pre-order with
+# its depth (root = 0), then finish(). Columns go to temporary files and are
+# joined at the end, so memory use does not depend on the tree size.
+class TreeFileWriter:
+    def __init__(self, filename, root, disk_usage, taken_at):
+        self.filename = filename
+        self.root = os.fsencode(root)
+        self.disk_usage = disk_usage
+        self.taken_at = taken_at
+        self._tmp = tempfile.TemporaryDirectory(dir=os.path.dirname(filename) or ".")
+        self._files = {
+            col: open(os.path.join(self._tmp.name, col), "w+b")
+            for col in ("sizes", "counts", "parents", "ends", "name_offsets", "names")
+        }
+        self._stack = []  # (depth, index) of nodes whose subtree is still open
+        self.count = 0
+        self._blob_len = 0
+        self._new_buffers()
+        self._name_offsets.append(0)
+
+    def _new_buffers(self):
+        self._base = self.count  # Index of the first buffered node
+        self._sizes = array("q")
+        self._counts = array("q")
+        self._parents = array("q")
+        self._ends = array("q")
+        self._name_offsets = array("q")
+        self._names = bytearray()
+
+    #--------------------------------------------------
+    # Record the end of a finished subtree (may be before the current buffer)
+    def _set_end(self, index, end):
+        if index >= self._base:
+            self._ends[index - self._base] = end
+        else:
+            f = self._files["ends"]
+            f.flush()
+            os.pwrite(f.fileno(), struct.pack("<q", end), index * 8)
+
+    #--------------------------------------------------
+    # Add the next node in pre-order
+    def add(self, depth, name, size, count):
+        index = self.count
+        while self._stack and self._stack[-1][0] >= depth:
+            self._set_end(self._stack.pop()[1], index)
+        encoded = os.fsencode(name)
+        self._blob_len += len(encoded)
+        self._sizes.append(size)
+        self._counts.append(count)
+        self._parents.append(self._stack[-1][1] if self._stack else -1)
+        self._ends.append(0)  # Filled in when the subtree closes
+        self._name_offsets.append(self._blob_len)
+        self._names += encoded
+        self._stack.append((depth, index))
+        self.count += 1
+        if self.count - self._base >= _FLUSH_NODES:
+            self._flush()
+
+    def _flush(self):
+        for col in ("sizes", "counts", "parents", "ends", "name_offsets"):
+            column = getattr(self, "_" + col)
+            if sys.byteorder == "big":
+                column.byteswap()
+            self._files[col].write(column.tobytes())
+        self._files["names"].write(self._names)
+        self._new_buffers()
+
+    #--------------------------------------------------
+    # Close open subtrees and join header + columns into the final file
+    def finish(self):
+        while self._stack:
+            self._set_end(self._stack.pop()[1], self.count)
+        self._flush()
+        total, used, free = self.disk_usage
+        with open(self.filename, "wb") as out:
+            out.write(_HEADER.pack(TREE_FILE_MAGIC, TREE_FILE_VERSION, len(self.root), self.count,
+                                   self._blob_len, self.taken_at, total, used, free))
+            out.write(self.root)
+            out.write(b"\0" * (_align(out.tell()) - out.tell()))
+            for col in ("sizes", "counts", "parents", "ends", "name_offsets", "names"):
+                f = self._files[col]
+                f.flush()
+                f.seek(0)
+                shutil.copyfileobj(f, out)
+                f.close()
+        self._tmp.cleanup()
+        return self.filename
+
+#======================================================
+# Read-only view of a tree file. Columns are NumPy arrays that point straight
+# into the mapped file, so opening is O(1) whatever the tree size.
+class MappedTree:
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        #--------------------------------------------------
+        # 1) Header and root path
+        (magic, version, root_len, n, blob_len,
+         self.taken_at, total, used, free) = _HEADER.unpack_from(self._mm, 0)
+        if magic != TREE_FILE_MAGIC or version != TREE_FILE_VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a version {TREE_FILE_VERSION} tree file")
+        offset = _HEADER.size
+        self.root = os.fsdecode(self._mm[offset:offset + root_len])
+        self.disk_usage = (int(total), int(used), int(free))
+        offset = _align(offset + root_len)
+
+        #--------------------------------------------------
+        # 2) Zero-copy column views
+        def column(count):
+            nonlocal offset
+            view = np.frombuffer(self._mm, dtype="<i8", count=count, offset=offset)
+            offset += 8 * count
+            return view
+
+        self.sizes = column(n)
+        self.counts = column(n)
+        self.parents = column(n)
+        self.ends = column(n)
+        self.name_offsets = column(n + 1)
+        self._names_start = offset  # Names are sliced straight out of the map on demand
+
+    def __len__(self):
+        return len(self.sizes)
+
+    #--------------------------------------------------
+    # Node helpers used by the navigation loop
+    def name(self, node):
+        start = self._names_start
+        return os.fsdecode(self._mm[start + self.name_offsets[node]:start + self.name_offsets[node + 1]])
+
+    def children(self, node):
+        kids = []
+        ends = self.ends
+        child = node + 1
+        end = int(ends[node])
+        while child < end:  # Hop from one child subtree to the next
+            kids.append(child)
+            child = int(ends[child])
+        return kids
+
+    def path(self, node):
+        parts = []
+        while node > 0:
+            parts.append(self.name(node))
+            node = int(self.parents[node])
+        return os.path.join(self.root, *reversed(parts))
+
+    #--------------------------------------------------
+    # Drop the array views before unmapping (mmap refuses to close while exported)
+    def close(self):
+        self.sizes = self.counts = self.parents = self.ends = self.name_offsets = None
+        self._mm.close()
+        self._file.close()
+
+#======================================================
+# List tree files, oldest first
+def list_tree_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(TREE_FILE_EXT))
@@ -1,3 +1,8 @@
+#======================================================
+# Imports for the per-owner tables
+from disk_analyzer_utils.owners import OWNER_SPLIT_ROWS, merge_owner_totals, top_owners
+from disk_analyzer_utils.sizes import SMALL_FILE, SIZE_QUANTILES, merge_size_counts, size_summary
+
 #======================================================
 # Convert bytes into a human-readable format
 def bytes_to_readable(size):
@@ -9,7 +14,8 @@ def bytes_to_readable(size):
 
 #======================================================
 # Display disk usage analysis in a formatted table
-def show_analysis(disk_data, total, used, free):
+# With owner_split=True the largest users of every listed item are shown too
+def show_analysis(disk_data, total, used, free, owner_split=False):
     #--------------------------------------------------
     # 1) Print summary of total, used, and free disk space
     print(f"\nTotal disk size: {bytes_to_readable(total)}")
@@ -18,11 +24,75 @@ def show_analysis(disk_data, total, used, free):
 
     #--------------------------------------------------
     # 2) Print header row for directory analysis
-    print(f"{'Directory':<30} {'Size':>10} {'% of Used':>12}")
-    print("-" * 55)
+    # Sampled results carry an "error" (95% interval half-width) shown as an extra column
+    estimated = any("error" in data for data in disk_data)
+    if estimated:
+        print("Sizes are ESTIMATED by random sampling (+/- = 95% confidence interval).")
+        print(f"{'Directory':<30} {'Size':>10} {'% of Used':>12} {'+/-':>10}")
+        print("-" * 66)
+    else:
+        print(f"{'Directory':<30} {'Size':>10} {'% of Used':>12}")
+        print("-" * 55)
 
     #--------------------------------------------------
     # 3) Loop through disk data and print path, size, and percentage of used space
     for data in disk_data:
         percent_used = (data["size"] / used * 100) if used > 0 else 0
-        print(f"{data['path']:<30} {bytes_to_readable(data['size']):>10} {percent_used:>11.2f}%")
+        line = f"{data['path']:<30} {bytes_to_readable(data['size']):>10} {percent_used:>11.2f}%"
+        if estimated:
+            error = data.get("error", 0)
+            line += f" {'?' if error == float('inf') else bytes_to_readable(error):>10}"
+        print(line)
+
+    #--------------------------------------------------
+    # 4) Print cold data (bytes not modified / accessed for N days) if the scan recorded it
+    cold_rows = [data for data in disk_data if data.get("cold")]
+    if cold_rows:
+        days = sorted(cold_rows[0]["cold"]["mtime"])
+        mod_cols = " ".join(f"{'mod>' + str(d) + 'd':>10}" for d in days)
+        acc_cols = " ".join(f"{'acc>' + str(d) + 'd':>10}" for d in days)
+        print(f"\n{'Cold data':<30} {mod_cols} {acc_cols}")
+        print("-" * (31 + 11 * 2 * len(days)))
+        for data in cold_rows:
+            mod = " ".join(f"{bytes_to_readable(data['cold']['mtime'][d]):>10}" for d in days)
+            acc = " ".join(f"{bytes_to_readable(data['cold']['atime'][d]):>10}" for d in days)
+            print(f"{data['path']:<30} {mod} {acc}")
+
+    #--------------------------------------------------
+    # 5) Print bytes and files per user and group if the scan recorded owners
+    owner_rows = [data for data in disk_data if data.get("owners")]
+    if owner_rows:
+        owners = merge_owner_totals(owner_rows)
+        scanned = sum(data["size"] for data in owner_rows)
+        for kind, title in (("users", "User"), ("groups", "Group")):
+            print(f"\n{title:<30} {'Size':>10} {'% of Scanned':>13} {'Files':>12}")
+            print("-" * 68)
+            for name, size, count in top_owners(owners, kind):
+                share = (size / scanned * 100) if scanned > 0 else 0
+                print(f"{name:<30} {bytes_to_readable(size):>10} {share:>12.2f}% {count:>12,}")
+
+        #--------------------------------------------------
+        # 6) Optionally split by item: its largest users
+        if owner_split:
+            print(f"\n{'Directory':<30} {'User':<20} {'Size':>10} {'% of Item':>10}")
+            print("-" * 73)
+            for data in owner_rows:
+                label = data["path"]
+                for name, size, count in top_owners(data["owners"], "users", OWNER_SPLIT_ROWS):
+                    share = (size / data["size"] * 100) if data["size"] > 0 else 0
+                    print(f"{label:<30} {name:<20} {bytes_to_readable(size):>10} {share:>9.2f}%")
+                    label = ""
+
+    #--------------------------------------------------
+    # 7) Print the file-size distribution (from the log-bucketed histograms)
+    # of every item with more than one file, and of all items together
+    size_rows = [data for data in disk_data if "sizes" in data]
+    if size_rows:
+        quantile_cols = " ".join(f"{'p' + format(q * 100, 'g'):>10}" for q in SIZE_QUANTILES)
+        print(f"\n{'File sizes':<30} {'Files':>12} {'< ' + bytes_to_readable(SMALL_FILE):>12} {quantile_cols}")
+        print("-" * (56 + 11 * len(SIZE_QUANTILES)))
+        shown = [(data["path"], data["sizes"]) for data in size_rows if data["sizes"].sum() > 1]
+        for label, counts in shown + [("All items", merge_size_counts(size_rows))]:
+            summary = size_summary(counts)
+            quantiles = " ".join(f"{bytes_to_readable(size):>10}" for size in summary["quantiles"])
+            print(f"{label:<30} {summary['files']:>12,} {summary['small']:>12,} {quantiles}")
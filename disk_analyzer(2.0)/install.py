@@ -13,6 +13,7 @@ def install_requirements():
         # Try import necessary packages
         import psutil
         import matplotlib.pyplot as plt
+        import numpy
     except ImportError:
         # If any import fails -> install from requirements.txt
         requirements_path = os.path.join(os.path.dirname(__file__), "requirements.txt")
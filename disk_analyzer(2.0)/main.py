@@ -1,8 +1,24 @@
+import os
+import sqlite3
 import asyncio
 import psutil
 import install
 from disk_analyzer import analyzer as base_analyzer
 from disk_analyzer_optimize import analyzer as optimized_analyzer
+from disk_analyzer_optimize.multi_drive import analyze_all_drives
+from disk_analyzer_utils.snapshot import SNAPSHOT_DIR, list_snapshots, diff_snapshots, show_diff, plot_diff
+from disk_analyzer_utils.treefile import MappedTree, list_tree_files
+from disk_analyzer_utils.utils import bytes_to_readable
+from disk_analyzer_utils.benchmark import benchmark_traversal_order
+from disk_analyzer_utils.browser import browser_available
+from disk_analyzer_utils.estimate import estimate_analysis
+from disk_analyzer_utils.bench_report import benchmark_report
+from disk_analyzer_utils.engines import load_engines, analyze_with, cross_check
+from disk_analyzer_utils.checkpoint import checkpoint_path
+from disk_analyzer_utils.report import export_report
+from disk_analyzer_utils.query import QUERY_HELP, FileTable, index_files, list_indexes, query_analysis
+from disk_analyzer_utils.history import FORECAST_WINDOW_DAYS, UsageHistory, forecast, show_forecast
+from disk_analyzer_daemon.daemon import ScanDaemon, query_daemon, DEFAULT_REFRESH_SEC
 
 #======================================================
 # List all mounted disk drives
@@ -37,12 +53,257 @@ def input_case(drives):
         else:
             print("Invalid drive. Try again.")
 
+#======================================================
+# Ask whether results should open in the full-screen browser (if curses is available)
+def ask_browser():
+    if not browser_available():
+        return False
+    return input("Open results in the full-screen browser? (y/N) ").strip().lower() == "y"
+
+#======================================================
+# Ask whether scans should do the largest folders (by the last scan's sizes) first
+def ask_prioritize():
+    return input("Scan the largest folders first (sized from the last scan) and show the top items "
+                 "as they finish? (y/N) ").strip().lower() == "y"
+
+#======================================================
+# Let the user pick two saved snapshots and show what grew between them
+def compare_snapshots():
+    snapshots = list_snapshots()
+    if len(snapshots) < 2:
+        print("At least 2 snapshots are needed. Run a scan with snapshot saving first.")
+        return
+    for i, snap in enumerate(snapshots, 1):
+        print(f"{i}: {snap}")
+    print(f"Select old and new snapshot numbers (Enter for the latest two: {len(snapshots) - 1} {len(snapshots)}):")
+    choice = input("> ").split()
+    if not choice:
+        old, new = snapshots[-2], snapshots[-1]
+    elif len(choice) == 2 and all(c.isdigit() and 1 <= int(c) <= len(snapshots) for c in choice):
+        old, new = snapshots[int(choice[0]) - 1], snapshots[int(choice[1]) - 1]
+    else:
+        print("Invalid selection")
+        return
+    try:
+        diff = diff_snapshots(old, new)
+    except ValueError as e:
+        print(f"Cannot compare: {e}")
+        return
+    show_diff(diff)
+    plot_diff(diff)
+
+#======================================================
+# Let the user pick a saved tree file (every scan writes one); returns a MappedTree or None
+def choose_tree_file():
+    tree_files = list_tree_files(SNAPSHOT_DIR)
+    for i, tree_file in enumerate(tree_files, 1):
+        print(f"{i}: {tree_file}")
+    print("Select a tree file number or type a path to a .dsa file:")
+    choice = input("> ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(tree_files):
+        filename = tree_files[int(choice) - 1]
+    else:
+        filename = choice
+    try:
+        return MappedTree(filename)
+    except (OSError, ValueError) as e:
+        print(f"Cannot open tree file: {e}")
+        return None
+
+#======================================================
+# Browse a saved tree file without scanning (works on any machine)
+def browse_tree_file():
+    tree = choose_tree_file()
+    if tree is None:
+        return False
+    try:
+        return base_analyzer.analyzer(tree.root, tree=tree, browser=ask_browser())
+    finally:
+        tree.close()
+
+#======================================================
+# Export a saved tree file as an HTML report (opens offline, loads deeper levels on demand)
+def export_html_report():
+    tree = choose_tree_file()
+    if tree is None:
+        return
+    try:
+        print(f"Report written: {os.path.abspath(export_report(tree))}")
+    finally:
+        tree.close()
+
+#======================================================
+# Query files of a saved index (or index a folder first), one expression per line until an empty one
+def query_files():
+    indexes = list_indexes()
+    for i, index in enumerate(indexes, 1):
+        print(f"{i}: {index}")
+    print("Select an index number, or type a folder to index now (Enter for /):")
+    choice = input("> ").strip()
+    try:
+        if choice.isdigit() and 1 <= int(choice) <= len(indexes):
+            table = FileTable(indexes[int(choice) - 1])
+        else:
+            print(f"Indexing: {choice or '/'}")
+            table = FileTable(index_files(choice or "/"))
+    except (OSError, ValueError) as e:
+        print(f"Cannot open index: {e}")
+        return
+    print(f"{len(table):,} files indexed in {table.root}.")
+    print(QUERY_HELP)
+    while True:
+        text = input("query> ").strip()
+        if not text:
+            return
+        try:
+            query_analysis(table, text)
+        except ValueError as e:
+            print(f"Invalid query: {e}")
+
+#======================================================
+# Forecast when each filesystem fills up from the usage history of past scans,
+# optionally merging history files copied from other hosts first
+def forecast_growth():
+    history = UsageHistory()
+    for filename in input("History files of other hosts to import (Enter to skip): ").split():
+        try:
+            print(f"{filename}: {history.import_history(filename)} new samples")
+        except (OSError, sqlite3.Error) as e:
+            print(f"Cannot import {filename}: {e}")
+    window = input(f"Days of history to fit (Enter for {FORECAST_WINDOW_DAYS}): ").strip()
+    window = int(window) if window.isdigit() and int(window) > 0 else FORECAST_WINDOW_DAYS
+    forecasts = forecast(history, window)
+    if not forecasts:
+        print("No usage history yet: every scan adds one sample.")
+        return
+    show_forecast(forecasts, window)
+
+#======================================================
+# Run the scan daemon for all drives (blocks until Ctrl-C)
+def run_daemon():
+    refresh = input(f"Refresh interval in seconds (Enter for {DEFAULT_REFRESH_SEC}): ").strip()
+    polite = input("Polite mode: idle I/O priority and rate-limited rescans? (y/N) ").strip().lower() == "y"
+    daemon = ScanDaemon(refresh_sec=int(refresh) if refresh.isdigit() else DEFAULT_REFRESH_SEC, polite=polite)
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        print("Daemon stopped.")
+    except OSError as e:
+        print(f"Cannot start the daemon: {e}")
+
+#======================================================
+# Ask a running daemon about a path
+def ask_daemon():
+    path = input("Path to query: ").strip() or "/"
+    try:
+        for op in ("size", "top", "largest"):
+            response = query_daemon({"op": op, "path": path, "n": 10})
+            if not response["ok"]:
+                print(f"Daemon error: {response['error']}")
+                return
+            if op == "size":
+                print(f"\n{response['path']}: {bytes_to_readable(response['size'])} in {response['count']} files")
+            else:
+                print(f"\n{'Largest subdirectories' if op == 'top' else 'Largest files':<50} {'Size':>10}")
+                print("-" * 61)
+                for item in response["children" if op == "top" else "files"]:
+                    print(f"{item['path']:<50} {bytes_to_readable(item['size']):>10}")
+    except OSError as e:
+        print(f"Cannot reach the daemon: {e}")
+
+#======================================================
+# Quick estimate of a folder by sampling (runs until converged, time limit or Ctrl-C)
+def estimate_folder():
+    path = input("Path to estimate (Enter for /): ").strip() or "/"
+    limit = input("Time limit in seconds (Enter to run until converged or Ctrl-C): ").strip()
+    estimate_analysis(path, int(limit) if limit.isdigit() else None)
+
+#======================================================
+# Scan with any registered engine, or cross-check all of them on one folder
+async def scan_engines():
+    engines = load_engines()
+    names = list(engines)
+    for i, name in enumerate(names, 1):
+        print(f"{i}: {name:<12} {engines[name].description}")
+    print("Select an engine number, or \"a\" to benchmark all engines and cross-check their totals:")
+    choice = input("> ").strip().lower()
+    if choice != "a" and not (choice.isdigit() and 1 <= int(choice) <= len(names)):
+        print("Invalid selection")
+        return
+    path = input("Path to scan (Enter for /): ").strip() or "/"
+    follow_symlinks = input("Follow directory symlinks? (y/N) ").strip().lower() == "y"
+    if choice == "a":
+        repeat = input("Runs per engine (Enter for 3): ").strip()
+        await cross_check(path, repeat=int(repeat) if repeat.isdigit() and int(repeat) > 0 else 3,
+                          follow_symlinks=follow_symlinks)
+    else:
+        await analyze_with(names[int(choice) - 1], path, follow_symlinks=follow_symlinks, prioritize=ask_prioritize())
+
 #======================================================
 # Main async function to run the analyzer
 async def main():
     restart = False
     drives = list_drives()
 
+    # Select analyzer version
+    print("Select analyzer version:")
+    print("1) Base (single-threaded)")
+    print("2) Optimized (Threaded & Asyncio)")
+    print("3) Compare snapshots (what grew)")
+    print("4) Browse a saved tree file (offline)")
+    print("5) Run scan daemon (serves size queries)")
+    print("6) Query scan daemon")
+    print("7) Scan all drives concurrently")
+    print("8) Benchmark traversal order (inode vs directory order)")
+    print("9) Quick size estimate (random sampling)")
+    print("10) Benchmark history report (throughput regressions)")
+    print("11) Scan engines (run any engine, or cross-check all of them)")
+    print("12) Export an HTML report of a saved tree file")
+    print("13) Query files (size, age, folder, extension, owner)")
+    print("14) Growth forecast (when each filesystem fills up)")
+    choice = input("> ")
+
+    if choice == "3":
+        compare_snapshots()
+        return
+    if choice == "4":
+        if browse_tree_file():
+            await main()
+        return
+    if choice == "5":
+        run_daemon()
+        return
+    if choice == "6":
+        ask_daemon()
+        return
+    if choice == "7":
+        analyze_all_drives()
+        return
+    if choice == "8":
+        benchmark_traversal_order(input("Path to benchmark (e.g. a mounted test image): ").strip() or ".")
+        return
+    if choice == "9":
+        estimate_folder()
+        return
+    if choice == "10":
+        benchmark_report()
+        return
+    if choice == "11":
+        await scan_engines()
+        return
+    if choice == "12":
+        export_html_report()
+        return
+    if choice == "13":
+        query_files()
+        return
+    if choice == "14":
+        forecast_growth()
+        return
+    if choice not in ("1", "2"):
+        print("Invalid selection")
+        return
+
     # Display all available drives
     for i, d in enumerate(drives):
         print(f"{i + 1}: {d}")
@@ -50,19 +311,31 @@ async def main():
     # Choose drive
     path = "/" if len(drives) == 1 else input_case(drives)
 
-    # Select analyzer version
-    print("Select analyzer version:")
-    print("1) Base (single-threaded)")
-    print("2) Optimized (Threaded & Asyncio)")
-    choice = input("> ")
-    
+    # Ask whether the first scan should be saved as a snapshot
+    snapshot = input("Save a snapshot of this scan for later comparison? (y/N) ").strip().lower() == "y"
+    follow_symlinks = input("Follow directory symlinks? (y/N) ").strip().lower() == "y"
+    browser = ask_browser()
+    profile_memory = input("Profile memory use per scan phase with tracemalloc (slower)? (y/N) ").strip().lower() == "y"
+    owner_split = input("Split usage per user by top-level item? (y/N) ").strip().lower() == "y"
+    prioritize = ask_prioritize()
+
     # Run selected analyzer
     if choice == "1":
-        restart = base_analyzer.analyzer(path)  # Synchronous call
+        restart = base_analyzer.analyzer(path, snapshot, follow_symlinks=follow_symlinks, browser=browser,
+                                         profile_memory=profile_memory, owner_split=owner_split,
+                                         prioritize=prioritize)  # Synchronous call
     elif choice == "2":
-        restart = await optimized_analyzer.analyzer(path)  # Asynchronous call
-    else:
-        print("Invalid selection")
+        limit = input("Memory limit in MB (Enter for no limit): ").strip()
+        memory_limit_mb = int(limit) if limit.isdigit() else None
+        polite = input("Polite mode for busy servers: idle I/O priority, rate limits (slower; without root the "
+                       "priority stays lowered for the rest of this session)? (y/N) ").strip().lower() == "y"
+        checkpoint = input("Checkpoint the scan so it can be resumed after an interruption? (y/N) ").strip().lower() == "y"
+        resume = False
+        if checkpoint and os.path.exists(checkpoint_path(path)):
+            resume = input("An interrupted scan of this drive was found. Resume it? (Y/n) ").strip().lower() != "n"
+        restart = await optimized_analyzer.analyzer(path, snapshot, memory_limit_mb, follow_symlinks, browser,
+                                                      profile_memory, owner_split, polite, checkpoint,
+                                                      resume, prioritize)  # Asynchronous call
     
     # Optionally restart scan
     if restart:
@@ -0,0 +1,53 @@
+#======================================================
+# Regression tests for checkpoint and resume: a scan that is stopped and
+# resumed must give the same totals as an uninterrupted one, also when the
+# tree holds a directory symlink (os.walk lists it but never enters it).
+# Both walks are tested, the parallel os.walk one and the inode-ordered one.
+# Run from the project folder: python -m unittest discover tests
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+from disk_analyzer_utils.checkpoint import Checkpoint, ScanStopped, CHECK_EVERY_DIRS
+from disk_analyzer_optimize.analyzer import scan
+
+#======================================================
+# a/ holds more folders than one stop check (so the walk stops inside it),
+# a file in each, and a/link -> ../b; b/ holds 5 files of 1000 bytes
+def make_tree(root):
+    for i in range(CHECK_EVERY_DIRS + 50):
+        os.makedirs(os.path.join(root, "a", f"d{i:04d}"))
+        with open(os.path.join(root, "a", f"d{i:04d}", "f"), "wb") as f:
+            f.write(b"x" * 10)
+    os.makedirs(os.path.join(root, "b"))
+    for i in range(5):
+        with open(os.path.join(root, "b", f"g{i}"), "wb") as f:
+            f.write(b"y" * 1000)
+    os.symlink(os.path.join("..", "b"), os.path.join(root, "a", "link"))
+
+class ResumeTest(unittest.TestCase):
+    def test_resumed_scan_matches_uninterrupted_scan(self):
+        for rotational in (False, True):
+            with self.subTest(rotational=rotational), \
+                    mock.patch("disk_analyzer_optimize.analyzer.is_rotational", return_value=rotational), \
+                    tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as saved:
+                make_tree(root)
+                expected = asyncio.run(scan(root))
+
+                checkpoint = Checkpoint(root, directory=saved)
+                checkpoint.request_stop()  # Every walker saves and stops at its first check
+                with self.assertRaises(ScanStopped):
+                    asyncio.run(scan(root, checkpoint=checkpoint))
+                checkpoint.close()
+
+                checkpoint = Checkpoint(root, directory=saved)
+                self.assertTrue(checkpoint.resumed)
+                resumed = asyncio.run(scan(root, checkpoint=checkpoint))
+                checkpoint.close()
+                self.assertEqual((resumed.total_size, resumed.file_count),
+                                 (expected.total_size, expected.file_count))
+                self.assertEqual(expected.file_count, CHECK_EVERY_DIRS + 50 + 5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#======================================================
+# Tests for the scan daemon protocol: a daemon serves a small tree on a
+# temporary socket and local clients ask it for sizes, top children and
+# largest files. Run from the project folder: python -m unittest discover tests
+import os
+import json
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from disk_analyzer_daemon.daemon import ScanDaemon, query_daemon, remove_stale_socket
+
+#======================================================
+# root/a: 100 + 200 bytes, root/a/deep: 400 bytes, root/b: 50 bytes, root/f: 10 bytes
+def make_tree(root):
+    os.makedirs(os.path.join(root, "a", "deep"))
+    os.makedirs(os.path.join(root, "b"))
+    for path, size in (("a/x", 100), ("a/y", 200), ("a/deep/z", 400), ("b/w", 50), ("f", 10)):
+        with open(os.path.join(root, path), "wb") as f:
+            f.write(b"x" * size)
+
+# One raw line to the daemon, one decoded line back
+def send_line(socket_path, line):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(socket_path)
+        sock.sendall(line)
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.folder.name, "tree")
+        make_tree(self.root)
+        self.socket_path = os.path.join(self.folder.name, "d.sock")
+        self.daemon = ScanDaemon(roots=[self.root], refresh_sec=3600)
+        with mock.patch("disk_analyzer_daemon.daemon.record_usage"):  # No usage history file in the test folder
+            self.daemon.refresh()
+        self.daemon.refresh = lambda: None  # serve() keeps the scan made above
+        self.thread = threading.Thread(target=self.daemon.serve, args=(self.socket_path,))
+        self.thread.start()
+        while self.daemon._server is None:
+            self.thread.join(0.01)
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.thread.join()
+        self.folder.cleanup()
+
+    def test_size(self):
+        response = query_daemon({"op": "size", "path": os.path.join(self.root, "a")}, self.socket_path)
+        self.assertTrue(response["ok"])
+        self.assertEqual((response["size"], response["count"]), (700, 3))
+
+    def test_top(self):
+        response = query_daemon({"op": "top", "path": self.root, "n": 1}, self.socket_path)
+        self.assertEqual(response["children"], [{"path": "a", "size": 700, "count": 3}])
+
+    def test_largest(self):
+        response = query_daemon({"op": "largest", "path": os.path.join(self.root, "a"), "n": 2}, self.socket_path)
+        self.assertEqual([(os.path.basename(f["path"]), f["size"]) for f in response["files"]], [("z", 400), ("y", 200)])
+
+    def test_errors(self):
+        self.assertIn("bad JSON", send_line(self.socket_path, b"{not json\n")["error"])
+        self.assertFalse(query_daemon(["size"], self.socket_path)["ok"])
+        self.assertFalse(query_daemon({"op": "size", "path": os.path.join(self.root, "nope")}, self.socket_path)["ok"])
+        self.assertFalse(query_daemon({"op": "top", "path": self.root, "n": -1}, self.socket_path)["ok"])
+
+    def test_socket_is_private_and_not_taken_over(self):
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+        with self.assertRaises(FileExistsError):
+            remove_stale_socket(self.socket_path)  # The running daemon answers
+
+if __name__ == "__main__":
+    unittest.main()
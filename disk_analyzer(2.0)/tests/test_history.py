@@ -0,0 +1,58 @@
+#======================================================
+# Tests for the usage history and its forecast: daily samples on a straight
+# line give back that line's growth and the day the filesystem fills up,
+# and series with too few samples get no trend.
+# Run from the project folder: python -m unittest discover tests
+import os
+import tempfile
+import unittest
+from disk_analyzer_utils.history import UsageHistory, forecast, DAY_SEC, MIN_SAMPLES
+
+NOW = 1700000000.0
+
+class ForecastTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.history = UsageHistory(os.path.join(self.folder.name, "history.db"))
+        # h1: used grows 100 bytes a day from 1000, total 5000; item "logs" grows 60, "data" shrinks
+        for day in range(10):
+            rows = [{"path": "logs", "size": 200 + 60 * day}, {"path": "data", "size": 800 - day}]
+            self.history.record(self.folder.name, (5000, 1000 + 100 * day, 0), rows,
+                                taken_at=NOW - (9 - day) * DAY_SEC, host="h1")
+        # h2: fewer samples than a trend needs
+        for day in range(MIN_SAMPLES - 1):
+            self.history.record(self.folder.name, (5000, 1000, 0), taken_at=NOW - day * DAY_SEC, host="h2")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_linear_growth(self):
+        h1, h2 = forecast(self.history, now=NOW)
+        self.assertEqual((h1["host"], h1["used"], h1["total"], h1["samples"]), ("h1", 1900, 5000, 10))
+        self.assertAlmostEqual(h1["growth"], 100.0)
+        self.assertAlmostEqual(h1["r2"], 1.0)
+        self.assertAlmostEqual(h1["days_left"], 31.0)
+        self.assertIsInstance(h1["full_at"], float)
+        self.assertAlmostEqual(h1["full_at"], NOW + 31 * DAY_SEC, delta=1)
+        # Only growing items drive the forecast
+        self.assertEqual([(os.path.basename(path), round(rate), size) for path, rate, size in h1["drivers"]],
+                         [("logs", 60, 740)])
+
+    def test_too_few_samples(self):
+        h2 = forecast(self.history, now=NOW)[1]
+        self.assertEqual(h2["host"], "h2")
+        self.assertIsNone(h2["growth"])
+        self.assertIsNone(h2["days_left"])
+        self.assertIsNone(h2["full_at"])
+
+    def test_window(self):
+        # Samples older than the window are left out of the fit
+        h1 = forecast(self.history, window_days=4.5, now=NOW)[0]
+        self.assertEqual(h1["samples"], 5)
+
+    def test_same_day_keeps_the_latest_sample(self):
+        self.history.record(self.folder.name, (5000, 1950, 0), taken_at=NOW + 1, host="h1")
+        self.assertEqual(forecast(self.history, now=NOW + 1)[0]["used"], 1950)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#======================================================
+# Tests for the file index and its query filters: an indexed folder is
+# queried by size, folder (also with a quoted path holding a space),
+# extension (also past the extension table, where codes are shared as
+# "<other>") and owner. Run from the project folder: python -m unittest discover tests
+import os
+import tempfile
+import unittest
+from unittest import mock
+from disk_analyzer_utils.query import FileTable, index_files, parse_query, run_query, OTHER_EXTENSIONS
+
+#======================================================
+# {relative file: bytes}
+FILES = {"a/x.log": 100, "a/y.txt": 2000, "a/sub/z.log": 5000, "b c/w.log": 7, "top.bin": 10, "README": 3}
+
+def make_tree(root):
+    for path, size in FILES.items():
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), "wb") as f:
+            f.write(b"x" * size)
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.folder.name, "tree")
+        make_tree(self.root)
+        self.table = FileTable(index_files(self.root, directory=os.path.join(self.folder.name, "indexes")))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    # Relative paths of the selected files
+    def paths(self, selected):
+        return sorted(os.path.relpath(self.table.file_path(int(i)), self.root) for i in selected)
+
+    def test_filters(self):
+        self.assertEqual(len(self.table), len(FILES))
+        self.assertEqual(self.paths(self.table.select(size=(100, 2000))), ["a/x.log", "a/y.txt"])
+        self.assertEqual(self.paths(self.table.select(under=os.path.join(self.root, "a"))),
+                         ["a/sub/z.log", "a/x.log", "a/y.txt"])
+        self.assertEqual(self.paths(self.table.select(ext=[".log"], size=(None, 1000))), ["a/x.log", "b c/w.log"])
+        self.assertEqual(self.paths(self.table.select(ext=[""])), ["README"])
+        self.assertEqual(len(self.table.select(uid=[os.getuid()])), len(FILES))
+        self.assertEqual(len(self.table.select(uid=[os.getuid() + 1])), 0)
+
+    def test_rows(self):
+        rows = self.table.rows(self.table.select(), by="dir")
+        self.assertEqual(rows[0], {"path": "a", "size": 7100, "count": 3})
+        self.assertIn({"path": "<files>", "size": 13, "count": 2}, rows)
+        rows = self.table.rows(self.table.select(), by="ext")
+        self.assertEqual(rows[0], {"path": ".log", "size": 5107, "count": 3})
+        rows = self.table.rows(self.table.select(), by="file", limit=2)
+        self.assertEqual([r["size"] for r in rows], [5000, 2000])
+
+    def test_query_text(self):
+        rows, matched, matched_bytes, _ = run_query(self.table, f'under="{os.path.join(self.root, "b c")}"')
+        self.assertEqual((matched, matched_bytes), (1, 7))
+        for text in ("size>1Q", "age=3d", "uid=4294967296", "uid=-1", 'under="/x', "colour=red"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_query(text, 0)
+
+    def test_shared_extension_code(self):
+        # With room for one extension, the others share OTHER_EXTENSIONS and
+        # are told apart by name when asked for
+        with mock.patch("disk_analyzer_utils.query.MAX_EXTENSIONS", 2):
+            table = FileTable(index_files(self.root, directory=os.path.join(self.folder.name, "small")))
+        self.assertIn(OTHER_EXTENSIONS, table.exts)
+        self.table = table
+        for ext, expected in ((".log", ["a/sub/z.log", "a/x.log", "b c/w.log"]), (".txt", ["a/y.txt"]),
+                              (".bin", ["top.bin"]), (".gz", [])):
+            with self.subTest(ext=ext):
+                self.assertEqual(self.paths(table.select(ext=[ext])), expected)
+
+if __name__ == "__main__":
+    unittest.main()
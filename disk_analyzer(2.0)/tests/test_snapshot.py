@@ -0,0 +1,56 @@
+#======================================================
+# Tests for the text snapshot format and the streaming diff: two snapshots
+# of one root are merge-joined into changed, new and vanished folders, and
+# snapshots of different roots are refused.
+# Run from the project folder: python -m unittest discover tests
+import os
+import tempfile
+import unittest
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.snapshot import save_snapshot, diff_snapshots, iter_snapshot
+
+#======================================================
+# ScanTree of `root` from {relative folder: (bytes, files) directly inside},
+# parents listed before their subfolders
+def make_tree(root, folders):
+    tree = ScanTree(root)
+    nodes = {".": 0}
+    for path, (size, count) in folders.items():
+        if path != ".":
+            parent, _, name = path.rpartition("/")
+            nodes[path] = tree.add(nodes[parent or "."], name)
+        tree.add_files(nodes[path], size, count)
+    return tree
+
+OLD = {".": (10, 1), "a": (100, 1), "a/old": (30, 1), "b": (50, 2)}
+NEW = {".": (10, 1), "a": (300, 2), "b": (50, 2), "c": (70, 1), "c/d": (5, 1)}
+
+class SnapshotDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.old = save_snapshot(make_tree("/data", OLD), os.path.join(self.folder.name, "old"))
+        self.new = save_snapshot(make_tree("/data", NEW), os.path.join(self.folder.name, "new"))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_records_are_subtree_totals_in_path_order(self):
+        records = [(path, size, count) for _, path, size, count in iter_snapshot(self.old)]
+        self.assertEqual(records, [(".", 190, 5), ("a", 130, 2), ("a/old", 30, 1), ("b", 50, 2)])
+
+    def test_diff(self):
+        diff = diff_snapshots(self.old, self.new)
+        self.assertEqual(diff["total_delta"], 245)
+        self.assertEqual([(c["path"], c["old_size"], c["size"], c["delta"]) for c in diff["changed"]],
+                         [("a", 130, 300, 170)])
+        # A new or vanished subtree is reported once, by its top folder
+        self.assertEqual([(a["path"], a["size"]) for a in diff["added"]], [("c", 75)])
+        self.assertEqual([(r["path"], r["size"]) for r in diff["removed"]], [("a/old", 30)])
+
+    def test_different_roots_are_refused(self):
+        other = save_snapshot(make_tree("/srv", NEW), os.path.join(self.folder.name, "other"))
+        with self.assertRaises(ValueError):
+            diff_snapshots(self.old, other)
+
+if __name__ == "__main__":
+    unittest.main()
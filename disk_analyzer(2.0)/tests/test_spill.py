@@ -0,0 +1,74 @@
+#======================================================
+# Tests for the spill store: subtrees moved to disk during a scan must come
+# back in the snapshot's component-wise order (a/x before a-b, although "-"
+# sorts before "/"), so a spilled scan saves the same snapshot as one kept
+# in memory. Run from the project folder: python -m unittest discover tests
+import os
+import tempfile
+import unittest
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.snapshot import save_snapshot, tree_records
+from disk_analyzer_utils.spill import MemoryBudget, SpillStore, NODE_BYTES
+
+#======================================================
+# Names that sort differently as whole paths and component by component,
+# a tab (escaped in snapshots) and a non-ASCII name
+def make_tree(root):
+    tree = ScanTree(root)
+    a = tree.add(0, "a")
+    for parent, name, size in ((0, "a-b", 1), (0, "a\tb", 2), (0, "é", 3), (0, "Z", 4),
+                               (a, "x", 5), (a, "x-y", 6)):
+        tree.add_files(tree.add(parent, name), size, 1)
+    tree.add_files(tree.add(a + 1, "deep"), 7, 1)  # Below a-b
+    return tree
+
+class SpillStoreTest(unittest.TestCase):
+    def test_records_in_snapshot_order(self):
+        tree = make_tree("/data")
+        tree.rollup()
+        expected = list(tree_records(tree))
+        with tempfile.TemporaryDirectory() as folder:
+            store = SpillStore(folder)
+            try:
+                paths = tree.relative_paths()
+                store.add((paths[i], tree.names[i], tree.sizes[i], tree.counts[i]) for i in range(len(tree)))
+                self.assertEqual(store.rows, len(tree))
+                self.assertEqual(list(store.records()), expected)
+            finally:
+                store.close()
+            self.assertEqual(os.listdir(folder), [])
+
+    def test_spilled_tree_saves_the_same_snapshot(self):
+        with tempfile.TemporaryDirectory() as folder:
+            kept = save_snapshot(make_tree("/data"), os.path.join(folder, "kept"))
+            tree = make_tree("/data")
+            store = SpillStore(folder)
+            try:
+                remap = tree.spill(store, pending=[2])  # Only a-b is still being walked
+                self.assertEqual(sorted(remap), [0, 2])
+                self.assertEqual(tree.spilled, 7)
+                spilled = save_snapshot(tree, os.path.join(folder, "spilled"), store)
+            finally:
+                store.close()
+            with open(kept, encoding="utf-8") as f1, open(spilled, encoding="utf-8") as f2:
+                self.assertEqual(f1.readlines()[1:], f2.readlines()[1:])  # Header times differ
+
+class MemoryBudgetTest(unittest.TestCase):
+    def test_counts_tracked_trees(self):
+        with tempfile.TemporaryDirectory() as folder:
+            budget = MemoryBudget(1, spill_ratio=0.5, directory=folder)
+            try:
+                tree = ScanTree("/data")
+                budget.track(tree)
+                self.assertFalse(budget.over())
+                for _ in range(int(budget.threshold // NODE_BYTES)):
+                    tree.add(0, "d")
+                self.assertEqual(budget.held(), len(tree) * NODE_BYTES)
+                self.assertTrue(budget.over())
+                del tree  # Trees no longer used stop counting
+                self.assertEqual(budget.held(), 0)
+            finally:
+                budget.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+#======================================================
+# Regression tests for following directory symlinks: every engine must
+# count each physical directory once, also when a link points back to the
+# scanned root. Run from the project folder: python -m unittest discover tests
+import os
+import asyncio
+import tempfile
+import unittest
+from disk_analyzer_utils.engines import load_engines, run_scan
+
+#======================================================
+# Tree with 100 files in the root, 2 in a/b, and a/b/up -> ../.. (the root)
+def make_tree(root):
+    for i in range(100):
+        with open(os.path.join(root, f"f{i}"), "wb") as f:
+            f.write(b"x" * i)
+    os.makedirs(os.path.join(root, "a", "b"))
+    for name in ("g1", "g2"):
+        with open(os.path.join(root, "a", "b", name), "wb") as f:
+            f.write(b"y" * 10)
+    os.symlink(os.path.join("..", ".."), os.path.join(root, "a", "b", "up"))
+
+class LinkToRootTest(unittest.TestCase):
+    def test_every_engine_counts_the_root_once(self):
+        with tempfile.TemporaryDirectory() as root:
+            make_tree(root)
+            for name in load_engines():
+                for follow_symlinks in (False, True):
+                    with self.subTest(engine=name, follow_symlinks=follow_symlinks):
+                        result = asyncio.run(run_scan(name, root, follow_symlinks=follow_symlinks))
+                        self.assertEqual(result.file_count, 102)
+                        self.assertEqual(result.total_size, sum(range(100)) + 20)
+
+if __name__ == "__main__":
+    unittest.main()
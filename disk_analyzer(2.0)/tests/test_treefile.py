@@ -0,0 +1,77 @@
+#======================================================
+# Tests for the binary tree file (.dsa): a tree written in pre-order reads
+# back through the memory map with the same sizes, names, children and paths,
+# and in the same order as the text snapshot saved with it.
+# Run from the project folder: python -m unittest discover tests
+import os
+import tempfile
+import unittest
+from disk_analyzer_utils.tree import ScanTree
+from disk_analyzer_utils.snapshot import save_snapshot, iter_snapshot
+from disk_analyzer_utils.treefile import MappedTree, TreeFileWriter, TREE_FILE_EXT
+
+#======================================================
+# root: 1 byte; a: 10 (a/x: 100, a/y: 1000); b: 20; names sorted a, b and x, y
+def make_tree(root):
+    tree = ScanTree(root)
+    tree.disk_usage = (1000000, 400000, 600000)
+    b = tree.add(0, "b")
+    a = tree.add(0, "a")
+    y = tree.add(a, "y")
+    x = tree.add(a, "x")
+    for node, size in ((0, 1), (a, 10), (x, 100), (y, 1000), (b, 20)):
+        tree.add_files(node, size, 1)
+    return tree
+
+class TreeFileTest(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as folder:
+            snapshot = save_snapshot(make_tree("/data"), folder)
+            tree = MappedTree(os.path.splitext(snapshot)[0] + TREE_FILE_EXT)
+            try:
+                self.assertEqual((tree.root, tree.disk_usage), ("/data", (1000000, 400000, 600000)))
+                self.assertEqual(len(tree), 5)
+                self.assertEqual([tree.name(i) for i in range(5)], ["", "a", "x", "y", "b"])
+                self.assertEqual(tree.sizes.tolist(), [1131, 1110, 100, 1000, 20])
+                self.assertEqual(tree.counts.tolist(), [5, 3, 1, 1, 1])
+                self.assertEqual(tree.children(0), [1, 4])
+                self.assertEqual(tree.children(1), [2, 3])
+                self.assertEqual(tree.children(2), [])
+                self.assertEqual(tree.path(3), os.path.join("/data", "a", "y"))
+                # Same nodes, same order as the text snapshot
+                self.assertEqual([(path, size) for _, path, size, _ in iter_snapshot(snapshot)],
+                                 [(os.path.relpath(tree.path(i), "/data"), int(tree.sizes[i]))
+                                  for i in range(len(tree))])
+            finally:
+                tree.close()
+
+    def test_tree_file_only(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = save_snapshot(make_tree("/data"), folder, text=False)
+            self.assertTrue(filename.endswith(TREE_FILE_EXT))
+            self.assertEqual(os.listdir(folder), [os.path.basename(filename)])
+
+    def test_deep_subtrees_close(self):
+        # A chain three deep, then a sibling of the root's first child
+        with tempfile.TemporaryDirectory() as folder:
+            writer = TreeFileWriter(os.path.join(folder, "t" + TREE_FILE_EXT), "/r", (0, 0, 0), 0.0)
+            for depth, name in ((0, ""), (1, "a"), (2, "b"), (3, "c"), (1, "d")):
+                writer.add(depth, name, 1, 1)
+            tree = MappedTree(writer.finish())
+            try:
+                self.assertEqual(tree.ends.tolist(), [5, 4, 4, 4, 5])
+                self.assertEqual(tree.parents.tolist(), [-1, 0, 1, 2, 0])
+                self.assertEqual(tree.children(0), [1, 4])
+            finally:
+                tree.close()
+
+    def test_other_files_are_refused(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "bad" + TREE_FILE_EXT)
+            with open(filename, "wb") as f:
+                f.write(b"\0" * 128)
+            with self.assertRaises(ValueError):
+                MappedTree(filename)
+
+if __name__ == "__main__":
+    unittest.main()